@@ -0,0 +1,76 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+from app.core.activity_store import activity_store
+from app.core.pyramid import PYRAMID_STATS
+
+router = APIRouter()
+
+
+def _stream_to_list(series: pd.Series) -> list:
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return [ts.isoformat() if not pd.isna(ts) else None for ts in series]
+    if pd.api.types.is_numeric_dtype(series):
+        return series.fillna(0).tolist()
+    return [None if (isinstance(v, float) and pd.isna(v)) else v for v in series]
+
+
+@router.get("/activities")
+def list_activities(start: Optional[str] = None, end: Optional[str] = None):
+    """
+    列出已保存的活动，start / end 为 ISO 格式的开始时间筛选范围
+    """
+    if activity_store is None:
+        return {}
+    return activity_store.list_activities(start, end)
+
+
+@router.get("/activities/{activity_id}/streams")
+def get_activity_streams(activity_id: str, fields: Optional[str] = None):
+    """
+    直接读取保存的列式数据流，fields 为逗号分隔的列名，缺省返回全部列
+    """
+    if activity_store is None:
+        raise HTTPException(status_code=404, detail="Activity store is disabled")
+    columns = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    streams = activity_store.load_streams(activity_id, columns)
+    if streams is None:
+        raise HTTPException(status_code=404, detail="Activity not found")
+    return {
+        "activity_id": activity_id,
+        "samples": len(streams),
+        "streams": {name: _stream_to_list(streams[name]) for name in streams.columns},
+    }
+
+
+@router.get("/activities/{activity_id}/window")
+def get_activity_window(
+    activity_id: str,
+    channel: str = "power",
+    start: float = Query(0, ge=0),
+    end: Optional[float] = Query(None, gt=0),
+    width: int = Query(1000, ge=1, le=20000),
+):
+    """
+    图表缩放用的时间窗口数据：从预聚合的 1 秒 / 5 秒 / 30 秒 / 5 分钟金字塔中
+    选择点数不超过 width 的最细分辨率，返回 [start, end) 秒内每个桶的 min / mean / max
+    """
+    if activity_store is None:
+        raise HTTPException(status_code=404, detail="Activity store is disabled")
+    if end is not None and end <= start:
+        raise HTTPException(status_code=400, detail="end must be greater than start")
+    window = activity_store.load_window(activity_id, channel, start, end, width)
+    if window is None:
+        raise HTTPException(status_code=404, detail="Activity or channel not found")
+    bucket, values = window["bucket"], window["values"]
+    response = {
+        "activity_id": activity_id,
+        "channel": channel,
+        "bucket_seconds": bucket,
+        "time": ((window["first"] + np.arange(len(values))) * bucket).tolist(),
+    }
+    for column, stat in enumerate(PYRAMID_STATS):
+        response[stat] = [None if np.isnan(v) else round(float(v), 3) for v in values[:, column]]
+    return response
@@ -0,0 +1,192 @@
+from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import List
+import asyncio
+import io
+import json
+import os
+import zipfile
+
+from app.api.upload import (
+    FIT_UPLOAD_SPOOL_MAX_SIZE,
+    _analysis_pool_busy,
+    analysis_cache,
+    analysis_pool,
+    analyze_fit,
+    submit_spooled,
+)
+from app.core.cache import analysis_cache_key, hash_fit_upload
+from app.core.user_config import refresh_user_config
+from app.core.fit_backends import FitSource
+from app.core.utils import discard_upload, spool_to_disk, spool_upload
+from app.core.worker_pool import WorkerPoolFull
+
+router = APIRouter()
+
+# 工作池被其他请求占满时，批量导入重新提交的等待间隔（秒）
+BATCH_RETRY_INTERVAL = 0.5
+
+
+def _iter_fit_payloads(uploads, to_disk: bool):
+    """
+    依次产出 (文件名, 暂存的文件, 错误信息)，uploads 为 (文件名, spool_upload 的结果)
+    zip 压缩包中的 .fit 成员在取用时才逐个解压，同时暂存的文件数受在途任务数限制；
+    to_disk（工作进程按路径读取）或成员超过 FIT_UPLOAD_SPOOL_MAX_SIZE 时解压到磁盘临时文件，
+    否则解压到内存
+    产出的文件由调用方通过 discard_upload 清理
+    """
+    for filename, source in uploads:
+        if filename.lower().endswith(".zip"):
+            try:
+                archive = zipfile.ZipFile(source if isinstance(source, str) else io.BytesIO(source))
+            except zipfile.BadZipFile:
+                yield filename, None, "Invalid zip archive"
+                continue
+            with archive:
+                for member in archive.infolist():
+                    if member.is_dir() or not member.filename.lower().endswith(".fit"):
+                        continue
+                    with archive.open(member) as f:
+                        if to_disk or member.file_size > FIT_UPLOAD_SPOOL_MAX_SIZE:
+                            payload = spool_to_disk(f, ".fit")
+                        else:
+                            payload = f.read()
+                    yield f"{filename}/{member.filename}", payload, None
+        elif filename.lower().endswith(".fit"):
+            yield filename, source, None
+        else:
+            yield filename, None, "Only .fit files and .zip archives are supported"
+
+
+def analyze_fit_payload(source: FitSource, filename: str, params: dict) -> dict:
+    """
+    在工作池中分析单个文件（临时文件路径或字节），异常作为该文件的错误返回，不影响其他文件
+    结果随 item["result"] 返回主进程，由主进程写入分析缓存（工作进程中的缓存对接口不可见）
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            file_digest = hash_fit_upload(f)
+    else:
+        file_digest = hash_fit_upload(io.BytesIO(source))
+    item = {"filename": filename, "activity_id": file_digest}
+    try:
+        result = analyze_fit(source, filename, file_digest, use_cache=False, **params)
+    except Exception as e:
+        item.update({"status": "error", "error": f"{type(e).__name__}: {e}"})
+        return item
+    item.update({"status": "ok", "result": result})
+    return item
+
+
+@router.post("/upload_fit_batch")
+async def upload_fit_batch(
+    files: List[UploadFile] = File(...),
+    include_results: bool = True,
+    debug: bool = True,
+    raw_data: bool = True,
+    curves: bool = True,
+    Zone: bool = True,
+):
+    """
+    批量导入 FIT 文件（可直接上传 zip 压缩包），在共用的分析工作池中并行分析
+    以 NDJSON 逐行返回每个文件的结果或错误，completed / total 表示进度；
+    total 在全部文件提交后才确定，之前为 null
+    每个结果都写入分析缓存（与默认参数的 upload_fit 共用缓存键），启用活动存储时也写入活动存储；
+    include_results=false 时只返回状态和活动 ID
+    """
+    # 与 upload_fit 的默认参数一致，之后单独上传同一文件时直接命中缓存
+    params = {
+        "debug": debug, "raw_data": raw_data, "curves": curves, "Zone": Zone,
+        "power_curve_grid": "exact", "wbal_model": "exponential",
+    }
+    # 本批次最多同时占用工作进程数个名额，工作池的排队名额留给交互式的 upload_fit
+    max_in_flight = analysis_pool.max_workers
+
+    async def generate():
+        payloads = _iter_fit_payloads(uploads, analysis_pool.use_processes)
+        pending = set()
+        waiting = None  # 工作池已满、等待重新提交的文件
+        submitted = 0
+        completed = 0
+        total = None
+
+        def line(item):
+            item.update({"completed": completed, "total": total})
+            return json.dumps(item, ensure_ascii=False) + "\n"
+
+        try:
+            while True:
+                while total is None and len(pending) < max_in_flight:
+                    # 解压 zip 成员涉及磁盘读写，不在事件循环中执行
+                    payload = waiting or await asyncio.to_thread(next, payloads, None)
+                    waiting = None
+                    if payload is None:
+                        total = submitted
+                        break
+                    filename, source, error = payload
+                    if error is not None:
+                        submitted += 1
+                        completed += 1
+                        yield line({"filename": filename, "status": "error", "error": error})
+                        continue
+                    try:
+                        pending.add(submit_spooled(source, analyze_fit_payload, filename, params))
+                    except WorkerPoolFull:
+                        waiting = payload
+                        break
+                    submitted += 1
+                if not pending:
+                    if waiting is None:
+                        break
+                    await asyncio.sleep(BATCH_RETRY_INTERVAL)
+                    continue
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    completed += 1
+                    item = future.result()
+                    result = item.pop("result", None)
+                    if result is None:
+                        yield line(item)
+                        continue
+                    cache_key = analysis_cache_key(item["activity_id"], config, params)
+                    await asyncio.to_thread(analysis_cache.set, cache_key, result)
+                    if include_results:
+                        item["result"] = result
+                    yield await asyncio.to_thread(line, item)
+        finally:
+            # 客户端断开时取消尚未开始的分析；已开始的分析执行完后由工作池释放名额并删除临时文件
+            for future in pending:
+                future.cancel()
+            if waiting is not None:
+                discard_upload(waiting[1])
+            try:
+                payloads.close()
+            except ValueError:
+                # 客户端断开时解压线程可能仍在执行，压缩包随生成器回收时关闭
+                pass
+            for _, source in uploads:
+                discard_upload(source)
+
+    if not files:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+    if analysis_pool.in_flight >= analysis_pool.max_pending:
+        raise _analysis_pool_busy()
+    config = await asyncio.to_thread(refresh_user_config)
+    # 上传文件在接口返回后即被关闭，流式响应开始前逐个暂存：starlette 已写入磁盘的文件和
+    # 进程池要读取的 .fit 文件复制到磁盘临时文件，其余直接使用内存中的内容；
+    # zip 压缩包只在主进程中解压，不需要路径
+    uploads = []
+    try:
+        for upload in files:
+            filename = upload.filename or ""
+            to_disk = analysis_pool.use_processes and not filename.lower().endswith(".zip")
+            try:
+                source = await asyncio.to_thread(spool_upload, upload.file, os.path.splitext(filename)[1], to_disk)
+            finally:
+                await upload.close()
+            uploads.append((filename, source))
+    except BaseException:
+        for _, source in uploads:
+            discard_upload(source)
+        raise
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
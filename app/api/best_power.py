@@ -0,0 +1,46 @@
+from fastapi import APIRouter, HTTPException
+import datetime
+from typing import Optional
+
+import numpy as np
+
+from app.core.activity_archive import activity_archive
+from app.core.best_power import BestPowerIndexMismatch, best_power_index
+from app.core.power import ESTIMATE_FTP
+
+router = APIRouter()
+
+
+def _curve_to_list(curve: np.ndarray) -> list:
+    return [None if np.isnan(p) else int(round(float(p))) for p in curve]
+
+
+@router.get("/best_power")
+def get_best_power(as_of: Optional[datetime.date] = None):
+    """
+    全部历史、最近 42 / 90 / 365 天和本赛季的最佳功率曲线（与 durations 一一对应，没有数据的时长为 null），
+    以及按各曲线估算的 CP（eFTP）；as_of 为截止日期（YYYY-MM-DD），默认今天
+    """
+    if best_power_index is None:
+        raise HTTPException(status_code=404, detail="Best power index is disabled")
+    as_of_day = None if as_of is None else (as_of - datetime.date(1970, 1, 1)).days
+    try:
+        curves = best_power_index.summary(as_of_day)
+    except BestPowerIndexMismatch as e:
+        raise HTTPException(status_code=409, detail=f"{e}: POST /best_power/rebuild")
+    durations = best_power_index.durations.tolist()
+    return {
+        "durations": durations,
+        "curves": {name: _curve_to_list(curve) for name, curve in curves.items()},
+        "estimated_cp": {name: ESTIMATE_FTP(curve, durations) for name, curve in curves.items()},
+    }
+
+
+@router.post("/best_power/rebuild")
+def rebuild_best_power():
+    """
+    从活动归档重新建立最佳功率索引，用于首次启用或修改持续时间网格之后
+    """
+    if best_power_index is None or activity_archive is None:
+        raise HTTPException(status_code=404, detail="Best power index or activity archive is disabled")
+    return {"activities": best_power_index.rebuild(activity_archive)}
@@ -0,0 +1,207 @@
+from fastapi import APIRouter, File, Header, Query, UploadFile, HTTPException
+import asyncio
+import os
+from collections import deque
+from typing import Literal, Optional
+
+from app.api.upload import (
+    SECTION_RECORD_FIELDS,
+    analysis_cache,
+    analysis_pool,
+    analyze_fit,
+    downsample_result,
+    encode_result,
+    find_cached_result,
+    parse_selection,
+    selection_params,
+    spool_fit_upload,
+    submit_spooled,
+)
+from app.core.cache import analysis_cache_key, hash_fit_upload
+from app.core.fit_backends import FitSource
+from app.core.jobs import JOB_DONE, JOB_FAILED, JOB_QUEUED, JOB_TIMEOUT_SECONDS, job_store
+from app.core.user_config import refresh_user_config
+from app.core.utils import discard_upload
+from app.core.worker_pool import WorkerPoolFull
+
+router = APIRouter()
+
+# 后台任务最多同时占用的分析工作池名额（默认为工作进程数的一半），
+# 其余名额留给交互式的 upload_fit，后台任务不会把工作池占满
+ANALYSIS_JOB_SLOTS = max(1, int(os.getenv("ANALYSIS_JOB_SLOTS", analysis_pool.max_workers // 2)))
+
+# 排队任务数上限，超过时返回 503；排队的任务持有暂存的上传文件
+ANALYSIS_JOB_MAX_QUEUED = int(os.getenv("ANALYSIS_JOB_MAX_QUEUED", 256))
+
+# 工作池被 upload_fit 占满时重新提交的等待间隔（秒）
+JOB_RETRY_INTERVAL = 0.5
+
+# 刷新排队和执行中任务 updated_at 的间隔（秒），远小于任务超时时长
+JOB_HEARTBEAT_SECONDS = max(1, JOB_TIMEOUT_SECONDS // 10)
+
+# 等待提交的任务：(任务 ID, 暂存的上传文件, 文件名, 文件哈希, 分析参数, selection, 缓存键)
+_job_queue = deque()
+
+# 执行中的任务 ID -> 等待任务结束的协程，保留引用避免被垃圾回收
+_running_jobs = {}
+
+# 心跳协程和工作池已满时的重试定时器
+_heartbeat = None
+_retry_handle = None
+
+
+def run_analysis_job(
+    source: FitSource, job_id: str, filename: str, file_digest: str, params: dict, selection: Optional[dict] = None
+) -> dict:
+    """
+    在工作池中分析暂存的上传文件（spool_upload 的结果），每完成一个分析部分记录一次进度
+    """
+    job_store.start(job_id)
+    return analyze_fit(
+        source, filename, file_digest,
+        use_cache=False,
+        progress=lambda section, _data: job_store.section_done(job_id, section),
+        selection=selection,
+        **params,
+    )
+
+
+async def _wait_job(job_id: str, future: asyncio.Future, cache_key: str) -> None:
+    try:
+        result = await future
+    except Exception as e:
+        await asyncio.to_thread(job_store.fail, job_id, f"{type(e).__name__}: {e}")
+    else:
+        await asyncio.to_thread(analysis_cache.set, cache_key, result)
+        await asyncio.to_thread(job_store.finish, job_id, result)
+    finally:
+        del _running_jobs[job_id]
+        _dispatch_jobs()
+
+
+async def _heartbeat_jobs() -> None:
+    """
+    排队和执行中的任务存在时定期刷新其 updated_at，表示任务仍由存活的服务进程持有
+    """
+    while _job_queue or _running_jobs:
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+        job_ids = [job[0] for job in _job_queue] + list(_running_jobs)
+        await asyncio.to_thread(job_store.touch, job_ids)
+
+
+def _dispatch_jobs() -> None:
+    """
+    按提交顺序把排队的任务提交到分析工作池，同时执行的任务数不超过 ANALYSIS_JOB_SLOTS，
+    有任务提交或结束时调用；工作池被 upload_fit 占满时等待 JOB_RETRY_INTERVAL 后重试
+    """
+    global _heartbeat, _retry_handle
+    if _retry_handle is not None:
+        _retry_handle.cancel()
+        _retry_handle = None
+    while _job_queue and len(_running_jobs) < ANALYSIS_JOB_SLOTS:
+        job_id, source, filename, file_digest, params, selection, cache_key = _job_queue[0]
+        try:
+            future = submit_spooled(source, run_analysis_job, job_id, filename, file_digest, params, selection)
+        except WorkerPoolFull:
+            _retry_handle = asyncio.get_running_loop().call_later(JOB_RETRY_INTERVAL, _dispatch_jobs)
+            break
+        _job_queue.popleft()
+        _running_jobs[job_id] = asyncio.create_task(_wait_job(job_id, future, cache_key))
+    if (_job_queue or _running_jobs) and (_heartbeat is None or _heartbeat.done()):
+        _heartbeat = asyncio.create_task(_heartbeat_jobs())
+
+
+def discard_queued_jobs() -> None:
+    """
+    服务关闭时（app.main 的 lifespan）停止调度并删除排队任务暂存的上传文件，
+    这些任务之后没有心跳，查询时视为失败
+    """
+    global _heartbeat, _retry_handle
+    if _retry_handle is not None:
+        _retry_handle.cancel()
+        _retry_handle = None
+    if _heartbeat is not None:
+        _heartbeat.cancel()
+        _heartbeat = None
+    while _job_queue:
+        discard_upload(_job_queue.popleft()[1])
+
+
+@router.post("/jobs/upload_fit", status_code=202)
+async def submit_upload_job(
+    file: UploadFile = File(...),
+    debug: bool = True,
+    raw_data: bool = True,
+    curves: bool = True,
+    Zone: bool = True,
+    power_curve_grid: Literal["exact", "log"] = "exact",
+    wbal_model: Literal["exponential", "differential", "integral"] = "exponential",
+    sections: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """
+    提交分析任务并立即返回任务 ID（状态为 queued），之后通过 /jobs/{job_id} 查询进度，
+    /jobs/{job_id}/result 获取结果（与 upload_fit 的返回相同，sections / fields 的含义也相同）
+    任务由调度器按顺序提交到与 upload_fit 共用的分析工作池，最多占用 ANALYSIS_JOB_SLOTS 个名额；
+    排队任务超过 ANALYSIS_JOB_MAX_QUEUED 时返回 503
+    任务表（SQLite）和缓存的读写都在线程中执行，不阻塞事件循环
+    """
+    if not file.filename or not file.filename.endswith(".fit"):
+        raise HTTPException(status_code=400, detail="Only .fit files are supported")
+    try:
+        selection = parse_selection(sections, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(_job_queue) >= ANALYSIS_JOB_MAX_QUEUED:
+        raise HTTPException(
+            status_code=503, detail="Too many queued analysis jobs, please retry later", headers={"Retry-After": "30"}
+        )
+
+    params = {
+        "debug": debug, "raw_data": raw_data, "curves": curves, "Zone": Zone,
+        "power_curve_grid": power_curve_grid, "wbal_model": wbal_model,
+    }
+    file_digest = await asyncio.to_thread(hash_fit_upload, file.file)
+    job_sections = [s for s in SECTION_RECORD_FIELDS if selection is None or s in selection]
+    config = await asyncio.to_thread(refresh_user_config)
+    cache_key = analysis_cache_key(file_digest, config, {**params, **selection_params(selection)})
+    job_id = await asyncio.to_thread(job_store.create, file.filename, file_digest, job_sections)
+
+    cached = await asyncio.to_thread(find_cached_result, file_digest, config, params, selection)
+    if cached is not None:
+        await file.close()
+        await asyncio.to_thread(job_store.finish, job_id, cached)
+        return {"job_id": job_id, "status": JOB_DONE}
+
+    source = await spool_fit_upload(file)
+    _job_queue.append((job_id, source, file.filename, file_digest, params, selection, cache_key))
+    _dispatch_jobs()
+    return {"job_id": job_id, "status": JOB_QUEUED}
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    任务状态（queued / running / done / failed）、已完成的分析部分和进度
+    """
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}/result")
+def get_job_result(
+    job_id: str,
+    accept: Optional[str] = Header(None),
+    max_points: Optional[int] = Query(None, ge=4),
+    downsample: Literal["lttb", "minmax"] = "lttb",
+):
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == JOB_FAILED:
+        raise HTTPException(status_code=409, detail={"status": job["status"], "error": job["error"]})
+    if job["status"] != JOB_DONE:
+        raise HTTPException(status_code=409, detail={"status": job["status"], "progress": job["progress"]})
+    return encode_result(downsample_result(job_store.get_result(job_id), max_points, downsample), accept)
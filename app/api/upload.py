@@ -1,12 +1,18 @@
 # app/api/upload.py
 from pickle import FALSE
-from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi import APIRouter, File, Header, Query, UploadFile, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response, StreamingResponse
+import asyncio
+import functools
+import json
 import matplotlib.pyplot as plt
-import shutil
+import multiprocessing
 import os
+import queue
 import pandas as pd
-from tempfile import NamedTemporaryFile
-from typing import cast
+from starlette.formparsers import MultiPartParser
+from typing import Callable, Literal, Optional, cast
 
 from pandas.core import series
 
@@ -15,7 +21,16 @@ from app.core.power import *
 from app.core.heart_rate import *
 from app.core.cadence import *
 from app.core.more_data import *
-from app.core.utils import format_seconds
+from app.core.utils import discard_upload, format_seconds, spool_upload
+from app.core.cache import AnalysisCache, analysis_cache_key, hash_fit_upload
+from app.core.user_config import refresh_user_config
+from app.core.activity_store import activity_store
+from app.core.activity_archive import activity_archive
+from app.core.best_power import BestPowerIndexMismatch, best_power_index, epoch_day
+from app.core.worker_pool import BoundedWorkerPool, WorkerPoolFull
+from app.core.encoding import MSGPACK_MEDIA_TYPES, pack_msgpack, wants_msgpack
+from app.core.downsample import downsample_indices
+from app.core.metrics import MetricGraph, activity_sources, metric_registry
 
 fields = [
     "avg_cadence",
@@ -88,8 +103,338 @@ fields = [
 ]
 
 
+# 各分析部分用到的 record 字段，解析时只保留所请求部分需要的字段
+SECTION_RECORD_FIELDS = {
+    "OVERVIEW": ["power", "heart_rate", "distance", "enhanced_speed", "enhanced_altitude"],
+    "POWER": ["power", "altitude"],
+    "HEART_RATE": ["heart_rate", "power"],
+    "CADENCE": ["cadence", "power", "left_right_balance"],
+    "SPEED": ["enhanced_speed", "power"],
+    "TRAINING_EFFECT": ["power", "heart_rate"],
+    "ALTITUDE": ["altitude", "enhanced_altitude", "distance"],
+    "ELSE": ["temperature"],
+}
+
+
+# 各分析部分中按采样序号（功率曲线为持续时间）排列的图表序列，max_points 参数作用于这些序列
+DOWNSAMPLE_SERIES = {
+    "POWER": ["power_curve_graph", "power_graph", "wbal_curve", "rolling_power_graph"],
+    "HEART_RATE": ["heart_rate_graph", "heart_rate_decoupling_graph"],
+    "CADENCE": ["cadence_graph", "torque_graph", "SPI_graph"],
+    "SPEED": ["speed_kmh_2f"],
+    "TRAINING_EFFECT": ["carbohydrate_graph", "energy_graph"],
+    "ALTITUDE": ["altitude_graph", "vam_graph"],
+}
+
+
+# 各分析部分返回的字段，sections / fields 参数按此校验
+SECTION_FIELDS = {
+    "OVERVIEW": [
+        "total_distance", "moving_time", "avg_speed", "total_ascent", "avg_power",
+        "normalized_power", "training_stress_score", "avg_heartrate", "calories",
+    ],
+    "POWER": [
+        "power_curve_graph", "power_curve_durations", "power_graph", "power_zone_graph", "wbal_curve", "rolling_power_graph",
+        "avg_power", "max_power", "normalized_power", "intensity_factor", "total_work",
+        "variability_index", "weighted_avg_power", "work_above_ftp", "estimated_ftp", "w_balance_drop",
+        "altitude_adjusted_power", "altitude_adjusted_power_graph", "intervals",
+    ],
+    "HEART_RATE": [
+        "heart_rate_graph", "heart_rate_zone_graph", "heart_rate_zone_methods", "heart_rate_decoupling_graph", "avg_heart_rate",
+        "max_heart_rate", "heart_rate_recovery_capablility", "heart_rate_recovery_events", "heart_rate_lag", "efficiency_factor",
+        "decoupling_ratio",
+    ],
+    "CADENCE": [
+        "cadence_graph", "torque_graph", "SPI_graph", "avg_cadence", "max_cadence", "left_balance",
+        "right_balance", "avg_left_torque_effectiveness", "avg_right_torque_effectiveness",
+        "avg_left_pedal_smoothness", "avg_right_pedal_smoothness", "total_pedal_strokes",
+    ],
+    "SPEED": ["speed_kmh_2f", "avg_speed", "max_speed", "moving_time", "total_time", "pause_time", "coasting_time"],
+    "TRAINING_EFFECT": [
+        "training_effect", "training_stress_score", "carbon_consumtion", "carbohydrate_graph", "energy_graph",
+    ],
+    "ALTITUDE": [
+        "altitude_graph", "vam_graph", "elevation", "max_slope", "total_descent",
+        "uphill_distance", "downhill_distance",
+    ],
+    "ELSE": ["avg_temperature", "min_temperature", "max_temperature"],
+}
+
+
+def parse_selection(sections: Optional[str] = None, fields: Optional[str] = None) -> Optional[dict]:
+    """
+    把逗号分隔的 sections / fields 参数解析为 {分析部分: 字段集合}，字段集合为 None 表示该部分全部字段
+    fields 中的字段写作 POWER.power_curve_graph，或只写字段名（匹配所有包含该字段的部分）；
+    sections 中列出的部分返回全部字段，只通过 fields 选中的部分只返回所列字段
+    两个参数都未指定时返回 None，即完整分析；名称不存在时抛出 ValueError
+    """
+    section_names = [name.strip() for name in (sections or "").split(",") if name.strip()]
+    field_names = [name.strip() for name in (fields or "").split(",") if name.strip()]
+    if not section_names and not field_names:
+        return None
+
+    selection = {}
+    for section in section_names:
+        if section not in SECTION_FIELDS:
+            raise ValueError(f"Unknown section: {section}")
+        selection[section] = None
+    for name in field_names:
+        section, _, field = name.rpartition(".")
+        matches = [section] if section else [s for s in SECTION_FIELDS if field in SECTION_FIELDS[s]]
+        if not matches or any(field not in SECTION_FIELDS.get(match, ()) for match in matches):
+            raise ValueError(f"Unknown field: {name}")
+        for match in matches:
+            if match in selection and selection[match] is None:
+                continue
+            selection.setdefault(match, set()).add(field)
+    return selection
+
+
+def selection_params(selection: Optional[dict]) -> dict:
+    """
+    selection 在缓存键中的表示，完整分析时为空，与未指定选择时的缓存键一致
+    """
+    if selection is None:
+        return {}
+    return {
+        "selection": {
+            section: None if names is None else sorted(names)
+            for section, names in sorted(selection.items())
+        }
+    }
+
+
+def select_result(result_dict: dict, selection: Optional[dict]) -> dict:
+    """
+    从完整分析结果中裁剪出所选的部分和字段，用于命中完整分析的缓存时直接返回
+    """
+    if selection is None:
+        return result_dict
+    selected = {"activity_id": result_dict.get("activity_id")}
+    for section in SECTION_RECORD_FIELDS:
+        if section not in selection or section not in result_dict:
+            continue
+        names = selection[section]
+        data = result_dict[section]
+        selected[section] = data if names is None else {k: v for k, v in data.items() if k in names}
+    return selected
+
+
+def record_fields_for_sections(sections) -> set:
+    """
+    根据请求的分析部分得到 record 字段白名单，timestamp 用于清洗暂停数据，始终保留
+    概览字段是各部分共用的汇总指标（距离、速度、功率、心率）的依赖，也始终保留
+    """
+    record_fields = {"timestamp", *SECTION_RECORD_FIELDS["OVERVIEW"]}
+    for section in sections:
+        record_fields.update(SECTION_RECORD_FIELDS[section])
+    return record_fields
+
+
 router = APIRouter()
 
+# 上传文件在内存中暂存的最大字节数，超过后由 starlette 写入磁盘临时文件（默认 16MB）
+FIT_UPLOAD_SPOOL_MAX_SIZE = int(os.getenv("FIT_UPLOAD_SPOOL_MAX_SIZE", 16 * 1024 * 1024))
+MultiPartParser.spool_max_size = FIT_UPLOAD_SPOOL_MAX_SIZE
+
+# 分析结果缓存，键为文件内容哈希 + 用户配置指纹
+# ANALYSIS_CACHE_SIZE 为进程内缓存条目数，设置 ANALYSIS_CACHE_DIR 后启用磁盘缓存
+analysis_cache = AnalysisCache(
+    max_entries=int(os.getenv("ANALYSIS_CACHE_SIZE", 64)),
+    disk_dir=os.getenv("ANALYSIS_CACHE_DIR") or None,
+    disk_max_bytes=int(os.getenv("ANALYSIS_CACHE_DISK_MAX_BYTES", 512 * 1024 * 1024)),
+)
+
+# 分析工作池：ANALYSIS_WORKERS 为工作进程数（默认 CPU 核数），
+# ANALYSIS_MAX_PENDING 为执行中 + 排队的分析上限（默认为工作进程数的 2 倍），超过时返回 503，
+# ANALYSIS_POOL=thread 时改用线程池
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", os.cpu_count() or 1))
+analysis_pool = BoundedWorkerPool(
+    max_workers=ANALYSIS_WORKERS,
+    max_pending=int(os.getenv("ANALYSIS_MAX_PENDING", ANALYSIS_WORKERS * 2)),
+    use_processes=os.getenv("ANALYSIS_POOL", "process") != "thread",
+)
+
+
+def submit_spooled(source: FitSource, func, *args, **kwargs) -> asyncio.Future:
+    """
+    在分析工作池中执行 func(source, *args, **kwargs)，source 为 spool_upload 的结果，
+    为临时文件路径时在工作池中的任务结束后删除（取消返回的 Future 不会在任务执行中删除）
+    工作池已满时抛出 WorkerPoolFull 并保留文件，由调用方决定重试或通过 discard_upload 删除
+    """
+    return analysis_pool.submit_with_cleanup(functools.partial(discard_upload, source), func, source, *args, **kwargs)
+
+
+async def spool_fit_upload(file: UploadFile) -> FitSource:
+    """
+    暂存上传的 FIT 文件供分析工作池读取，并关闭上传文件
+    进程池中的工作进程按路径读取磁盘临时文件；线程池在 starlette 仍把上传内容保存在内存中时
+    （不超过 FIT_UPLOAD_SPOOL_MAX_SIZE）直接传递字节，不经过临时文件
+    """
+    try:
+        return await asyncio.to_thread(spool_upload, file.file, ".fit", analysis_pool.use_processes)
+    finally:
+        await file.close()
+
+
+def warm_up_analysis_pool():
+    """
+    服务启动时（app.main 的 lifespan）预先启动分析工作进程和流式返回使用的 Manager
+    """
+    analysis_pool.warm_up(record_fields_for_sections, [])
+    _section_queue(analysis_pool.use_processes)
+
+
+def shutdown_analysis_pool():
+    """
+    服务关闭时（app.main 的 lifespan）关闭分析工作池和 Manager
+    """
+    global _section_manager
+    analysis_pool.shutdown()
+    if _section_manager is not None:
+        _section_manager.shutdown()
+        _section_manager = None
+
+
+# 流式返回的格式：NDJSON 或 server-sent events
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+_section_manager = None
+
+
+def _section_queue(use_processes: bool):
+    """
+    流式返回时工作进程把完成的分析部分传回主进程的队列
+    进程池使用 Manager 队列（可随任务参数传给工作进程），线程池使用普通队列
+    """
+    global _section_manager
+    if not use_processes:
+        return queue.Queue()
+    if _section_manager is None:
+        _section_manager = multiprocessing.get_context("spawn").Manager()
+    return _section_manager.Queue()
+
+
+class SectionPublisher:
+    """
+    analyze_fit 的 progress 回调，把完成的分析部分放入队列
+    """
+
+    def __init__(self, section_queue):
+        self.section_queue = section_queue
+
+    def __call__(self, section: str, data: dict) -> None:
+        self.section_queue.put((section, jsonable_encoder(data)))
+
+
+def _format_stream_event(stream: str, event: str, payload: dict) -> str:
+    if stream == "sse":
+        return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+    return json.dumps({"event": event, **payload}, ensure_ascii=False) + "\n"
+
+
+async def _stream_cached(stream: str, result_dict: dict, transform):
+    yield _format_stream_event(stream, "start", {"activity_id": result_dict["activity_id"]})
+    for section, data in result_dict.items():
+        if section != "activity_id":
+            data = await asyncio.to_thread(transform, section, data)
+            yield _format_stream_event(stream, "section", {"section": section, "data": data})
+    yield _format_stream_event(stream, "end", {})
+
+
+async def _stream_analysis(stream: str, file_digest: str, future, section_queue, cache_key: str, transform):
+    """
+    依次发送 start、每个完成的 section、end（分析失败时为 error）事件
+    transform(section, data) 在发送前处理每个部分（如降采样）
+    """
+    yield _format_stream_event(stream, "start", {"activity_id": file_digest})
+    while True:
+        try:
+            section, data = await asyncio.to_thread(section_queue.get, True, 0.1)
+        except queue.Empty:
+            # 回调在分析函数返回前同步写入队列，任务结束且队列为空时所有部分都已发送
+            if future.done() and section_queue.empty():
+                break
+            continue
+        data = await asyncio.to_thread(transform, section, data)
+        yield _format_stream_event(stream, "section", {"section": section, "data": data})
+
+    try:
+        result_dict = future.result()
+    except Exception as e:
+        yield _format_stream_event(stream, "error", {"error": f"{type(e).__name__}: {e}"})
+        return
+    await asyncio.to_thread(analysis_cache.set, cache_key, result_dict)
+    yield _format_stream_event(stream, "end", {})
+
+
+def downsample_section(section: str, data, max_points: Optional[int], method: str = "lttb"):
+    """
+    对一个分析部分中的图表序列降采样到不超过 max_points 个点，返回新字典，不修改缓存中的结果
+    降采样的序列旁增加 <名称>_x，为保留点在原序列中的下标，用作图表横轴
+    """
+    names = DOWNSAMPLE_SERIES.get(section)
+    if not max_points or not names or not isinstance(data, dict):
+        return data
+    data = dict(data)
+    for name in names:
+        values = data.get(name)
+        if not isinstance(values, list) or len(values) <= max_points:
+            continue
+        index = downsample_indices(values, max_points, method)
+        data[name] = [values[i] for i in index]
+        data[f"{name}_x"] = index.tolist()
+    return data
+
+
+def downsample_result(result_dict: dict, max_points: Optional[int], method: str = "lttb") -> dict:
+    if not max_points:
+        return result_dict
+    return {
+        section: downsample_section(section, data, max_points, method)
+        for section, data in result_dict.items()
+    }
+
+
+def find_cached_result(file_digest: str, config: dict, params: dict, selection: Optional[dict]):
+    """
+    查找缓存的分析结果：先查所选内容的缓存，再从完整分析的缓存中裁剪出所选内容，都没有时返回 None
+    读取磁盘缓存，在线程中调用
+    """
+    cached = analysis_cache.get(analysis_cache_key(file_digest, config, {**params, **selection_params(selection)}))
+    if cached is None and selection is not None:
+        full_result = analysis_cache.get(analysis_cache_key(file_digest, config, params))
+        if full_result is not None:
+            cached = select_result(full_result, selection)
+    return cached
+
+
+def render_result(result_dict: dict, max_points: Optional[int], method: str, accept: Optional[str]):
+    """
+    降采样并按 Accept 编码，大结果耗时较长，在线程中调用
+    """
+    return encode_result(downsample_result(result_dict, max_points, method), accept)
+
+
+def encode_result(result_dict: dict, accept: Optional[str]):
+    """
+    按 Accept 协商返回格式：请求 MessagePack 时返回紧凑编码（数值序列为类型化数组），否则为 JSON
+    """
+    if wants_msgpack(accept):
+        return Response(content=pack_msgpack(result_dict), media_type=MSGPACK_MEDIA_TYPES[0])
+    return result_dict
+
+
+def _analysis_pool_busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Analysis workers are busy, please retry later",
+        headers={"Retry-After": "5"},
+    )
+
 
 @router.post("/upload_fit")
 async def upload_fit(
@@ -98,32 +443,180 @@ async def upload_fit(
     raw_data: bool = True,
     curves: bool = True,
     Zone: bool = True,
+    stream: Optional[Literal["ndjson", "sse"]] = None,
+    accept: Optional[str] = Header(None),
+    max_points: Optional[int] = Query(None, ge=4),
+    downsample: Literal["lttb", "minmax"] = "lttb",
+    sections: Optional[str] = None,
+    fields: Optional[str] = None,
+    timing: bool = False,
+    power_curve_grid: Literal["exact", "log"] = "exact",
+    wbal_model: Literal["exponential", "differential", "integral"] = "exponential",
 ):
+    """
+    sections=OVERVIEW,POWER / fields=POWER.power_curve_graph,avg_heart_rate 只计算并返回所选内容
+    （见 parse_selection），例如列表页只请求 OVERVIEW 时不计算功率曲线、W'bal、SPI 等
+    stream=ndjson / sse 时以流式响应返回，每个分析部分完成后立即发送，
+    概览等轻量部分最先到达，功率曲线、W'bal、SPI 等耗时部分随后逐个发送
+    Accept: application/msgpack 时返回 MessagePack（见 app.core.encoding），默认返回 JSON
+    max_points 把 DOWNSAMPLE_SERIES 中的图表序列降采样（lttb 或按桶保留 minmax），默认返回全部点
+    timing=true 时重新计算（不读写缓存），结果中附加各指标节点的耗时 timings（毫秒）
+    power_curve_grid=log 时功率曲线只计算对数间隔的持续时间（约 90 个点），并返回 power_curve_durations
+    wbal_model 选择 W'bal 模型（见 app.core.power.WBAL_MODELS），默认为 exponential
+    altitude_adjusted_power 为各海拔修正模型的结果，逐点数据需通过 fields=POWER.altitude_adjusted_power_graph 请求
+    """
     if not file.filename or not file.filename.endswith(
         ".fit"
     ):  # 检查文件名是否为空或是否为.fit文件
         raise HTTPException(status_code=400, detail="Only .fit files are supported")
 
-    # 保存上传文件到临时文件
     try:
-        with NamedTemporaryFile(delete=False, suffix=".fit") as tmp:
-            shutil.copyfileobj(file.file, tmp)
-            tmp_path = tmp.name
-    finally:
-        file.file.close()
+        selection = parse_selection(sections, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # 相同文件 + 相同配置 + 相同参数直接返回缓存结果
+    params = {
+        "debug": debug, "raw_data": raw_data, "curves": curves, "Zone": Zone,
+        "power_curve_grid": power_curve_grid, "wbal_model": wbal_model,
+    }
+    # 哈希、缓存读写、降采样和编码都在线程中执行，事件循环只负责收发请求
+    file_digest = await asyncio.to_thread(hash_fit_upload, file.file)
+    # 配置指纹取自请求时的配置，POST /api/user_config 修改后不会命中旧结果
+    config = await asyncio.to_thread(refresh_user_config)
+    cache_key = analysis_cache_key(file_digest, config, {**params, **selection_params(selection)})
+    cached = None if timing else await asyncio.to_thread(
+        find_cached_result, file_digest, config, params, selection
+    )
+
+    def transform(section, data):
+        return downsample_section(section, data, max_points, downsample)
+
+    if cached is not None:
+        await file.close()
+        if stream:
+            return StreamingResponse(
+                _stream_cached(stream, cached, transform), media_type=STREAM_MEDIA_TYPES[stream]
+            )
+        return await asyncio.to_thread(render_result, cached, max_points, downsample, accept)
+
+    # 工作进程按路径读取磁盘上的临时文件，上传内容不随任务参数复制；线程池直接读取内存中的上传内容
+    source = await spool_fit_upload(file)
+
+    if stream:
+        section_queue = _section_queue(analysis_pool.use_processes)
+        try:
+            future = submit_spooled(
+                source, analyze_fit, file.filename, file_digest,
+                use_cache=False, progress=SectionPublisher(section_queue), selection=selection, **params,
+            )
+        except WorkerPoolFull:
+            discard_upload(source)
+            raise _analysis_pool_busy()
+        return StreamingResponse(
+            _stream_analysis(stream, file_digest, future, section_queue, cache_key, transform),
+            media_type=STREAM_MEDIA_TYPES[stream],
+        )
+
+    # 分析在工作池中执行，事件循环只负责收发请求，其他接口不受大文件分析影响
     try:
-        data = parse_fit_file(tmp_path)
-        time_info = get_fit_date_time_info(tmp_path)
-        session = parse_fit_session(tmp_path)
+        future = submit_spooled(
+            source, analyze_fit, file.filename, file_digest,
+            use_cache=False, selection=selection, timing=timing, **params,
+        )
+    except WorkerPoolFull:
+        discard_upload(source)
+        raise _analysis_pool_busy()
+    # 请求被取消时任务仍在工作池中执行完，临时文件随后删除
+    result_dict = await asyncio.shield(future)
+    if not timing:
+        await asyncio.to_thread(analysis_cache.set, cache_key, result_dict)
+    return await asyncio.to_thread(render_result, result_dict, max_points, downsample, accept)
 
-    finally:
-        os.remove(tmp_path)
 
-    # print(device_info_summary)
+def analyze_fit(
+    source: FitSource,
+    filename: str,
+    file_digest: str,
+    debug: bool = True,
+    raw_data: bool = True,
+    curves: bool = True,
+    Zone: bool = True,
+    use_cache: bool = True,
+    progress: Optional[Callable[[str, dict], None]] = None,
+    selection: Optional[dict] = None,
+    timing: bool = False,
+    power_curve_grid: str = "exact",
+    wbal_model: str = "exponential",
+) -> dict:
+    """
+    同步执行完整的 FIT 分析流程，返回可 JSON 序列化的结果
+    upload_fit 和批量导入的工作进程都调用此函数
+
+    Args:
+        source (FitSource): FIT 文件路径、文件对象或字节数据
+        filename (str): 原始文件名，写入活动元数据
+        file_digest (str): 文件内容的 SHA-256，同时作为活动 ID
+        use_cache (bool): 是否读写分析结果缓存，upload_fit 在主进程中处理缓存时传 False
+        progress (Callable[[str, dict], None]): 每完成一个分析部分（OVERVIEW、POWER 等）时
+            以部分名和该部分的结果调用
+        selection (dict): parse_selection 的结果，只计算所选的分析部分和字段及其依赖，None 时完整分析
+        timing (bool): 结果中附加 timings，为各指标节点的计算耗时（毫秒）
+        power_curve_grid (str): exact 时功率曲线逐秒输出；log 时只计算对数间隔的持续时间，
+            POWER 中附加与 power_curve_graph 对应的 power_curve_durations
+        wbal_model (str): W'bal 模型，exponential / differential / integral
+    """
+    # 工作进程中的配置可能已过期，计算和缓存键都使用当前配置
+    config = refresh_user_config()
+    # 相同文件 + 相同配置 + 相同参数直接返回缓存结果
+    cache_key = analysis_cache_key(
+        file_digest,
+        config,
+        {
+            "debug": debug, "raw_data": raw_data, "curves": curves, "Zone": Zone,
+            "power_curve_grid": power_curve_grid, "wbal_model": wbal_model,
+            **selection_params(selection),
+        },
+    )
+    if use_cache:
+        cached = analysis_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    record_fields = record_fields_for_sections(SECTION_RECORD_FIELDS if selection is None else selection)
+
+    # 已保存过的活动直接读取列式数据流，不再解码 FIT
+    cleaned_data = (
+        activity_store.load_streams(file_digest, record_fields) if activity_store else None
+    )
+    if cleaned_data is not None:
+        session = activity_store.load_session(file_digest)
+    else:
+        # 直接解析上传的暂存文件对象，不再复制到临时文件
+        # 只解码一次，记录、时间信息和会话都从同一个解析结果中获取
+        parsed = decode_fit(source, record_fields=record_fields)
+        data = parsed.to_record_dataframe()
+        time_info = parsed.date_time_info()
+        session = parsed.to_session_dataframe()
+
+        # print(device_info_summary)
 
-    cleaned_data = clean_fit_data(data)
+        cleaned_data = clean_fit_data(data)
+        if activity_store:
+            activity_store.save(
+                file_digest, cleaned_data, session, {"filename": filename}, record_fields
+            )
+    # 追加到内存映射归档，供历史扫描（最佳功率、训练负荷等）零拷贝读取
+    # 只解码了部分字段时不写入，避免归档中缺少的通道被永久记为空值
+    if activity_archive is not None and selection is None and file_digest not in activity_archive:
+        activity_archive.append(file_digest, cleaned_data)
     FTP = user_config["power"]["FTP"]
 
+    # 指标按依赖图按需计算，共用的中间结果（标准化功率、W'bal 曲线等）只计算一次
+    metrics = MetricGraph(
+        metric_registry, {**activity_sources(cleaned_data), "wbal_model": wbal_model}, timing=timing
+    )
+
     # 获取数据开始和结束的时间戳，并计算总耗时（秒）
     if (
         "timestamp" in cleaned_data.columns
@@ -153,6 +646,20 @@ async def upload_fit(
 
     # print(duration_seconds)
 
+    # 把本次活动的平均最大功率并入最佳功率索引（按日期分桶取最大值），只在完整解码时写入；
+    # 索引的持续时间网格与当前不一致时不写入，等待 rebuild，分析结果照常返回
+    if (
+        best_power_index is not None
+        and selection is None
+        and start_timestamp is not None
+        and "power" in cleaned_data.columns
+        and not cleaned_data["power"].isnull().all()
+    ):
+        try:
+            best_power_index.update(file_digest, epoch_day(start_timestamp), metrics["best_power_curve"])
+        except BestPowerIndexMismatch:
+            pass
+
     results = {}
 
     for f in fields:
@@ -367,13 +874,11 @@ async def upload_fit(
     )
     NP = get_metric_from_session_or_calc(
         "normalized_power",
-        lambda: normalized_power(cast(pd.Series, cleaned_data["power"])),
+        lambda: metrics["normalized_power"],
     )
     TSS = get_metric_from_session_or_calc(
         "training_stress_score",
-        lambda: training_stress_score(
-            cast(pd.Series, cleaned_data["power"]), len(cleaned_data) / 3600.0
-        ),
+        lambda: metrics["training_stress_score"],
     )
     W = get_metric_from_session_or_calc(
         "total_work", lambda: calculate_work_kj(cast(pd.Series, cleaned_data["power"]))
@@ -384,98 +889,19 @@ async def upload_fit(
     )
     CAL = get_metric_from_session_or_calc(
         "total_calories",
-        lambda: estimate_calories(cast(pd.Series, cleaned_data["power"])),
+        lambda: metrics["calories"],
     )
 
     # 兼容session中total_calories优先
     if "total_calories" in session.columns:
         CAL = to_builtin_type(session["total_calories"].iloc[0])
 
-    # 海拔修正功率
-    if (
-        not cast(pd.Series, cleaned_data["power"]).isnull().all()
-        and "altitude" in cleaned_data.columns
-        and cast(pd.Series, cleaned_data["altitude"]).notnull().all()
-    ):
-        acclim_power = to_builtin_type(
-            get_altitude_adjusted_power_acclimatized(
-                cast(pd.Series, cleaned_data["power"]),
-                cast(pd.Series, cleaned_data["altitude"]),
-            )
-        )
-        nonacclimpower = to_builtin_type(
-            get_altitude_adjusted_power_nonacclimatized(
-                cast(pd.Series, cleaned_data["power"]),
-                cast(pd.Series, cleaned_data["altitude"]),
-            )
-        )
-    else:
-        acclim_power, nonacclimpower = None, None
-
     # 计算心率相关指标
     if not cast(pd.Series, cleaned_data["heart_rate"]).isnull().all():
         AvgHR = avg_heart_rate(cast(pd.Series, cleaned_data["heart_rate"]))
         MaxHR = max_heart_rate(cast(pd.Series, cleaned_data["heart_rate"]))
-        HRRC = heart_rate_recovery_capablility(
-            cast(pd.Series, cleaned_data["heart_rate"])
-        )
     else:
-        AvgHR, MaxHR, HRRC = None, None, None
-
-    # 心率解耦率相关指标
-    if (
-        not cast(pd.Series, cleaned_data["heart_rate"]).isnull().all()
-        and not cast(pd.Series, cleaned_data["power"]).isnull().all()
-    ):
-        decoupling, decoupling_curve = decoupling_ratio(cleaned_data)
-        hr_lag = heart_rate_lag(
-            cast(pd.Series, cleaned_data["power"]),
-            cast(pd.Series, cleaned_data["heart_rate"]),
-        )
-        simple_decoupling = simple_decoupling_ratio(cleaned_data)
-    else:
-        decoupling, decoupling_curve, hr_lag, simple_decoupling = None, None, None, None
-
-    # 计算踏频相关指标
-    if (
-        "cadence" in cleaned_data.columns
-        and not cast(pd.Series, cleaned_data["cadence"]).isnull().all()
-    ):
-        avgCadence = avg_cadence(cast(pd.Series, cleaned_data["cadence"]))
-        maxCadence = max_cadence(cast(pd.Series, cleaned_data["cadence"]))
-    else:
-        avgCadence, maxCadence = None, None
-    if (
-        "cadence" in cleaned_data.columns
-        and "power" in cleaned_data.columns
-        and not cast(pd.Series, cleaned_data["cadence"]).isnull().all()
-        and not cast(pd.Series, cleaned_data["power"]).isnull().all()
-    ):
-        maxTorque = max_torque(
-            cast(pd.Series, cleaned_data["cadence"]),
-            cast(pd.Series, cleaned_data["power"]),
-        )
-        avgTorque = avg_torque(
-            cast(pd.Series, cleaned_data["cadence"]),
-            cast(pd.Series, cleaned_data["power"]),
-        )
-    else:
-        maxTorque, avgTorque = None, None
-
-    if "left_right_balance" in cleaned_data.columns:
-        LEFT, RIGHT = left_right_balance(
-            cast(pd.Series, cleaned_data["left_right_balance"])
-        )
-
-    else:
-        LEFT, RIGHT = None, None
-
-    # 计算区间信息
-    if Zone:
-        P_ZONES = power_zones(cast(pd.Series, cleaned_data["power"]))
-        HR_ZONES = heart_rate_zones(
-            "threshold", cast(pd.Series, cleaned_data["heart_rate"])
-        )  # 默认使用阈值方法
+        AvgHR, MaxHR = None, None
 
     # 计算其他指标
     # 计算常用骑行指标：强度因子(IF)、效率因子(EF)、变异系数(VI)
@@ -487,79 +913,27 @@ async def upload_fit(
     )
     VI = round(NP / AP, 2) if all(x is not None and x > 0 for x in [NP, AP]) else None
 
-    # 温度
-    if (
-        "temperature" in cleaned_data.columns
-        and not cast(pd.Series, cleaned_data["temperature"]).isnull().all()
-    ):
-        MaxT = max_temperature(cast(pd.Series, cleaned_data["temperature"]))
-        AvgT = avg_temperature(cast(pd.Series, cleaned_data["temperature"]))
-        MinT = min_temperature(cast(pd.Series, cleaned_data["temperature"]))
-    else:
-        MaxT, AvgT, MinT = None, None, None
+    # 以下按分析部分计算，每完成一个部分通知一次进度并传入该部分的结果
+    # 先计算只依赖会话汇总的轻量部分，曲线等耗时部分在后，流式返回时概览可以最先显示
+    # 指定 selection 时只计算请求的部分和字段，未请求的曲线、W'bal、SPI 等不会执行
+    result_dict = {"activity_id": file_digest}
 
-    # 获取绘图信息
-    if curves:
-        power_series = cast(pd.Series, cleaned_data["power"])
-        cadence_series = cast(pd.Series, cleaned_data["cadence"])
-        power_curve = (
-            get_max_power_duration_curve(power_series)
-            if not power_series.isnull().all()
-            else None
-        )
-        torque_curve = (
-            get_torque_curve(cadence_series, power_series)
-            if not cadence_series.isnull().all() and not power_series.isnull().all()
-            else None
-        )
-        wbal_curve = (
-            get_wbal_curve(power_series) if not power_series.isnull().all() else None
-        )
-
-    # print("slope_vam_result:", slope_vam_result)
-    # print("vam_array:", vam_array)
-    print(cleaned_data["altitude"])
-    # print(cleaned_data["distance"])
+    def wanted(section: str, field: Optional[str] = None) -> bool:
+        if selection is None:
+            return True
+        if section not in selection:
+            return False
+        return field is None or selection[section] is None or field in selection[section]
 
-    # 计算训练效果（有氧/无氧/总结）
-    if "power" in cleaned_data.columns and not cleaned_data["power"].isnull().all():
-        training_effect = estimate_training_effect(
-            cleaned_data["power"], data_type="power"
-        )
-    elif (
-        "heart_rate" in cleaned_data.columns
-        and not cleaned_data["heart_rate"].isnull().all()
-    ):
-        training_effect = estimate_training_effect(
-            cleaned_data["heart_rate"], data_type="hr"
-        )
-    else:
-        training_effect = {
-            "aerobic_effect": 0.0,
-            "anaerobic_effect": 0.0,
-            "summary": "无数据",
-        }
+    def emit(section: str, data: dict) -> None:
+        if selection is not None and selection[section] is not None:
+            data = {key: value for key, value in data.items() if key in selection[section]}
+        result_dict[section] = data
+        if progress:
+            progress(section, data)
 
-    # INSERT_YOUR_CODE
-    # 计算坡度相关信息（如最大坡度、上坡距离、下坡距离）
-    if (
-        "altitude" in cleaned_data.columns
-        and "distance" in cleaned_data.columns
-        and not cleaned_data["altitude"].isnull().all()
-        and not cleaned_data["distance"].isnull().all()
-    ):
-        slope_segment_result = calculate_slope_and_segments(
-            cleaned_data["altitude"], cleaned_data["distance"]
-        )
-    else:
-        slope_segment_result = {
-            "slope_percent": 0.0,
-            "uphill_distance": 0.0,
-            "downhill_distance": 0.0,
-        }
-
-    result_dict = {
-        "OVERVIEW": {
+    if wanted("OVERVIEW"):
+        emit("OVERVIEW", {
             "total_distance": Dis,
             "moving_time": moving_time,
             "avg_speed": AvgS,
@@ -570,17 +944,105 @@ async def upload_fit(
             "avg_heartrate": AvgHR,
             "calories": CAL,
             # 状态值
-        },
-        "POWER": {
-            "power_curve_graph": power_curve,
+        })
+
+    if wanted("SPEED"):
+        emit("SPEED", {
+            "speed_kmh_2f": (
+                [
+                    round(v * 3.6, 2)
+                    for v in cleaned_data["enhanced_speed"].fillna(0).tolist()
+                ]
+                if raw_data
+                and wanted("SPEED", "speed_kmh_2f")
+                and "enhanced_speed" in cleaned_data.columns
+                else None
+            ),
+            "avg_speed": AvgS,
+            "max_speed": MaxS,
+            "moving_time": moving_time,
+            "total_time": duration_seconds,
+            "pause_time": duration_seconds - moving_time,
+            "coasting_time": coast_time,
+        })
+
+    # 温度
+    if wanted("ELSE"):
+        if (
+            "temperature" in cleaned_data.columns
+            and not cast(pd.Series, cleaned_data["temperature"]).isnull().all()
+        ):
+            MaxT = max_temperature(cast(pd.Series, cleaned_data["temperature"]))
+            AvgT = avg_temperature(cast(pd.Series, cleaned_data["temperature"]))
+            MinT = min_temperature(cast(pd.Series, cleaned_data["temperature"]))
+        else:
+            MaxT, AvgT, MinT = None, None, None
+
+        emit("ELSE", {
+            "avg_temperature": AvgT,
+            "min_temperature": MinT,
+            "max_temperature": MaxT,
+        })
+
+    # 功率区间和绘图信息
+    if wanted("POWER"):
+        power_series = cast(pd.Series, cleaned_data["power"])
+        has_power = not power_series.isnull().all()
+        P_ZONES = (
+            metrics["power_zones"] if Zone and wanted("POWER", "power_zone_graph") else None
+        )
+        power_curve, power_curve_durations = None, None
+        if curves and has_power and wanted("POWER", "power_curve_graph"):
+            if power_curve_grid == "log":
+                power_curve_durations, power_curve = metrics["power_curve_log"]
+            else:
+                power_curve = metrics["power_curve"]
+        wbal_curve = (
+            metrics["wbal_curve"]
+            if curves and has_power and wanted("POWER", "wbal_curve")
+            else None
+        )
+
+        # 各海拔修正模型的平均修正功率；逐点修正功率数据量较大，只在 fields 中明确请求时返回
+        altitude_adjusted, altitude_adjusted_graph = None, None
+        has_altitude = (
+            "altitude" in cleaned_data.columns and not cleaned_data["altitude"].isnull().all()
+        )
+        if has_power and has_altitude and wanted("POWER", "altitude_adjusted_power"):
+            altitude_adjusted = {
+                model: {"alt": values["alt"], "alt_acc": values["alt_acc"]}
+                for model, values in metrics["altitude_adjusted_power"].items()
+            }
+        if (
+            has_power
+            and has_altitude
+            and selection is not None
+            and "altitude_adjusted_power_graph" in (selection.get("POWER") or ())
+        ):
+            altitude_adjusted_graph = {
+                model: values["adjusted_power"].round(1).tolist()
+                for model, values in metrics["altitude_adjusted_power"].items()
+            }
+
+        power_result = {"power_curve_graph": power_curve}
+        if power_curve_grid == "log":
+            power_result["power_curve_durations"] = power_curve_durations
+        emit("POWER", {
+            **power_result,
             "power_graph": (
                 cleaned_data["power"].fillna(0).tolist()
-                if "power" in cleaned_data.columns
+                if raw_data
+                and wanted("POWER", "power_graph")
+                and "power" in cleaned_data.columns
                 else None
             ),
             "power_zone_graph": P_ZONES,
             "wbal_curve": wbal_curve,
-            "rolling_power_graph": rolling_power_30s(cleaned_data["power"]),
+            "rolling_power_graph": (
+                metrics["rolling_power_graph"]
+                if wanted("POWER", "rolling_power_graph")
+                else None
+            ),
             # 滑动平均功率曲线
             "avg_power": AP,
             "max_power": MaxP,
@@ -594,36 +1056,121 @@ async def upload_fit(
             "work_above_ftp": W_ABOVE_FTP,
             # 骑行eFTP
             "estimated_ftp": "NONE",
-            "w_balance_drop": get_wbal_range(cleaned_data["power"]),
-        },
-        "HEART_RATE": {
+            "w_balance_drop": (
+                metrics["wbal_range"]
+                if wanted("POWER", "w_balance_drop")
+                else None
+            ),
+            "altitude_adjusted_power": altitude_adjusted,
+            "altitude_adjusted_power_graph": altitude_adjusted_graph,
+            # 自动检测的功率区间（start / end 为与 power_graph 对齐的采样序号）
+            "intervals": (
+                metrics["intervals"]
+                if has_power and wanted("POWER", "intervals")
+                else None
+            ),
+        })
+
+    if wanted("HEART_RATE"):
+        heart_rate_series = cast(pd.Series, cleaned_data["heart_rate"])
+        power_series = cast(pd.Series, cleaned_data["power"])
+        has_heart_rate = not heart_rate_series.isnull().all()
+
+        # 心率恢复能力
+        HRRC = (
+            metrics["heart_rate_recovery"]
+            if has_heart_rate and wanted("HEART_RATE", "heart_rate_recovery_capablility")
+            else None
+        )
+        # 下降最多的几次心率恢复及其起止时间
+        HRR_EVENTS = (
+            metrics["heart_rate_recovery_events"]
+            if has_heart_rate and wanted("HEART_RATE", "heart_rate_recovery_events")
+            else None
+        )
+
+        # 心率解耦率相关指标
+        decoupling, hr_lag = None, None
+        if has_heart_rate and not power_series.isnull().all():
+            if wanted("HEART_RATE", "decoupling_ratio"):
+                decoupling, _decoupling_curve = metrics["decoupling"]
+            if wanted("HEART_RATE", "heart_rate_lag"):
+                hr_lag = metrics["heart_rate_lag"]
+
+        HR_ZONES = (
+            metrics["heart_rate_zones"]  # 默认使用阈值方法
+            if Zone and wanted("HEART_RATE", "heart_rate_zone_graph")
+            else None
+        )
+        # 三种心率区间方法（threshold / max / hrr）共用一次分箱
+        HR_ZONE_METHODS = (
+            metrics["heart_rate_zones_by_method"]
+            if Zone and wanted("HEART_RATE", "heart_rate_zone_methods")
+            else None
+        )
+
+        emit("HEART_RATE", {
             "heart_rate_graph": (
                 cleaned_data["heart_rate"].fillna(0).tolist()
-                if "heart_rate" in cleaned_data.columns
+                if raw_data
+                and wanted("HEART_RATE", "heart_rate_graph")
+                and "heart_rate" in cleaned_data.columns
                 else None
             ),
             "heart_rate_zone_graph": HR_ZONES,
-            "heart_rate_decoupling_graph": get_power_hr_ratio(
-                cleaned_data["power"], cleaned_data["heart_rate"]
+            "heart_rate_zone_methods": HR_ZONE_METHODS,
+            "heart_rate_decoupling_graph": (
+                metrics["power_hr_ratio"]
+                if wanted("HEART_RATE", "heart_rate_decoupling_graph")
+                else None
             ),
             "avg_heart_rate": AvgHR,
             "max_heart_rate": MaxHR,
             # --more--
             "heart_rate_recovery_capablility": HRRC,
+            "heart_rate_recovery_events": HRR_EVENTS,
             "heart_rate_lag": hr_lag,
             "efficiency_factor": EF,
             "decoupling_ratio": decoupling,
-        },
-        "CADENCE": {
+        })
+
+    # 计算踏频相关指标
+    if wanted("CADENCE"):
+        if (
+            "cadence" in cleaned_data.columns
+            and not cast(pd.Series, cleaned_data["cadence"]).isnull().all()
+        ):
+            avgCadence = avg_cadence(cast(pd.Series, cleaned_data["cadence"]))
+            maxCadence = max_cadence(cast(pd.Series, cleaned_data["cadence"]))
+        else:
+            avgCadence, maxCadence = None, None
+
+        if "left_right_balance" in cleaned_data.columns:
+            LEFT, RIGHT = left_right_balance(
+                cast(pd.Series, cleaned_data["left_right_balance"])
+            )
+
+        else:
+            LEFT, RIGHT = None, None
+
+        emit("CADENCE", {
             "cadence_graph": (
                 cleaned_data["cadence"].fillna(0).tolist()
-                if "cadence" in cleaned_data.columns
+                if raw_data
+                and wanted("CADENCE", "cadence_graph")
+                and "cadence" in cleaned_data.columns
                 else None
             ),
-            "torque_graph": get_torque_curve(
-                cleaned_data["cadence"], cleaned_data["power"]
+            "torque_graph": (
+                metrics["torque_curve"]
+                if curves and wanted("CADENCE", "torque_graph")
+                else None
+            ),
+            "SPI_graph": (
+                metrics["spi"]
+                if curves and wanted("CADENCE", "SPI_graph")
+                else None
             ),
-            "SPI_graph": calculate_spi(cleaned_data["power"]),
             "avg_cadence": avgCadence,
             "max_cadence": maxCadence,
             "left_balance": LEFT,
@@ -633,44 +1180,87 @@ async def upload_fit(
             "avg_right_torque_effectiveness": results["avg_right_torque_effectiveness"],
             "avg_left_pedal_smoothness": results["avg_left_pedal_smoothness"],
             "avg_right_pedal_smoothness": results["avg_right_pedal_smoothness"],
-            "total_pedal_strokes": total_pedal_strokes(
-                cleaned_data["cadence"], moving_time
-            ),
-        },
-        "SPEED": {
-            "speed_kmh_2f": (
-                [
-                    round(v * 3.6, 2)
-                    for v in cleaned_data["enhanced_speed"].fillna(0).tolist()
-                ]
-                if "enhanced_speed" in cleaned_data.columns
+            "total_pedal_strokes": (
+                total_pedal_strokes(cleaned_data["cadence"], moving_time)
+                if wanted("CADENCE", "total_pedal_strokes")
                 else None
             ),
-            "avg_speed": AvgS,
-            "max_speed": MaxS,
-            "moving_time": moving_time,
-            "total_time": duration_seconds,
-            "pause_time": duration_seconds - moving_time,
-            "coasting_time": coast_time,
-        },
-        "TRAINING_EFFECT": {
+        })
+
+    # 计算训练效果（有氧/无氧/总结）
+    if wanted("TRAINING_EFFECT"):
+        if not wanted("TRAINING_EFFECT", "training_effect"):
+            training_effect = None
+        elif "power" in cleaned_data.columns and not cleaned_data["power"].isnull().all():
+            training_effect = metrics["power_training_effect"]
+        elif (
+            "heart_rate" in cleaned_data.columns
+            and not cleaned_data["heart_rate"].isnull().all()
+        ):
+            training_effect = estimate_training_effect(
+                cleaned_data["heart_rate"], data_type="hr"
+            )
+        else:
+            training_effect = {
+                "aerobic_effect": 0.0,
+                "anaerobic_effect": 0.0,
+                "summary": "无数据",
+            }
+
+        # 累计碳水（克，与 carbon_consumtion 使用相同的修正系数）和累计能量消耗（千卡）曲线，用于补给计划
+        carbohydrate_graph, energy_graph = None, None
+        if curves and "power" in cleaned_data.columns and not cleaned_data["power"].isnull().all():
+            if wanted("TRAINING_EFFECT", "carbohydrate_graph"):
+                carbohydrate_graph = (metrics["substrate_utilisation"]["cumulative_carb_g"] * 1.5).round(1).tolist()
+            if wanted("TRAINING_EFFECT", "energy_graph"):
+                energy_graph = metrics["substrate_utilisation"]["cumulative_kcal"].round(1).tolist()
+
+        emit("TRAINING_EFFECT", {
             "training_effect": training_effect,
             "training_stress_score": TSS,
-            "carbon_consumtion": estimate_carbohydrate_consumption_v2(
-                cleaned_data["power"]
+            "carbon_consumtion": (
+                metrics["carbohydrate_consumption"] * 1.5
+                if wanted("TRAINING_EFFECT", "carbon_consumtion")
+                else None
+            ),
+            "carbohydrate_graph": carbohydrate_graph,
+            "energy_graph": energy_graph,
+        })
+
+    # 计算坡度相关信息（如最大坡度、上坡距离、下坡距离）
+    if wanted("ALTITUDE"):
+        if (
+            "altitude" in cleaned_data.columns
+            and "distance" in cleaned_data.columns
+            and not cleaned_data["altitude"].isnull().all()
+            and not cleaned_data["distance"].isnull().all()
+        ):
+            slope_segment_result = calculate_slope_and_segments(
+                cleaned_data["altitude"], cleaned_data["distance"]
             )
-            * 1.5,
-        },
-        "ALTITUDE": {
+        else:
+            slope_segment_result = {
+                "slope_percent": 0.0,
+                "uphill_distance": 0.0,
+                "downhill_distance": 0.0,
+            }
+
+        emit("ALTITUDE", {
             "altitude_graph": (
                 [
                     round(v, 2)
                     for v in cleaned_data["enhanced_altitude"].fillna(0).tolist()
                 ]
-                if "enhanced_altitude" in cleaned_data.columns
+                if raw_data
+                and wanted("ALTITUDE", "altitude_graph")
+                and "enhanced_altitude" in cleaned_data.columns
+                else None
+            ),
+            "vam_graph": (
+                metrics["vam"]
+                if wanted("ALTITUDE", "vam_graph")
                 else None
             ),
-            "vam_graph": calculate_vam(cleaned_data["altitude"]),
             "elevation": Elev,
             # --more--
             # 最大坡度
@@ -680,13 +1270,7 @@ async def upload_fit(
             "downhill_distance": slope_segment_result["downhill_distance"],
             # 上坡距离
             # 下坡距离
-        },
-        "ELSE": {
-            "avg_temperature": AvgT,
-            "min_temperature": MinT,
-            "max_temperature": MaxT,
-        },
-    }
+        })
 
     # region
     """
@@ -781,4 +1365,15 @@ async def upload_fit(
     """
     # endregion
 
+    # 按固定顺序返回各部分
+    result_dict = {
+        key: result_dict[key] for key in ["activity_id", *SECTION_RECORD_FIELDS] if key in result_dict
+    }
+    if timing:
+        result_dict["timings"] = {
+            name: round(seconds * 1000, 3) for name, seconds in metrics.timings.items()
+        }
+    result_dict = jsonable_encoder(result_dict)
+    if use_cache:
+        analysis_cache.set(cache_key, result_dict)
     return result_dict
@@ -19,6 +19,7 @@ class HeartRateConfig(BaseModel):
     threshold_bpm: int
     resting_bpm: int
     hrrc_bpm: int
+    hrrc_window: int = 60 # 心率恢复能力的观察窗口（秒）
     warmup_time: int # 热身时间（分钟）
     cooldown_time: int # 冷却时间（分钟）
 
@@ -20,6 +20,7 @@ class HeartRateConfigUpdate(BaseModel):
     threshold_bpm: Optional[int] = None
     resting_bpm: Optional[int] = None
     hrrc_bpm: Optional[int] = None
+    hrrc_window: Optional[int] = None
     warmup_time: Optional[int] = None
     cooldown_time: Optional[int] = None
 
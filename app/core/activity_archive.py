@@ -0,0 +1,155 @@
+import os
+import threading
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.utils import file_lock
+
+# 归档的通道，与 upload_fit 从 cleaned_data 中读取的数值通道一致
+ARCHIVE_CHANNELS = [
+    "power",
+    "heart_rate",
+    "cadence",
+    "enhanced_speed",
+    "enhanced_altitude",
+    "temperature",
+]
+
+# 偏移表记录：活动 ID、在通道文件中的起始采样位置、采样数、开始时间（epoch 秒）
+OFFSET_DTYPE = np.dtype([
+    ("activity_id", "S64"),
+    ("offset", "<i8"),
+    ("length", "<i8"),
+    ("start_time", "<i8"),
+])
+
+CHANNEL_DTYPE = np.dtype("<f4")
+
+# 默认不归档，设置环境变量 ACTIVITY_ARCHIVE_DIR（如 data/archive）后启用
+ARCHIVE_DIR = os.getenv("ACTIVITY_ARCHIVE_DIR") or None
+
+
+class ActivityArchive:
+    """
+    只追加的内存映射活动归档
+    每个通道一个 float32 数据文件（缺失值为 NaN），所有活动首尾相接；
+    offsets.bin 为定长记录的偏移表。历史统计通过 np.memmap 直接切片读取，
+    不复制数据，也不为每个活动单独分配内存。
+    偏移记录在通道数据写完之后才追加，读取方只会看到完整写入的活动。
+    """
+
+    def __init__(self, root_dir: str, channels=ARCHIVE_CHANNELS):
+        self.root_dir = root_dir
+        self.channels = list(channels)
+        self.offsets_path = os.path.join(root_dir, "offsets.bin")
+        self._lock = threading.Lock()
+        os.makedirs(root_dir, exist_ok=True)
+        self._ids = {bytes(record["activity_id"]).decode() for record in self.table()}
+
+    def _channel_path(self, channel: str) -> str:
+        return os.path.join(self.root_dir, f"{channel}.f32")
+
+    def _samples(self) -> int:
+        table = self.table()
+        if len(table) == 0:
+            return 0
+        last = table[-1]
+        return int(last["offset"] + last["length"])
+
+    def __contains__(self, activity_id: str) -> bool:
+        return activity_id in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def append(self, activity_id: str, streams: pd.DataFrame) -> bool:
+        """
+        追加一个活动的通道数据，已存在的活动不重复写入
+
+        Args:
+            activity_id (str): 活动 ID（上传文件内容的 SHA-256）
+            streams (pd.DataFrame): 清洗后的数据流（clean_fit_data 的输出）
+
+        Returns:
+            bool: 是否写入
+        """
+        length = len(streams)
+        start_time = 0
+        if "timestamp" in streams.columns and length:
+            first = streams["timestamp"].dropna()
+            if not first.empty:
+                start_time = int(first.iloc[0].timestamp())
+
+        with self._lock, file_lock(f"{self.offsets_path}.lock"):
+            # 其他进程可能已追加活动，加锁后重新读取偏移表
+            self._ids.update(bytes(record["activity_id"]).decode() for record in self.table())
+            if activity_id in self._ids:
+                return False
+            offset = self._samples()
+            for channel in self.channels:
+                if channel in streams.columns:
+                    values = pd.to_numeric(streams[channel], errors="coerce").to_numpy(dtype=CHANNEL_DTYPE)
+                else:
+                    values = np.full(length, np.nan, dtype=CHANNEL_DTYPE)
+                with open(self._channel_path(channel), "r+b" if os.path.exists(self._channel_path(channel)) else "wb") as f:
+                    # 从偏移表记录的位置写入，覆盖上次中断时可能残留的半截数据
+                    f.seek(offset * CHANNEL_DTYPE.itemsize)
+                    f.write(values.tobytes())
+                    f.truncate()
+
+            record = np.array([(activity_id.encode(), offset, length, start_time)], dtype=OFFSET_DTYPE)
+            with open(self.offsets_path, "ab") as f:
+                f.write(record.tobytes())
+            self._ids.add(activity_id)
+        return True
+
+    def table(self) -> np.ndarray:
+        """
+        偏移表（只读内存映射），字段见 OFFSET_DTYPE
+        """
+        if not os.path.exists(self.offsets_path) or os.path.getsize(self.offsets_path) == 0:
+            return np.zeros(0, dtype=OFFSET_DTYPE)
+        count = os.path.getsize(self.offsets_path) // OFFSET_DTYPE.itemsize
+        return np.memmap(self.offsets_path, dtype=OFFSET_DTYPE, mode="r", shape=(count,))
+
+    def channel(self, channel: str) -> np.ndarray:
+        """
+        整个通道的只读内存映射，覆盖偏移表中已提交的全部活动
+        """
+        samples = self._samples()
+        if samples == 0:
+            return np.zeros(0, dtype=CHANNEL_DTYPE)
+        return np.memmap(self._channel_path(channel), dtype=CHANNEL_DTYPE, mode="r", shape=(samples,))
+
+    def get(self, activity_id: str, channel: str) -> Optional[np.ndarray]:
+        """
+        单个活动某通道的数据视图，不复制
+        """
+        table = self.table()
+        matches = np.nonzero(table["activity_id"] == activity_id.encode())[0]
+        if len(matches) == 0:
+            return None
+        record = table[matches[0]]
+        data = self.channel(channel)
+        return data[record["offset"]:record["offset"] + record["length"]]
+
+    def iter_channel(
+        self, channel: str, start_time: Optional[int] = None, end_time: Optional[int] = None
+    ) -> Iterator[Tuple[str, int, np.ndarray]]:
+        """
+        按偏移表依次产出 (活动 ID, 开始时间, 通道数据视图)，可按开始时间（epoch 秒）筛选
+        """
+        table = self.table()
+        data = self.channel(channel)
+        for record in table:
+            if start_time is not None and record["start_time"] < start_time:
+                continue
+            if end_time is not None and record["start_time"] > end_time:
+                continue
+            offset, length = int(record["offset"]), int(record["length"])
+            yield bytes(record["activity_id"]).decode(), int(record["start_time"]), data[offset:offset + length]
+
+
+activity_archive = ActivityArchive(ARCHIVE_DIR) if ARCHIVE_DIR else None
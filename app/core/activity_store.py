@@ -0,0 +1,261 @@
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.core.pyramid import PYRAMID_CHANNELS, build_pyramid, choose_bucket, window_slice
+
+# npz 中保存会话信息的键，与数据流列名区分
+_SESSION_KEY = "__session__"
+
+# 默认不保存，设置环境变量 ACTIVITY_STORE_DIR（如 data/activities）后启用
+STORE_DIR = os.getenv("ACTIVITY_STORE_DIR") or None
+
+# 早期版本把所有活动的元数据保存在一个 index.json 中，启动时拆分为逐活动的元数据文件
+_LEGACY_INDEX = "index.json"
+
+
+def _encode_objects(values) -> np.ndarray:
+    # object 列（如 left_right_balance 中混有整数和字符串）以 JSON 文本保存，读取时无需 pickle
+    return np.array(json.dumps(list(values), ensure_ascii=False, default=str))
+
+
+def _decode_objects(encoded: np.ndarray) -> np.ndarray:
+    values = json.loads(encoded.item())
+    return np.fromiter(values, dtype=object, count=len(values))
+
+
+class ActivityStore:
+    """
+    清洗后数据流的持久化列式存储
+    每个活动保存为 {activity_id}.npz（每列一个类型化数组），
+    元数据（开始时间、采样数、列名等）单独保存为 {activity_id}.json，最后写入，存在即表示活动完整，
+    之后的重新分析、历史查询和曲线读取直接读取列数据，不再解码 FIT
+    保存一个活动只写它自己的文件，不需要全局锁；读取的元数据按文件修改时间缓存在进程内
+    """
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+        self._lock = threading.Lock()
+        # activity_id -> (元数据文件的 st_mtime_ns, 元数据)
+        self._metadata = {}
+        os.makedirs(root_dir, exist_ok=True)
+        self._split_legacy_index()
+
+    def _activity_path(self, activity_id: str) -> str:
+        return os.path.join(self.root_dir, f"{activity_id}.npz")
+
+    def _pyramid_dir(self, activity_id: str) -> str:
+        return os.path.join(self.root_dir, f"{activity_id}.pyramid")
+
+    def _metadata_path(self, activity_id: str) -> str:
+        return os.path.join(self.root_dir, f"{activity_id}.json")
+
+    def _write_metadata(self, activity_id: str, entry: dict) -> None:
+        path = self._metadata_path(activity_id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def _split_legacy_index(self) -> None:
+        legacy_path = os.path.join(self.root_dir, _LEGACY_INDEX)
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+        for activity_id, entry in index.items():
+            if not os.path.exists(self._metadata_path(activity_id)):
+                self._write_metadata(activity_id, entry)
+        os.replace(legacy_path, f"{legacy_path}.migrated")
+
+    def exists(self, activity_id: str) -> bool:
+        return os.path.exists(self._activity_path(activity_id))
+
+    def save(
+        self,
+        activity_id: str,
+        streams: pd.DataFrame,
+        session: Optional[pd.DataFrame] = None,
+        metadata: Optional[dict] = None,
+        fields: Optional[Iterable[str]] = None,
+    ) -> dict:
+        """
+        保存一个活动的数据流（clean_fit_data 的输出）、会话信息和元数据
+
+        Args:
+            activity_id (str): 活动 ID（上传文件内容的 SHA-256）
+            streams (pd.DataFrame): 清洗后的数据流
+            session (pd.DataFrame): parse_fit_session 的结果，可选
+            metadata (dict): 额外写入的元数据，如文件名
+            fields (Iterable[str]): 解析时使用的 record 字段白名单，None 表示全部字段
+
+        Returns:
+            dict: 写入的元数据
+        """
+        arrays = {}
+        for name in streams.columns:
+            values = streams[name].to_numpy()
+            arrays[name] = _encode_objects(values) if values.dtype == object else values
+        if session is not None and not session.empty:
+            arrays[_SESSION_KEY] = np.array(
+                json.dumps(session.iloc[:1].to_dict(orient="records")[0], ensure_ascii=False, default=str)
+            )
+
+        path = self._activity_path(activity_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+        entry = {
+            "samples": int(len(streams)),
+            "columns": [str(name) for name in streams.columns],
+            "object_columns": [str(name) for name in streams.columns if streams[name].dtype == object],
+            "fields": sorted(fields) if fields is not None else None,
+            "start_time": None,
+            "end_time": None,
+            "saved_at": time.time(),
+        }
+        if "timestamp" in streams.columns and len(streams):
+            timestamps = streams["timestamp"].dropna()
+            if not timestamps.empty:
+                entry["start_time"] = timestamps.iloc[0].isoformat()
+                entry["end_time"] = timestamps.iloc[-1].isoformat()
+        entry.update(metadata or {})
+
+        self.save_pyramids(activity_id, streams)
+        self._write_metadata(activity_id, entry)
+        return entry
+
+    def save_pyramids(self, activity_id: str, streams: pd.DataFrame) -> None:
+        """
+        为数值通道预聚合多分辨率 min / mean / max 金字塔（见 app.core.pyramid），
+        每层保存为 {activity_id}.pyramid/{channel}_{bucket}s.npy，读取时间窗口时内存映射切片
+        """
+        directory = self._pyramid_dir(activity_id)
+        tmp_dir = f"{directory}.{os.getpid()}.tmp"
+        os.makedirs(tmp_dir, exist_ok=True)
+        for channel in PYRAMID_CHANNELS:
+            if channel not in streams.columns:
+                continue
+            values = pd.to_numeric(streams[channel], errors="coerce").to_numpy(dtype=float)
+            for bucket, level in build_pyramid(values).items():
+                np.save(os.path.join(tmp_dir, f"{channel}_{bucket}s.npy"), level)
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.replace(tmp_dir, directory)
+
+    def load_window(
+        self, activity_id: str, channel: str, start: float = 0, end: Optional[float] = None, width: int = 1000
+    ) -> Optional[dict]:
+        """
+        读取 [start, end) 秒内的预聚合数据，按 width（图表像素宽度）选择分辨率，
+        只读取窗口内的桶，不重新计算完整序列
+        活动或通道不存在时返回 None
+
+        Returns:
+            dict: bucket（桶大小，秒）、first（首个桶的序号）和 (桶数, 3) 的 min / mean / max 数组 values
+        """
+        entry = self.get_metadata(activity_id)
+        if entry is None or channel not in PYRAMID_CHANNELS or not self.exists(activity_id):
+            return None
+        directory = self._pyramid_dir(activity_id)
+        if not os.path.isdir(directory):
+            # 早于金字塔功能保存的活动，首次查询时补建
+            self.save_pyramids(activity_id, self.load_streams(activity_id))
+
+        span = (entry["samples"] if end is None else end) - start
+        bucket = choose_bucket(span, width)
+        path = os.path.join(directory, f"{channel}_{bucket}s.npy")
+        if not os.path.exists(path):
+            return None
+        level = np.load(path, mmap_mode="r")
+        window = window_slice(bucket, start, end, len(level))
+        return {"bucket": bucket, "first": window.start, "values": np.asarray(level[window])}
+
+    def load_streams(self, activity_id: str, columns: Optional[Iterable[str]] = None) -> Optional[pd.DataFrame]:
+        """
+        读取活动的数据流，只解压请求的列
+        活动不存在，或保存时的字段白名单不包含请求的列时返回 None
+        """
+        entry = self.get_metadata(activity_id)
+        if entry is None or not self.exists(activity_id):
+            return None
+        saved_fields = entry.get("fields")
+        if columns is None:
+            names = entry["columns"]
+        else:
+            columns = set(columns)
+            if saved_fields is not None and not columns <= set(saved_fields):
+                return None
+            names = [name for name in entry["columns"] if name in columns]
+
+        object_columns = set(entry.get("object_columns", []))
+        data = {}
+        with np.load(self._activity_path(activity_id)) as npz:
+            for name in names:
+                values = npz[name]
+                data[name] = _decode_objects(values) if name in object_columns else values
+        return pd.DataFrame(data, copy=False)
+
+    def load_session(self, activity_id: str) -> pd.DataFrame:
+        """
+        读取保存的会话信息（时间字段为 ISO 字符串），不存在时返回空 DataFrame
+        """
+        if not self.exists(activity_id):
+            return pd.DataFrame()
+        with np.load(self._activity_path(activity_id)) as npz:
+            if _SESSION_KEY not in npz.files:
+                return pd.DataFrame()
+            return pd.DataFrame([json.loads(npz[_SESSION_KEY].item())])
+
+    def get_metadata(self, activity_id: str) -> Optional[dict]:
+        """
+        读取一个活动的元数据，文件未变化时直接返回缓存，不存在时返回 None
+        """
+        path = self._metadata_path(activity_id)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._metadata.get(activity_id)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._metadata[activity_id] = (mtime, entry)
+        return entry
+
+    def list_activities(self, start: Optional[str] = None, end: Optional[str] = None) -> dict:
+        """
+        按开始时间（ISO 字符串）筛选已保存的活动
+        """
+        result = {}
+        for name in sorted(os.listdir(self.root_dir)):
+            if not name.endswith(".json"):
+                continue
+            activity_id = name[:-len(".json")]
+            entry = self.get_metadata(activity_id)
+            if entry is None:
+                continue
+            start_time = entry.get("start_time") or ""
+            if start and start_time < start:
+                continue
+            if end and start_time > end:
+                continue
+            result[activity_id] = entry
+        return result
+
+
+activity_store = ActivityStore(STORE_DIR) if STORE_DIR else None
@@ -0,0 +1,225 @@
+import datetime
+import os
+import threading
+from typing import Optional
+
+import numpy as np
+
+from app.core.power import log_duration_grid, mean_max_power
+from app.core.utils import file_lock
+
+# 最佳功率索引的持续时间网格：1 秒到 10 小时的对数间隔（约 100 个点）
+BEST_POWER_DURATIONS = log_duration_grid(10 * 3600)
+
+# 查询时返回的时间范围（最近 N 天），另有 all_time 和 season
+BEST_POWER_WINDOWS = {"last_42_days": 42, "last_90_days": 90, "last_365_days": 365}
+
+# 赛季开始的月-日，默认为每年 1 月 1 日
+SEASON_START = os.getenv("BEST_POWER_SEASON_START", "01-01")
+
+# 默认不记录，设置环境变量 BEST_POWER_INDEX（如 data/best_power.bin）后启用
+BEST_POWER_INDEX = os.getenv("BEST_POWER_INDEX") or None
+
+
+class BestPowerIndexMismatch(Exception):
+    """
+    索引文件的持续时间网格与当前网格不一致，需要通过 rebuild 重建
+    """
+
+
+def epoch_day(value) -> int:
+    """
+    datetime / pandas Timestamp / epoch 秒转为 UTC 日序号（1970-01-01 为 0）
+    """
+    if hasattr(value, "timestamp"):
+        value = value.timestamp()
+    return int(value // 86400)
+
+
+def season_start_day(as_of_day: int, season_start: str = SEASON_START) -> int:
+    """
+    as_of_day 所在赛季的开始日序号
+    """
+    month, day = (int(part) for part in season_start.split("-"))
+    as_of = datetime.date(1970, 1, 1) + datetime.timedelta(days=as_of_day)
+    start = datetime.date(as_of.year, month, day)
+    if start > as_of:
+        start = datetime.date(as_of.year - 1, month, day)
+    return (start - datetime.date(1970, 1, 1)).days
+
+
+class BestPowerIndex:
+    """
+    按日分桶的最佳功率索引：内存中每天一行，为当天所有活动平均最大功率曲线的逐元素最大值，
+    查询某个时间范围时对范围内的日行取最大值，不需要重新扫描历史活动的数据流
+    索引文件只追加：文件头为持续时间网格，之后每个活动一条定长记录（活动 ID、日序号、曲线），
+    新活动只追加一条记录并更新内存中所在日期的一行；
+    多个工作进程共用同一文件，每次访问只读取其他进程在上次读取位置之后追加的记录
+    """
+
+    def __init__(self, path: str, durations: np.ndarray = BEST_POWER_DURATIONS):
+        self.path = path
+        self.durations = np.asarray(durations, dtype="<i4")
+        self.header_size = 4 + self.durations.nbytes
+        self.record_dtype = np.dtype([
+            ("activity_id", "S64"),
+            ("day", "<i4"),
+            ("curve", "<f4", (len(self.durations),)),
+        ])
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._reset()
+
+    def _reset(self) -> None:
+        self._days = np.zeros(0, dtype=np.int32)
+        self._daily = np.zeros((0, len(self.durations)), dtype=np.float32)
+        self._ids = set()
+        # 已读取到的文件位置，文件被 rebuild 替换后（inode 变化或变短）从头读取
+        self._offset = 0
+        self._inode = None
+
+    def _header(self) -> bytes:
+        return np.array([len(self.durations)], dtype="<i4").tobytes() + self.durations.tobytes()
+
+    def _merge(self, days: np.ndarray, curves: np.ndarray) -> None:
+        # 新记录先按日期取逐元素最大值，再并入已有的日行
+        new_days, inverse = np.unique(days, return_inverse=True)
+        rows = np.full((len(new_days), len(self.durations)), np.nan, dtype=np.float32)
+        np.fmax.at(rows, inverse, curves)
+        position = np.searchsorted(self._days, new_days)
+        exists = position < len(self._days)
+        exists[exists] = self._days[position[exists]] == new_days[exists]
+        self._daily[position[exists]] = np.fmax(self._daily[position[exists]], rows[exists])
+        if not exists.all():
+            days = np.concatenate((self._days, new_days[~exists]))
+            order = np.argsort(days, kind="stable")
+            self._days = days[order]
+            self._daily = np.concatenate((self._daily, rows[~exists]))[order]
+
+    def _sync(self) -> None:
+        """
+        读取其他进程追加的记录（调用方持有 self._lock）
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            if self._offset:
+                self._reset()
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            self._reset()
+            self._inode = stat.st_ino
+        complete = self.header_size + (stat.st_size - self.header_size) // self.record_dtype.itemsize * self.record_dtype.itemsize
+        if stat.st_size < self.header_size or complete <= self._offset:
+            return
+        with open(self.path, "rb") as f:
+            if self._offset == 0:
+                if f.read(self.header_size) != self._header():
+                    raise BestPowerIndexMismatch(
+                        f"{self.path} was built with a different duration grid, rebuild the best power index"
+                    )
+                self._offset = self.header_size
+            f.seek(self._offset)
+            records = np.frombuffer(f.read(complete - self._offset), dtype=self.record_dtype)
+        self._offset = complete
+        self._ids.update(activity_id.decode() for activity_id in records["activity_id"].tolist())
+        self._merge(records["day"], records["curve"])
+
+    def __contains__(self, activity_id: str) -> bool:
+        with self._lock:
+            self._sync()
+            return activity_id in self._ids
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._sync()
+            return len(self._ids)
+
+    def curve_for(self, power) -> np.ndarray:
+        """
+        一个活动在索引网格上的平均最大功率（float32，超过活动时长的部分为 NaN）
+        """
+        return mean_max_power(power, self.durations).astype(np.float32)
+
+    def update(self, activity_id: str, day: int, curve: np.ndarray) -> bool:
+        """
+        把一个活动的曲线（curve_for 的结果）按逐元素最大值并入所在日期，已写入的活动跳过
+
+        Returns:
+            bool: 是否写入
+        """
+        record = np.zeros(1, dtype=self.record_dtype)
+        record["activity_id"] = activity_id.encode()
+        record["day"] = day
+        record["curve"] = np.asarray(curve, dtype=np.float32)
+        with self._lock, file_lock(f"{self.path}.lock"):
+            self._sync()
+            if activity_id in self._ids:
+                return False
+            with open(self.path, "r+b" if os.path.exists(self.path) else "wb") as f:
+                if self._offset == 0:
+                    f.write(self._header())
+                    self._offset = self.header_size
+                # 从最后一条完整记录之后写入，覆盖上次中断时可能残留的半截记录
+                f.seek(self._offset)
+                f.write(record.tobytes())
+                f.truncate()
+            self._inode = os.stat(self.path).st_ino
+            self._offset += self.record_dtype.itemsize
+            self._ids.add(activity_id)
+            self._merge(record["day"], record["curve"])
+        return True
+
+    def best(self, start_day: Optional[int] = None, end_day: Optional[int] = None) -> np.ndarray:
+        """
+        [start_day, end_day] 内的最佳功率曲线，没有数据的时长为 NaN
+        """
+        with self._lock:
+            self._sync()
+            days, daily = self._days, self._daily
+        lo = 0 if start_day is None else int(np.searchsorted(days, start_day, side="left"))
+        hi = len(days) if end_day is None else int(np.searchsorted(days, end_day, side="right"))
+        if hi <= lo:
+            return np.full(len(self.durations), np.nan, dtype=np.float32)
+        return np.fmax.reduce(daily[lo:hi], axis=0)
+
+    def summary(self, as_of_day: Optional[int] = None) -> dict:
+        """
+        截至 as_of_day（默认今天）的 all_time、最近 42 / 90 / 365 天和本赛季的最佳功率曲线
+        """
+        if as_of_day is None:
+            as_of_day = epoch_day(datetime.datetime.now(datetime.timezone.utc))
+        curves = {"all_time": self.best(None, as_of_day)}
+        for name, days in BEST_POWER_WINDOWS.items():
+            curves[name] = self.best(as_of_day - days + 1, as_of_day)
+        curves["season"] = self.best(season_start_day(as_of_day), as_of_day)
+        return curves
+
+    def rebuild(self, archive) -> int:
+        """
+        从活动归档（ActivityArchive）重新建立索引，用于首次启用或持续时间网格变化后
+        新索引先写入临时文件再替换，重建期间查询仍使用旧索引
+
+        Returns:
+            int: 写入的活动数
+        """
+        records = []
+        for activity_id, start_time, power in archive.iter_channel("power"):
+            record = np.zeros(1, dtype=self.record_dtype)
+            record["activity_id"] = activity_id.encode()
+            record["day"] = epoch_day(start_time)
+            record["curve"] = self.curve_for(power)
+            records.append(record)
+        records = np.concatenate(records) if records else np.zeros(0, dtype=self.record_dtype)
+        with self._lock, file_lock(f"{self.path}.lock"):
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(self._header())
+                f.write(records.tobytes())
+            os.replace(tmp_path, self.path)
+            self._reset()
+            self._sync()
+        return len(records)
+
+
+best_power_index = BestPowerIndex(BEST_POWER_INDEX) if BEST_POWER_INDEX else None
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Optional
+
+# 影响分析结果的用户配置部分，任一值变化都会使缓存失效
+CONFIG_FINGERPRINT_KEYS = ["weight", "power", "heart_rate"]
+
+
+def hash_fit_upload(fileobj: BinaryIO, chunk_size: int = 1024 * 1024) -> str:
+    """
+    计算上传文件内容的 SHA-256，读取完成后把文件指针移回开头
+    """
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def config_fingerprint(user_config: dict) -> str:
+    """
+    对 FTP、W'、心率阈值、体重等配置做指纹
+    """
+    relevant = {key: user_config.get(key) for key in CONFIG_FINGERPRINT_KEYS}
+    payload = json.dumps(relevant, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def analysis_cache_key(file_digest: str, user_config: dict, params: Optional[dict] = None) -> str:
+    """
+    缓存键 = 文件内容哈希 + 配置指纹 + 请求参数
+    """
+    key = f"{file_digest}-{config_fingerprint(user_config)}"
+    if params:
+        payload = json.dumps(params, sort_keys=True)
+        key += "-" + hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+    return key
+
+
+class AnalysisCache:
+    """
+    两级分析结果缓存：进程内 LRU + 可选的磁盘缓存（按总大小淘汰最久未访问的条目）
+    缓存的结果必须可以 JSON 序列化
+    """
+
+    def __init__(self, max_entries: int = 64, disk_dir: Optional[str] = None,
+                 disk_max_bytes: int = 512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def get(self, key: str):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)  # 更新访问时间，供淘汰时参考
+        except (OSError, ValueError):
+            return None
+        self._set_memory(key, value)
+        return value
+
+    def set(self, key: str, value) -> None:
+        self._set_memory(key, value)
+        if self.disk_dir:
+            self._write_disk(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.disk_dir, name))
+
+    def _set_memory(self, key: str, value) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _write_disk(self, key: str, value) -> None:
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        entries = []
+        total = 0
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.disk_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
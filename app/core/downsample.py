@@ -0,0 +1,80 @@
+import numpy as np
+
+
+def _endpoints(n: int, max_points: int) -> np.ndarray:
+    # 点数不足以分桶时只保留首尾点（不超过 max_points 个）
+    return np.unique([0, n - 1])[:max(max_points, 0)]
+
+
+def lttb_indices(values, max_points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets 降采样，返回保留点的下标（横轴为采样序号）
+    首尾点始终保留，中间每个桶保留与前一个已选点、下一个桶均值构成三角形面积最大的点
+
+    Args:
+        values: 数值序列
+        max_points (int): 最多保留的点数
+
+    Returns:
+        np.ndarray: 递增的下标数组
+    """
+    y = np.asarray(values, dtype=float)
+    n = len(y)
+    if max_points >= n:
+        return np.arange(n)
+    if max_points < 3:
+        return _endpoints(n, max_points)
+
+    # 中间 n - 2 个点均分为 max_points - 2 个桶，桶均值用累加和一次算出
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    starts, ends = edges[:-1], edges[1:]
+    csum = np.concatenate(([0.0], np.cumsum(y)))
+    avg_y = (csum[ends] - csum[starts]) / (ends - starts)
+    avg_x = (starts + ends - 1) / 2.0
+    next_x = np.append(avg_x[1:], n - 1)
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(max_points, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(len(starts)):
+        xs = np.arange(starts[i], ends[i])
+        area = np.abs((a - next_x[i]) * (y[xs] - y[a]) - (a - xs) * (next_y[i] - y[a]))
+        a = starts[i] + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(values, max_points: int) -> np.ndarray:
+    """
+    按桶保留最小值和最大值的降采样，完全向量化，峰值一定保留
+    """
+    y = np.asarray(values, dtype=float)
+    n = len(y)
+    if max_points >= n:
+        return np.arange(n)
+    if max_points < 4:
+        return _endpoints(n, max_points)
+
+    buckets = (max_points - 2) // 2
+    edges = np.linspace(0, n, buckets + 1).astype(int)
+    width = int(np.diff(edges).max())
+    index = edges[:-1, None] + np.arange(width)[None, :]
+    valid = index < edges[1:, None]
+    window = y[np.minimum(index, n - 1)]
+    rows = np.arange(buckets)
+    low = index[rows, np.where(valid, window, np.inf).argmin(axis=1)]
+    high = index[rows, np.where(valid, window, -np.inf).argmax(axis=1)]
+    return np.unique(np.concatenate(([0, n - 1], low, high)))
+
+
+DOWNSAMPLE_METHODS = {
+    "lttb": lttb_indices,
+    "minmax": minmax_indices,
+}
+
+
+def downsample_indices(values, max_points: int, method: str = "lttb") -> np.ndarray:
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"method must be one of: {', '.join(DOWNSAMPLE_METHODS)}")
+    return DOWNSAMPLE_METHODS[method](values, max_points)
@@ -0,0 +1,126 @@
+from typing import Dict, Optional
+
+import numpy as np
+
+# 客户端通过 Accept 请求 MessagePack 编码时可用的媒体类型，默认仍返回 JSON
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+# 数值序列编码为 MessagePack 扩展类型，数据为小端序的类型化数组，
+# 客户端按扩展类型编号直接构造 Uint8Array / Int16Array / Float32Array 等
+EXT_TYPES = {
+    np.dtype("uint8"): 1,
+    np.dtype("<i2"): 2,
+    np.dtype("<u2"): 3,
+    np.dtype("<i4"): 4,
+    np.dtype("<f4"): 5,
+}
+
+# 只有长度不小于该值的数值列表按类型化数组编码，短列表直接编码
+COMPACT_MIN_LENGTH = 32
+
+_INTEGER_DTYPES = [np.dtype("uint8"), np.dtype("<i2"), np.dtype("<u2"), np.dtype("<i4")]
+
+
+def parse_accept(accept: Optional[str]) -> Dict[str, float]:
+    """
+    解析 Accept 头，返回 {媒体范围: q 值}（媒体范围小写，不含参数），同一范围出现多次时取最大的 q 值
+    q 值无法解析的媒体范围忽略
+    """
+    ranges: Dict[str, float] = {}
+    for item in (accept or "").split(","):
+        media_range, *params = [part.strip() for part in item.split(";")]
+        if not media_range:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    quality = None
+                break
+        if quality is not None:
+            media_range = media_range.lower()
+            ranges[media_range] = max(quality, ranges.get(media_range, 0.0))
+    return ranges
+
+
+def _quality(ranges: Dict[str, float], media_type: str) -> float:
+    # 按最具体的匹配取 q 值：完整类型 > type/* > */*，都不匹配时为 0
+    for candidate in (media_type, media_type.split("/")[0] + "/*", "*/*"):
+        if candidate in ranges:
+            return ranges[candidate]
+    return 0.0
+
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    """
+    按 Accept 的 q 值协商：显式列出的 MessagePack 媒体类型 q 值大于 0 且不低于 JSON 的 q 值，
+    并且已安装 msgpack 时返回 True；通配符只匹配默认的 JSON
+    """
+    ranges = parse_accept(accept)
+    msgpack_quality = max(ranges.get(media_type, 0.0) for media_type in MSGPACK_MEDIA_TYPES)
+    if msgpack_quality <= 0 or msgpack_quality < _quality(ranges, "application/json"):
+        return False
+    try:
+        import msgpack  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def compact_series(values: list) -> Optional[np.ndarray]:
+    """
+    把数值列表转为能精确表示的最小类型化数组（如功率为 int16、心率为 uint8），
+    含小数的序列使用 float32；非数值列表返回 None
+    """
+    if len(values) < COMPACT_MIN_LENGTH:
+        return None
+    array = np.asarray(values)
+    if array.ndim != 1 or array.dtype.kind not in "iuf":
+        return None
+    if array.dtype.kind == "f":
+        if not np.isfinite(array).all() or not (array == np.rint(array)).all():
+            return array.astype("<f4")
+    low, high = array.min(), array.max()
+    for dtype in _INTEGER_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return array.astype(dtype)
+    return array.astype("<f4")
+
+
+def pack_msgpack(result) -> bytes:
+    """
+    把分析结果编码为 MessagePack，长数值序列编码为类型化数组扩展类型（见 EXT_TYPES）
+    """
+    import msgpack
+
+    def compact(value):
+        if isinstance(value, dict):
+            return {key: compact(item) for key, item in value.items()}
+        if isinstance(value, list):
+            array = compact_series(value)
+            if array is None:
+                return [compact(item) for item in value]
+            return msgpack.ExtType(EXT_TYPES[array.dtype], array.tobytes())
+        return value
+
+    return msgpack.packb(compact(result), use_bin_type=True)
+
+
+def unpack_msgpack(data: bytes):
+    """
+    pack_msgpack 的逆过程，类型化数组还原为 numpy 数组（用于测试和 Python 客户端）
+    """
+    import msgpack
+
+    dtypes = {code: dtype for dtype, code in EXT_TYPES.items()}
+
+    def ext_hook(code, payload):
+        if code in dtypes:
+            return np.frombuffer(payload, dtype=dtypes[code])
+        return msgpack.ExtType(code, payload)
+
+    return msgpack.unpackb(data, ext_hook=ext_hook, raw=False)
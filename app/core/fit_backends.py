@@ -0,0 +1,103 @@
+# type: ignore
+# pyright: reportGeneralTypeIssues=false
+
+import io
+import os
+from datetime import datetime
+from typing import BinaryIO, Iterator, Tuple, Union
+
+
+# FIT 数据来源：文件路径、内存中的字节（bytes / bytearray / memoryview）或可 seek 的文件对象
+FitSource = Union[str, bytes, bytearray, memoryview, BinaryIO]
+
+# 默认解码后端，可通过环境变量 FIT_DECODER_BACKEND 选择 fitparse / fitdecode / garmin
+# fitdecode 在 test/bench_fit_backends.py 中最快，与 fitparse 的输出一致性由 test/test_fit_backends.py 检查
+DEFAULT_FIT_BACKEND = os.getenv("FIT_DECODER_BACKEND", "fitdecode")
+
+
+def _open_fit_source(source: FitSource):
+    """
+    把 FitSource 转为可直接读取的对象，内存数据和文件对象都原地解析，不落盘
+    注意：fitparse 读到文件末尾后会关闭传入的文件对象
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    if hasattr(source, "read") and hasattr(source, "seek"):
+        source.seek(0)
+    return source
+
+
+def _naive_utc(value):
+    # fitdecode 和 Garmin SDK 返回带 UTC 时区的时间，统一为与 fitparse 相同的无时区 UTC 时间
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.replace(tzinfo=None)
+    return value
+
+
+def iter_fitparse(source: FitSource) -> Iterator[Tuple[str, Iterator]]:
+    from fitparse import FitFile
+
+    fitfile = FitFile(_open_fit_source(source))
+    for message in fitfile.get_messages():
+        yield message.name, ((d.name, d.value) for d in message)
+
+
+def iter_fitdecode(source: FitSource) -> Iterator[Tuple[str, Iterator]]:
+    import fitdecode
+
+    with fitdecode.FitReader(_open_fit_source(source)) as reader:
+        for frame in reader:
+            if frame.frame_type != fitdecode.FIT_FRAME_DATA:
+                continue
+            yield frame.name, ((d.name, _naive_utc(d.value)) for d in frame.fields)
+
+
+def iter_garmin(source: FitSource) -> Iterator[Tuple[str, Iterator]]:
+    from garmin_fit_sdk import Decoder, Stream
+
+    source = _open_fit_source(source)
+    if isinstance(source, str):
+        stream = Stream.from_file(source)
+    elif isinstance(source, io.BytesIO):
+        stream = Stream.from_bytes_io(source)
+    else:
+        stream = Stream.from_byte_array(bytearray(source.read()))
+    messages, errors = Decoder(stream).read()
+    if errors:
+        raise ValueError(f"FIT 解码失败: {errors[0]}")
+
+    # SDK 按消息类型分组返回（如 record_mesgs），未知字段以字段编号为键
+    for key, group in messages.items():
+        if not key.endswith("_mesgs"):
+            continue
+        name = key[:-len("_mesgs")]
+        for message in group:
+            yield name, (
+                (field if isinstance(field, str) else f"unknown_{field}", _naive_utc(value))
+                for field, value in message.items()
+                if field != "developer_fields"
+            )
+
+
+FIT_BACKENDS = {
+    "fitparse": iter_fitparse,
+    "fitdecode": iter_fitdecode,
+    "garmin": iter_garmin,
+}
+
+
+def iter_fit_messages(source: FitSource, backend: str = None) -> Iterator[Tuple[str, Iterator]]:
+    """
+    使用指定后端解码 FIT 数据，依次产出 (消息名, (字段名, 值) 迭代器)
+
+    Args:
+        source (FitSource): FIT 文件路径、字节数据或文件对象
+        backend (str): 后端名称，默认取 DEFAULT_FIT_BACKEND
+
+    Returns:
+        Iterator: 消息迭代器，字段迭代器需在取下一条消息前消费
+    """
+    backend = backend or DEFAULT_FIT_BACKEND
+    if backend not in FIT_BACKENDS:
+        raise ValueError(f"backend must be one of: {', '.join(FIT_BACKENDS)}")
+    return FIT_BACKENDS[backend](source)
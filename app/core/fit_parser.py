@@ -1,24 +1,303 @@
 # type: ignore
 # pyright: reportGeneralTypeIssues=false
 
-from fitparse import FitFile
+from datetime import datetime
+import numpy as np
 import pandas as pd
 
+from app.core.fit_backends import FitSource, iter_fit_messages
 
-def parse_fit_file(file_path: str) -> pd.DataFrame:
 
-    fitfile = FitFile(file_path)
-    records = []
-    for record in fitfile.get_messages('record'):
-        data = {}   
-        for d in record:
-            data[d.name] = d.value
-        records.append(data)
+# 单次解码时需要收集的消息类型
+COLLECTED_MESSAGES = (
+    "record",
+    "session",
+    "lap",
+    "file_id",
+    "activity",
+    "event",
+    "device_info",
+    "software",
+    "source",
+)
 
 
-    return pd.DataFrame(records)
+# 字段在某一行的状态：缺失 / 显式为 None / 有值
+_MISSING, _NONE, _VALUE = 0, 1, 2
+_NAT = np.iinfo(np.int64).min
+_NONE_TYPE = type(None)
+
+
+def _to_typed(values: tuple) -> tuple:
+    """
+    把一列 Python 值转换为类型化数组，返回 (kind, ndarray)
+    kind 为 none/int/float/datetime/bool/object，推断规则与 pandas 构造 DataFrame 时一致
+    """
+    count = len(values)
+    if values.count(None) == count:
+        return "none", None
+    types = set(map(type, values))
+    types.discard(_NONE_TYPE)
+    has_none = None in values
+    try:
+        if types == {int} and not has_none:
+            return "int", np.fromiter(values, dtype=np.int64, count=count)
+        if types <= {int, float}:
+            return "float", np.array(values, dtype=np.float64)
+    except OverflowError:
+        pass
+    if types == {datetime}:
+        return "datetime", np.asarray(pd.to_datetime(values), dtype="datetime64[ns]").view(np.int64)
+    if types == {bool} and not has_none:
+        return "bool", np.array(values, dtype=bool)
+    return "object", np.fromiter(values, dtype=object, count=count)
+
+
+def _to_objects(kind: str, values: np.ndarray) -> np.ndarray:
+    if kind == "datetime":
+        values = values.view("datetime64[ns]").astype("datetime64[us]")
+    return values.astype(object)
+
+
+class RecordColumns:
+    """
+    record 消息的列式收集器
+    同一字段布局的记录先以值元组暂存，每满 chunk_size 行按列批量转换，
+    写入预分配、按需倍增的类型化数组（时间戳为 int64 纳秒，数值通道为 int64/float64），
+    最后以数组视图零拷贝地生成 DataFrame，不再为每条记录构造字典、再由 pandas 推断类型。
+    整数通道不使用 uint8 / uint16：数据流直接参与功率、心率的差值运算，无符号窄类型会回绕，
+    而且 DataFrame 中的列需要与 pandas 推断的 int64 一致，窄类型在生成 DataFrame 时还要再复制一次
+    浮点通道不使用 float32：FIT 中的速度、距离、海拔是整数按比例缩放后的值，绝大多数无法用 float32 精确表示
+    生成的列与 pd.DataFrame(list_of_dicts) 的列顺序、类型和缺失值保持一致。
+    fields 为字段白名单，不在其中的字段不做类型转换也不保存。
+    """
+
+    def __init__(self, capacity: int = 4096, chunk_size: int = 4096, fields=None):
+        self.size = 0
+        self.capacity = capacity
+        self.chunk_size = chunk_size
+        self.fields = frozenset(fields) if fields is not None else None
+        # 字段名 -> [kind, values, state]
+        self.columns = {}
+        # 字段名元组 -> [(字段名, 位置), ...]，同名字段以最后一次出现为准
+        self._layouts = {}
+        # 字段名元组 -> ([行号], [值元组])
+        self._pending = {}
+        self._pending_rows = 0
+
+    def add(self, fields) -> None:
+        """
+        追加一条 record，fields 为 (字段名, 值) 的可迭代对象
+        """
+        pairs = tuple(fields)
+        row = self.size
+        self.size += 1
+        if not pairs:
+            return
+        names, values = zip(*pairs)
+        pending = self._pending.get(names)
+        if pending is None:
+            if names not in self._layouts:
+                positions = {name: i for i, name in enumerate(names)}
+                self._layouts[names] = [
+                    (name, position) for name, position in positions.items()
+                    if self.fields is None or name in self.fields
+                ]
+            pending = self._pending[names] = ([], [])
+        pending[0].append(row)
+        pending[1].append(values)
+        self._pending_rows += 1
+        if self._pending_rows >= self.chunk_size:
+            self._flush()
+
+    def _new_values(self, kind: str, capacity: int) -> np.ndarray:
+        if kind == "int":
+            return np.zeros(capacity, dtype=np.int64)
+        if kind == "float":
+            return np.full(capacity, np.nan, dtype=np.float64)
+        if kind == "datetime":
+            return np.full(capacity, _NAT, dtype=np.int64)
+        if kind == "bool":
+            return np.zeros(capacity, dtype=bool)
+        return np.full(capacity, np.nan, dtype=object)
+
+    def _grow(self, size: int) -> None:
+        capacity = self.capacity
+        while capacity < size:
+            capacity *= 2
+        for column in self.columns.values():
+            kind, values, state = column
+            new_values = self._new_values(kind, capacity)
+            new_values[:self.capacity] = values
+            new_state = np.zeros(capacity, dtype=np.uint8)
+            new_state[:self.capacity] = state
+            column[1], column[2] = new_values, new_state
+        self.capacity = capacity
+
+    def _promote(self, column: list, kind: str) -> None:
+        # 字段类型变化时整列升级：none -> 任意，int -> float，其余 -> object
+        old_kind, values, state = column
+        new_values = self._new_values(kind, self.capacity)
+        filled = state == _VALUE
+        if old_kind != "none":
+            if kind == "float":
+                new_values[filled] = values[filled]
+            else:
+                new_values[filled] = _to_objects(old_kind, values[filled])
+        if kind == "object":
+            new_values[state == _NONE] = None
+        column[0], column[1] = kind, new_values
+
+    def _write(self, name: str, rows: np.ndarray, kind: str, values) -> None:
+        column = self.columns.get(name)
+        if column is None:
+            column = ["none", self._new_values("none", self.capacity),
+                      np.zeros(self.capacity, dtype=np.uint8)]
+            self.columns[name] = column
+
+        if kind == "none":
+            column[2][rows] = _NONE
+            if column[0] == "float":
+                column[1][rows] = np.nan
+            elif column[0] == "datetime":
+                column[1][rows] = _NAT
+            elif column[0] in ("none", "object"):
+                column[1][rows] = None
+            return
+
+        target = column[0]
+        if target == "none":
+            target = kind
+        elif target != kind:
+            target = "float" if {target, kind} == {"int", "float"} else "object"
+        if target != column[0]:
+            self._promote(column, target)
+        if target == "object" and kind != "object":
+            values = _to_objects(kind, values)
+        column[1][rows] = values
+        column[2][rows] = _VALUE
+
+    def _flush(self) -> None:
+        if self.size > self.capacity:
+            self._grow(self.size)
+        for names, (rows, values) in self._pending.items():
+            rows = np.array(rows, dtype=np.int64)
+            columns = list(zip(*values))
+            for name, position in self._layouts[names]:
+                kind, typed = _to_typed(columns[position])
+                self._write(name, rows, kind, typed)
+        self._pending = {}
+        self._pending_rows = 0
+
+    def to_arrays(self) -> dict:
+        """
+        返回 {字段名: ndarray}，完整的列直接是收集缓冲区的切片视图
+        """
+        self._flush()
+        # 列顺序与 pandas 一致：按字段第一次出现的顺序
+        arrays = {}
+        for name, (kind, values, state) in self.columns.items():
+            values = values[:self.size]
+            state = state[:self.size]
+            if kind in ("int", "bool") and not (state == _VALUE).all():
+                if kind == "int":
+                    values = values.astype(np.float64)
+                    values[state != _VALUE] = np.nan
+                else:
+                    values = values.astype(object)
+                    values[state == _MISSING] = np.nan
+                    values[state == _NONE] = None
+            elif kind == "datetime":
+                values = values.view("datetime64[ns]")
+            elif kind == "none" and (state == _MISSING).any():
+                # None 与缺失混合时 pandas 推断为全 NaN 的 float64 列
+                values = np.full(self.size, np.nan, dtype=np.float64)
+            arrays[name] = values
+        return arrays
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(self.to_arrays(), copy=False)
+
+
+class FitParseResult:
+    """
+    一次解码 FIT 文件得到的结果，record 消息写入列式收集器，
+    其余消息按类型分别收集字段字典，
+    记录、会话、时间和设备信息都从这里取，不再重复打开文件
+    """
+
+    def __init__(self, record_fields=None):
+        self.records = RecordColumns(fields=record_fields)
+        self.messages = {name: [] for name in COLLECTED_MESSAGES if name != "record"}
+
+    def collect(self, name: str, fields) -> None:
+        """
+        收集一条消息，fields 为 (字段名, 值) 的可迭代对象
+        """
+        if name == "record":
+            self.records.add(fields)
+            return
+        collector = self.messages.get(name)
+        if collector is not None:
+            collector.append(dict(fields))
+
+    def to_record_dataframe(self) -> pd.DataFrame:
+        return self.records.to_dataframe()
+
+    def to_session_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(self.messages["session"])
+
+    def date_time_info(self) -> dict:
+        """
+        提取 file_id / session / activity / lap 中的日期和时间字段
+        """
+        date_time_info = {}
+        for name in ['file_id', 'session', 'activity', 'lap']:
+            for data in self.messages[name]:
+                for field_name, value in data.items():
+                    if 'time' in field_name or 'date' in field_name:
+                        date_time_info[f"{name}.{field_name}"] = value
+        return date_time_info
+
+    def device_info(self) -> dict:
+        """
+        整理设备相关信息，结构与 parse_fit_device_info 的返回值一致
+        """
+        device_info = {
+            "device_info": [dict(data) for data in self.messages["device_info"]],
+            "file_id": {},
+            "software": {},
+            "source": {}
+        }
+        for name in ["file_id", "software", "source"]:
+            for data in self.messages[name]:
+                device_info[name].update(data)
+        return device_info
+
+
+def decode_fit(source: FitSource, backend: str = None, record_fields=None) -> FitParseResult:
+    """
+    只遍历一次 FIT 消息流，把各类消息分发到对应的收集器中
+
+    Args:
+        source (FitSource): FIT 文件路径、字节数据或文件对象
+        backend (str): 解码后端（fitparse / fitdecode / garmin），默认由 FIT_DECODER_BACKEND 决定
+        record_fields (Iterable[str]): record 字段白名单，None 表示保留全部字段
+
+    Returns:
+        FitParseResult: 按消息类型收集的解析结果
+    """
+    result = FitParseResult(record_fields)
+    for name, fields in iter_fit_messages(source, backend):
+        if name not in COLLECTED_MESSAGES:
+            continue
+        result.collect(name, fields)
+    return result
+
+
+def parse_fit_file(file_path: FitSource, backend: str = None, fields=None) -> pd.DataFrame:
+    return decode_fit(file_path, backend, record_fields=fields).to_record_dataframe()
 
-import pandas as pd
 
 def clean_fit_data(
     df: pd.DataFrame,
@@ -62,38 +341,23 @@ def clean_fit_data(
     return df_clean.reset_index(drop=True)
 
 
-def get_fit_date_time_info(file_path: str) -> dict:
+def get_fit_date_time_info(file_path: FitSource, backend: str = None) -> dict:
     """
     解析 FIT 文件，提取日期和时间相关信息。
     返回字典，包含常见时间字段和值（如创建时间、开始时间等）
     """
-    fitfile = FitFile(file_path)
-    date_time_info = {}
-
-    for message in fitfile.get_messages():
-        if message.name in ['file_id', 'session', 'activity', 'lap']:
-            for field in message:
-                if 'time' in field.name or 'date' in field.name:
-                    date_time_info[f"{message.name}.{field.name}"] = field.value
-
-    return date_time_info
+    return decode_fit(file_path, backend).date_time_info()
 
-def parse_fit_session(file_path: str) -> pd.DataFrame:
-    fitfile = FitFile(file_path)
-    sessions = []
-    for session in fitfile.get_messages('session'):
-        data = {}
-        for d in session:
-            data[d.name] = d.value
-        sessions.append(data)
-    return pd.DataFrame(sessions)
+def parse_fit_session(file_path: FitSource, backend: str = None) -> pd.DataFrame:
+    return decode_fit(file_path, backend).to_session_dataframe()
 
-def parse_fit_device_info(file_path: str) -> dict:
+def parse_fit_device_info(file_path: FitSource, backend: str = None) -> dict:
     """
     解析 FIT 文件中的设备相关信息
     
     Args:
-        file_path (str): FIT 文件路径
+        file_path (FitSource): FIT 文件路径、字节数据或文件对象
+        backend (str): 解码后端，默认由 FIT_DECODER_BACKEND 决定
         
     Returns:
         dict: 包含设备信息的字典，包括：
@@ -102,45 +366,15 @@ def parse_fit_device_info(file_path: str) -> dict:
             - software: 软件信息
             - source: 数据源信息
     """
-    fitfile = FitFile(file_path)
-    device_info = {
-        "device_info": [],
-        "file_id": {},
-        "software": {},
-        "source": {}
-    }
-    
-    # 解析设备信息
-    for message in fitfile.get_messages('device_info'):
-        device_data = {}
-        for field in message:
-            device_data[field.name] = field.value
-        device_info["device_info"].append(device_data)
-    
-    # 解析文件ID信息（通常包含设备信息）
-    for message in fitfile.get_messages('file_id'):
-        for field in message:
-            device_info["file_id"][field.name] = field.value
-    
-    # 解析软件信息
-    for message in fitfile.get_messages('software'):
-        for field in message:
-            device_info["software"][field.name] = field.value
-    
-    # 解析数据源信息
-    for message in fitfile.get_messages('source'):
-        for field in message:
-            device_info["source"][field.name] = field.value
-    
-    return device_info
+    return decode_fit(file_path, backend).device_info()
 
 
-def get_device_summary(file_path: str) -> dict:
+def get_device_summary(file_path: FitSource) -> dict:
     """
     获取设备信息的摘要
     
     Args:
-        file_path (str): FIT 文件路径
+        file_path (FitSource): FIT 文件路径、字节数据或文件对象
         
     Returns:
         dict: 设备摘要信息
@@ -167,12 +401,12 @@ def get_device_summary(file_path: str) -> dict:
     return summary
 
 
-def get_device_details(file_path: str) -> list:
+def get_device_details(file_path: FitSource) -> list:
     """
     获取详细的设备信息列表
     
     Args:
-        file_path (str): FIT 文件路径
+        file_path (FitSource): FIT 文件路径、字节数据或文件对象
         
     Returns:
         list: 设备详细信息列表
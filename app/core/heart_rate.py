@@ -1,13 +1,19 @@
 import pandas as pd
-from typing import Literal, List, Tuple
+from typing import Literal, List, Optional, Tuple
 from app.core.utils import format_seconds
+from app.core.zones import (
+    HEART_RATE_ZONE_LABELS,
+    HEART_RATE_ZONE_METHODS,
+    format_zone_times,
+    heart_rate_zone_bounds,
+    heart_rate_zone_seconds,
+)
 import math
 import numpy as np
+from scipy.ndimage import minimum_filter1d
 from sklearn.linear_model import LinearRegression
 
-import json
-with open('app/config/user_config.json', 'r', encoding='utf-8') as f:
-    user_config = json.load(f)
+from app.core.user_config import user_config
 
 def avg_heart_rate(hr_data: pd.Series) -> int:
     return int(round(hr_data.mean()))
@@ -16,45 +22,12 @@ def max_heart_rate(hr_data: pd.Series) -> int:
     return int(hr_data.max())
 
 def get_heart_rate_zones(method: Literal["threshold", "max", "hrr"] = "threshold") -> dict:
-    hr_config = user_config["heart_rate"]
-    threshold = hr_config["threshold_bpm"]
-    max_bpm = hr_config["max_bpm"]
-    resting = hr_config["resting_bpm"]
-
-    zones = {}
-    
-    if method == "threshold":
-        # 基于阈值心率，5区间
-        bounds = [
-            math.floor(0.67 * threshold),
-            math.floor(0.80 * threshold),
-            math.floor(0.89 * threshold),
-            math.floor(0.97 * threshold),
-            math.floor(1.02 * threshold),
-            max_bpm
-        ]
-        labels = ["Z1", "Z2", "Z3", "Z4", "Z5"]
-
-    elif method == "max":
-        # 基于最大心率，5区间
-        bounds = [
-            math.floor(0.50 * max_bpm),
-            math.floor(0.60 * max_bpm),
-            math.floor(0.70 * max_bpm),
-            math.floor(0.80 * max_bpm),
-            math.floor(0.90 * max_bpm),
-            max_bpm
-        ]
-        labels = ["Z1", "Z2", "Z3", "Z4", "Z5"]
-
-    elif method == "hrr":
-        # 基于心率储备，5区间
-        hrr = max_bpm - resting
-        points = [0.59, 0.74, 0.84, 0.88, 0.95, 1.0]
-        bounds = [math.floor(resting + hrr * p) for p in points]
-        labels = ["Z1", "Z2", "Z3", "Z4", "Z5"]
-    else:
+    if method not in HEART_RATE_ZONE_METHODS:
         raise ValueError("method must be 'threshold', 'max', or 'hrr'")
+    # 阈值心率 / 最大心率 / 心率储备，5区间
+    bounds = heart_rate_zone_bounds(method, user_config["heart_rate"])
+    labels = HEART_RATE_ZONE_LABELS
+    zones = {}
 
     for i in range(len(labels)):
         lower = bounds[i]
@@ -63,77 +36,121 @@ def get_heart_rate_zones(method: Literal["threshold", "max", "hrr"] = "threshold
 
     return zones
 
-def heart_rate_zones(method: Literal["threshold", "max", "hrr"], hr_series: pd.Series) -> dict:
-    hr_config = user_config["heart_rate"]
-    threshold = hr_config["threshold_bpm"]
-    max_bpm = hr_config["max_bpm"]
-    resting = hr_config.get("resting_bpm", 60)
-
-    zone_bounds = []
-    zone_labels = ["Z1", "Z2", "Z3", "Z4", "Z5"]
-
-    if method == "threshold":
-        zone_bounds = [
-            math.floor(0.67 * threshold),
-            math.floor(0.80 * threshold),
-            math.floor(0.89 * threshold),
-            math.floor(0.97 * threshold),
-            math.floor(1.02 * threshold),
-            max_bpm
-        ]
-    elif method == "max":
-        zone_bounds = [
-            math.floor(0.50 * max_bpm),
-            math.floor(0.60 * max_bpm),
-            math.floor(0.70 * max_bpm),
-            math.floor(0.80 * max_bpm),
-            math.floor(0.90 * max_bpm),
-            max_bpm
-        ]
-    elif method == "hrr":
-        hrr = max_bpm - resting
-        points = [0.59, 0.74, 0.84, 0.88, 0.95, 1.0]
-        zone_bounds = [math.floor(resting + hrr * p) for p in points]
-    else:
-        raise ValueError("method must be one of: 'threshold', 'max', 'hrr'")
-
-    total_sec = len(hr_series)
-    result = {}
-
-    for i, label in enumerate(zone_labels):
-        lower = zone_bounds[i]
-        upper = zone_bounds[i + 1]
-        if i == 0:
-            mask = (hr_series >= lower) & (hr_series <= upper)
-        else:
-            mask = (hr_series > lower) & (hr_series <= upper)
+def heart_rate_zone_times(hr_series: pd.Series) -> dict:
+    """
+    三种方法（threshold / max / hrr）各 5 个心率区间的秒数，心率数据只分箱一次
+    """
+    return heart_rate_zone_seconds(hr_series, user_config["heart_rate"])
 
-        zone_sec = mask.sum()
-        percent = (zone_sec / total_sec * 100) if total_sec else 0
+def heart_rate_zones(
+    method: Literal["threshold", "max", "hrr"],
+    hr_series: pd.Series,
+    seconds: Optional[dict] = None,
+) -> dict:
+    """
+    心率区间的用时及占比，seconds 为 heart_rate_zone_times 的结果，已分箱时直接复用
+    """
+    if method not in HEART_RATE_ZONE_METHODS:
+        raise ValueError("method must be one of: 'threshold', 'max', 'hrr'")
+    if seconds is None:
+        seconds = heart_rate_zone_times(hr_series)
+    return format_zone_times(seconds[method], HEART_RATE_ZONE_LABELS, len(hr_series))
 
-        result[label] = {
-            "time": format_seconds(zone_sec),
-            "percent": f"{percent:.1f}%"
-        }
+# 心率恢复能力的默认观察窗口（秒），可通过 user_config["heart_rate"]["hrrc_window"] 修改
+HRRC_WINDOW = 60
+# 返回的最佳恢复事件数
+HRRC_EVENTS = 3
 
-    return result
+def hrrc_window() -> int:
+    return int(user_config["heart_rate"].get("hrrc_window", HRRC_WINDOW))
 
-def heart_rate_recovery_capablility(hr_data: pd.Series) -> int:
-    # 添加功能，如果最大连续数据点小于 60，则返回0
+def heart_rate_recovery_drops(hr_data: pd.Series, window: Optional[int] = None) -> np.ndarray:
+    """
+    每个采样之后 window 秒内的心率下降值（起点心率 - 随后 window 个采样的最小值），
+    只计算起点不低于阈值心率且窗口完整的采样，其余为 NaN
+    随后窗口的最小值用 minimum_filter1d 计算（O(n)，与窗口长度无关），缺失心率不参与取最小值
+    """
+    window = hrrc_window() if window is None else window
+    values = hr_data.to_numpy(dtype=float)
+    candidates = len(values) - window
+    if candidates <= 0:
+        return np.empty(0)
+
+    filled = np.where(np.isnan(values), np.inf, values)
+    # origin 使第 j 个输出为 filled[j + 1 : j + 1 + window] 的最小值
+    following_min = minimum_filter1d(filled[1:], size=window, origin=-(window // 2))[:candidates]
+    start = values[:candidates]
     threshold_bpm = user_config["heart_rate"]["threshold_bpm"]
-    hrrc_values = []
-    total_points = len(hr_data)
-
-    for i in range(total_points - 60):
-        hr_start = hr_data.iloc[i]
-        if hr_start >= threshold_bpm:
-            window = hr_data.iloc[i + 1 : i + 61]
-            if not window.empty:
-                min_hr = window.min()
-                drop = hr_start - min_hr
-                hrrc_values.append(drop)
+    with np.errstate(invalid="ignore"):
+        valid = (start >= threshold_bpm) & np.isfinite(following_min)
+    return np.where(valid, start - np.where(valid, following_min, 0.0), np.nan)
+
+def heart_rate_recovery_capablility(
+    hr_data: pd.Series,
+    window: Optional[int] = None,
+    drops: Optional[np.ndarray] = None,
+) -> int:
+    """
+    心率恢复能力：达到阈值心率后 window 秒（默认 hrrc_window）内的最大心率下降，数据不足一个窗口时返回 0
+    drops 为 heart_rate_recovery_drops 的结果，已计算时直接复用
+    """
+    if drops is None:
+        drops = heart_rate_recovery_drops(hr_data, window)
+    if len(drops) == 0 or np.isnan(drops).all():
+        return 0
+    return round(float(np.nanmax(drops)))
+
+def heart_rate_recovery_events(
+    hr_data: pd.Series,
+    timestamps: Optional[pd.Series] = None,
+    window: Optional[int] = None,
+    count: int = HRRC_EVENTS,
+    drops: Optional[np.ndarray] = None,
+) -> List[dict]:
+    """
+    下降最多的 count 次心率恢复（按下降值从大到小，窗口互不重叠）
+    每次包含 start / end（起点和最低心率的采样序号，与 heart_rate_graph 对齐）、
+    start_time / end_time（ISO 格式时间，未提供 timestamps 时为 None）、
+    start_heart_rate、min_heart_rate 和 drop
+    """
+    window = hrrc_window() if window is None else window
+    if drops is None:
+        drops = heart_rate_recovery_drops(hr_data, window)
+    if len(drops) == 0 or np.isnan(drops).all():
+        return []
 
-    return round(max(hrrc_values)) if hrrc_values else 0
+    # 每次在剩余起点中取下降最大的一个，再排除其 ±window 内的起点，直到取满 count 次
+    # （不能预先只保留 ±window 内的局部最大值：遮住某个起点的相邻峰值可能因与已选事件重叠而被排除）
+    remaining = np.where(np.isnan(drops), -np.inf, drops)
+    selected: List[int] = []
+    while len(selected) < count:
+        i = int(np.argmax(remaining))
+        if not np.isfinite(remaining[i]):
+            break
+        selected.append(i)
+        remaining[max(i - window, 0) : i + window + 1] = -np.inf
+
+    values = hr_data.to_numpy(dtype=float)
+
+    def time_at(position: int) -> Optional[str]:
+        if timestamps is None:
+            return None
+        value = timestamps.iloc[position]
+        return None if pd.isna(value) else pd.Timestamp(value).isoformat()
+
+    events = []
+    for i in selected:
+        end = i + 1 + int(np.nanargmin(values[i + 1 : i + 1 + window]))
+        events.append({
+            "start": i,
+            "end": end,
+            "start_time": time_at(i),
+            "end_time": time_at(end),
+            "start_heart_rate": int(round(values[i])),
+            "min_heart_rate": int(round(values[end])),
+            "drop": round(float(drops[i])),
+        })
+    return events
 
 def heart_rate_lag(power_data: pd.Series, heart_rate_data: pd.Series, max_lag_sec: int = 120) -> float:
 
@@ -204,13 +221,13 @@ def get_power_hr_ratio(power_series: pd.Series, hr_series: pd.Series) -> list:
 
 
 
-def decoupling_ratio(df: pd.DataFrame) -> Tuple[float, List]:
+def decoupling_ratio(power_data: pd.Series, heart_rate_data: pd.Series) -> Tuple[float, List]:
     warmup = user_config["heart_rate"]["warmup_time"]
     cooldown = user_config["heart_rate"]["cooldown_time"]
-    if len(df) <= (warmup + cooldown) * 60:
+    if len(power_data) <= (warmup + cooldown) * 60:
         return 0, []
 
-    df = df.copy()
+    df = pd.DataFrame({"power": power_data, "heart_rate": heart_rate_data})
     df["hr_smooth"] = df["heart_rate"].rolling(window=30, min_periods=1, center=True).mean()
     
     minute_groups = df.groupby(df.index // 60)  # 每分钟分组
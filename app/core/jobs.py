@@ -0,0 +1,178 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional
+
+# 默认保存在 data/jobs.sqlite3，可通过环境变量 ANALYSIS_JOB_DB 修改
+JOB_DB_PATH = os.getenv("ANALYSIS_JOB_DB", str(Path(__file__).parent.parent.parent / "data" / "jobs.sqlite3"))
+
+# 已结束的任务保留时长（秒），超过后在创建新任务时清理
+JOB_TTL_SECONDS = int(os.getenv("ANALYSIS_JOB_TTL", 24 * 3600))
+
+# 未结束的任务超过此时长（秒）没有进度也没有调度器心跳时（服务重启或进程退出时丢失的任务），
+# 查询时视为失败；排队和执行中的任务由调度器定期刷新 updated_at，不受总时长限制
+JOB_TIMEOUT_SECONDS = int(os.getenv("ANALYSIS_JOB_TIMEOUT", 600))
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    filename TEXT,
+    activity_id TEXT,
+    status TEXT NOT NULL,
+    sections TEXT NOT NULL,
+    completed_sections TEXT NOT NULL DEFAULT '[]',
+    error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    updated_at REAL
+)
+"""
+
+
+class JobStore:
+    """
+    基于 SQLite 的分析任务表，服务进程和分析工作进程各自打开连接读写，
+    单机部署无需额外的队列服务
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: int = JOB_TTL_SECONDS,
+                 timeout_seconds: int = JOB_TIMEOUT_SECONDS):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.timeout_seconds = timeout_seconds
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+            # 旧版本创建的任务表没有 updated_at
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "updated_at" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN updated_at REAL")
+
+    @contextmanager
+    def _connect(self):
+        # 每次操作使用独立的短连接，结束时提交并关闭
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create(self, filename: str, activity_id: str, sections: List[str]) -> str:
+        """
+        创建排队中的任务，返回任务 ID
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                (now - self.ttl_seconds,),
+            )
+            conn.execute(
+                "INSERT INTO jobs (id, filename, activity_id, status, sections, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, filename, activity_id, JOB_QUEUED, json.dumps(sections), now, now),
+            )
+        return job_id
+
+    def start(self, job_id: str) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, updated_at = ? WHERE id = ?",
+                (JOB_RUNNING, now, now, job_id),
+            )
+
+    def touch(self, job_ids: List[str]) -> None:
+        """
+        调度器的心跳：刷新仍在排队或执行中的任务的 updated_at，表示任务仍由存活的服务进程持有
+        """
+        if not job_ids:
+            return
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE jobs SET updated_at = ? WHERE id = ? AND status IN (?, ?)",
+                [(time.time(), job_id, JOB_QUEUED, JOB_RUNNING) for job_id in job_ids],
+            )
+
+    def section_done(self, job_id: str, section: str) -> None:
+        """
+        记录一个分析部分已完成，只由执行该任务的工作进程写入
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT completed_sections FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return
+            completed = json.loads(row["completed_sections"])
+            completed.append(section)
+            conn.execute(
+                "UPDATE jobs SET completed_sections = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(completed), time.time(), job_id),
+            )
+
+    def finish(self, job_id: str, result: dict) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, completed_sections = sections,"
+                " finished_at = ? WHERE id = ?",
+                (JOB_DONE, json.dumps(result, ensure_ascii=False), time.time(), job_id),
+            )
+
+    def fail(self, job_id: str, error: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (JOB_FAILED, error, time.time(), job_id),
+            )
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """
+        任务状态和进度，不含结果
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, filename, activity_id, status, sections, completed_sections, error,"
+                " created_at, started_at, finished_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        last_seen = job.pop("updated_at") or job["created_at"]
+        if job["status"] in (JOB_QUEUED, JOB_RUNNING) and time.time() - last_seen > self.timeout_seconds:
+            # 任务在服务进程内排队执行，服务重启后不会恢复，之后也不再有心跳
+            job["error"] = "Job was interrupted"
+            self.fail(job_id, job["error"])
+            job["status"] = JOB_FAILED
+        job["sections"] = json.loads(job["sections"])
+        job["completed_sections"] = json.loads(job["completed_sections"])
+        job["progress"] = (
+            round(len(job["completed_sections"]) / len(job["sections"]), 2) if job["sections"] else 1.0
+        )
+        return job
+
+    def get_result(self, job_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or row["result"] is None:
+            return None
+        return json.loads(row["result"])
+
+
+job_store = JobStore(JOB_DB_PATH)
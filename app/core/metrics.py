@@ -0,0 +1,318 @@
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.core.best_power import BEST_POWER_DURATIONS
+from app.core.zones import HEART_RATE_ZONE_METHODS
+from app.core.cadence import calculate_spi, get_torque_curve
+from app.core.heart_rate import (
+    decoupling_ratio,
+    get_power_hr_ratio,
+    heart_rate_lag,
+    heart_rate_recovery_capablility,
+    heart_rate_recovery_drops,
+    heart_rate_recovery_events,
+    heart_rate_zone_times,
+    heart_rate_zones,
+)
+from app.core.more_data import (
+    calculate_vam,
+    estimate_carbohydrate_consumption_v2,
+    estimate_training_effect,
+    power_ftp_bands,
+    substrate_utilisation,
+)
+from app.core.power import (
+    altitude_adjusted_power_models,
+    detect_intervals,
+    estimate_calories,
+    get_max_power_duration_curve,
+    get_wbal_range,
+    log_duration_grid,
+    mean_max_power,
+    normalized_power,
+    power_zone_times,
+    power_zones,
+    rolling_power_30s,
+    rolling_power_mean,
+    training_stress_score,
+    wbal_balance,
+)
+
+
+class Metric:
+    """
+    注册表中的一个指标节点：名称、输入节点名和计算函数（按 inputs 的顺序接收输入值）
+    输入名以 ? 结尾表示可选输入（如活动中可能没有的 heart_rate?），缺少该节点时传入 None
+    """
+
+    __slots__ = ("name", "inputs", "optional", "func")
+
+    def __init__(self, name: str, inputs: Iterable[str], func: Callable):
+        self.name = name
+        inputs = tuple(inputs)
+        self.inputs = tuple(dependency.rstrip("?") for dependency in inputs)
+        self.optional = frozenset(dependency[:-1] for dependency in inputs if dependency.endswith("?"))
+        self.func = func
+
+
+class MetricRegistry:
+    """
+    声明式指标注册表，每个指标声明依赖的输入节点（数据流列或其他指标），
+    由 MetricGraph 按依赖关系求值
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def metric(self, name: str, *inputs: str):
+        """
+        注册指标的装饰器，例如 @registry.metric("normalized_power", "power", "power_rolling_30s")，
+        可选输入写作 "heart_rate?"
+        """
+
+        def decorator(func: Callable) -> Callable:
+            if name in self._metrics:
+                raise ValueError(f"Metric already registered: {name}")
+            self._metrics[name] = Metric(name, inputs, func)
+            return func
+
+        return decorator
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._metrics
+
+    def __getitem__(self, name: str) -> Metric:
+        return self._metrics[name]
+
+    def __iter__(self):
+        return iter(self._metrics)
+
+
+class MetricGraph:
+    """
+    一次活动的指标求值：按需递归计算依赖，每个节点只计算一次，
+    多个指标共用的中间结果（30 秒滑动平均、标准化功率、W'bal 曲线等）不会重复计算
+    timing=True 时在 timings 中记录每个节点自身的耗时（秒，不含其依赖节点）
+    """
+
+    def __init__(self, registry: MetricRegistry, sources: dict, timing: bool = False):
+        self.registry = registry
+        self.timing = timing
+        self.timings: Dict[str, float] = {}
+        self._values = dict(sources)
+        self._evaluating = set()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._values or name in self.registry
+
+    def __getitem__(self, name: str):
+        if name in self._values:
+            return self._values[name]
+        if name not in self.registry:
+            raise KeyError(f"Unknown metric or missing source: {name}")
+        if name in self._evaluating:
+            raise ValueError(f"Metric dependency cycle at: {name}")
+
+        metric = self.registry[name]
+        self._evaluating.add(name)
+        try:
+            args = [
+                None if dependency in metric.optional and dependency not in self else self[dependency]
+                for dependency in metric.inputs
+            ]
+            start = time.perf_counter()
+            value = metric.func(*args)
+            elapsed = time.perf_counter() - start
+        finally:
+            self._evaluating.discard(name)
+        if self.timing:
+            self.timings[name] = elapsed
+        self._values[name] = value
+        return value
+
+    def evaluate(self, names: Iterable[str]) -> dict:
+        return {name: self[name] for name in names}
+
+
+def activity_sources(records: pd.DataFrame) -> dict:
+    """
+    一次活动的源节点：清洗后记录表的各数据流列和时长 duration_hours
+    指标只声明自己读取的列，不依赖整张记录表
+    """
+    sources = {column: records[column] for column in records.columns}
+    sources["duration_hours"] = len(records) / 3600.0
+    return sources
+
+
+metric_registry = MetricRegistry()
+metric = metric_registry.metric
+
+
+# ===== 功率 =====
+@metric("power_rolling_30s", "power")
+def _power_rolling_30s(power: pd.Series) -> pd.Series:
+    return rolling_power_mean(power, 30)
+
+
+@metric("normalized_power", "power", "power_rolling_30s")
+def _normalized_power(power: pd.Series, rolling: pd.Series) -> int:
+    return normalized_power(power, rolling)
+
+
+@metric("training_stress_score", "power", "duration_hours", "normalized_power")
+def _training_stress_score(power: pd.Series, duration_hours: float, NP: int) -> int:
+    return training_stress_score(power, duration_hours, NP)
+
+
+@metric("calories", "power", "normalized_power")
+def _calories(power: pd.Series, NP: int) -> float:
+    return estimate_calories(power, NP=NP)
+
+
+@metric("power_curve", "power")
+def _power_curve(power: pd.Series) -> list:
+    return get_max_power_duration_curve(power)
+
+
+@metric("power_curve_log", "power")
+def _power_curve_log(power: pd.Series) -> tuple:
+    # 对数间隔的持续时间网格，返回 (持续时间列表, 平均最大功率列表)
+    durations = log_duration_grid(len(power) - 3)
+    return durations.tolist(), get_max_power_duration_curve(power, durations)
+
+
+@metric("best_power_curve", "power")
+def _best_power_curve(power: pd.Series):
+    # 最佳功率索引网格上的平均最大功率（见 app.core.best_power）
+    return mean_max_power(power, BEST_POWER_DURATIONS)
+
+
+@metric("wbal_balance", "power", "wbal_model")
+def _wbal_balance(power: pd.Series, model: str) -> np.ndarray:
+    # W'bal 数组只计算一次，曲线和波动范围共用；只请求 w_balance_drop 时不转换为列表
+    return wbal_balance(power, model)
+
+
+@metric("wbal_curve", "wbal_balance")
+def _wbal_curve(wbal: np.ndarray) -> list:
+    return wbal.tolist()
+
+
+@metric("wbal_range", "power", "wbal_balance")
+def _wbal_range(power: pd.Series, wbal: np.ndarray) -> int:
+    return get_wbal_range(power, wbal)
+
+
+@metric("power_zone_times", "power")
+def _power_zone_times(power: pd.Series) -> dict:
+    return power_zone_times(power)
+
+
+@metric("power_zones", "power", "power_zone_times")
+def _power_zones(power: pd.Series, seconds: dict) -> dict:
+    return power_zones(power, seconds)
+
+
+@metric("power_ftp_bands", "power")
+def _power_ftp_bands(power: pd.Series) -> dict:
+    # 相对 FTP 的功率带秒数和做功，碳水消耗和训练效果共用
+    return power_ftp_bands(power)
+
+
+@metric("rolling_power_graph", "power")
+def _rolling_power_graph(power: pd.Series) -> list:
+    return rolling_power_30s(power)
+
+
+@metric("carbohydrate_consumption", "power", "power_ftp_bands")
+def _carbohydrate_consumption(power: pd.Series, bands: dict) -> int:
+    return estimate_carbohydrate_consumption_v2(power, bands)
+
+
+@metric("substrate_utilisation", "power")
+def _substrate_utilisation(power: pd.Series) -> dict:
+    # 逐秒碳水 / 脂肪供能及累计碳水、能量曲线
+    return substrate_utilisation(power)
+
+
+@metric("power_training_effect", "power", "power_ftp_bands")
+def _power_training_effect(power: pd.Series, bands: dict) -> dict:
+    return estimate_training_effect(power, "power", bands)
+
+
+@metric("intervals", "power", "heart_rate?", "cadence?")
+def _intervals(power: pd.Series, heart_rate: Optional[pd.Series], cadence: Optional[pd.Series]) -> list:
+    # 自动检测的功率区间，附带区间内的心率和踏频统计
+    return detect_intervals(power, heart_rate, cadence)
+
+
+@metric("altitude_adjusted_power", "power", "altitude")
+def _altitude_adjusted_power(power: pd.Series, altitude: pd.Series) -> dict:
+    # 一次计算全部海拔修正模型，含逐点修正功率
+    return altitude_adjusted_power_models(power, altitude, samples=True)
+
+
+# ===== 心率 =====
+@metric("heart_rate_zone_times", "heart_rate")
+def _heart_rate_zone_times(heart_rate: pd.Series) -> dict:
+    return heart_rate_zone_times(heart_rate)
+
+
+@metric("heart_rate_zones", "heart_rate", "heart_rate_zone_times")
+def _heart_rate_zones(heart_rate: pd.Series, seconds: dict) -> dict:
+    return heart_rate_zones("threshold", heart_rate, seconds)  # 默认使用阈值方法
+
+
+@metric("heart_rate_zones_by_method", "heart_rate", "heart_rate_zone_times")
+def _heart_rate_zones_by_method(heart_rate: pd.Series, seconds: dict) -> dict:
+    return {method: heart_rate_zones(method, heart_rate, seconds) for method in HEART_RATE_ZONE_METHODS}
+
+
+@metric("heart_rate_recovery_drops", "heart_rate")
+def _heart_rate_recovery_drops(heart_rate: pd.Series):
+    return heart_rate_recovery_drops(heart_rate)
+
+
+@metric("heart_rate_recovery", "heart_rate", "heart_rate_recovery_drops")
+def _heart_rate_recovery(heart_rate: pd.Series, drops) -> int:
+    return heart_rate_recovery_capablility(heart_rate, drops=drops)
+
+
+@metric("heart_rate_recovery_events", "heart_rate", "timestamp?", "heart_rate_recovery_drops")
+def _heart_rate_recovery_events(heart_rate: pd.Series, timestamp: Optional[pd.Series], drops) -> list:
+    return heart_rate_recovery_events(heart_rate, timestamp, drops=drops)
+
+
+@metric("heart_rate_lag", "power", "heart_rate")
+def _heart_rate_lag(power: pd.Series, heart_rate: pd.Series) -> float:
+    return heart_rate_lag(power, heart_rate)
+
+
+@metric("decoupling", "power", "heart_rate")
+def _decoupling(power: pd.Series, heart_rate: pd.Series) -> tuple:
+    return decoupling_ratio(power, heart_rate)
+
+
+@metric("power_hr_ratio", "power", "heart_rate")
+def _power_hr_ratio(power: pd.Series, heart_rate: pd.Series) -> list:
+    return get_power_hr_ratio(power, heart_rate)
+
+
+# ===== 踏频 =====
+@metric("torque_curve", "cadence", "power")
+def _torque_curve(cadence: pd.Series, power: pd.Series) -> list:
+    return get_torque_curve(cadence, power)
+
+
+@metric("spi", "power")
+def _spi(power: pd.Series) -> list:
+    return calculate_spi(power)
+
+
+# ===== 海拔 =====
+@metric("vam", "altitude")
+def _vam(altitude: pd.Series) -> list:
+    return calculate_vam(altitude)
@@ -4,10 +4,11 @@
 from traceback import StackSummary
 import pandas as pd
 from scipy.signal import savgol_filter
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Optional, Tuple
 import numpy as np
 
 from app.core.power import user_config
+from app.core.zones import FTP_BANDS, HEART_RATE_RESERVE_BANDS, ftp_band_totals, zone_histogram
 
 def calculate_vam(altitude_series: pd.Series, time_interval: float = 1.0) -> list[float]:
     """
@@ -223,17 +224,30 @@ def avg_temperature(temperature_series: pd.Series) -> int:
 def min_temperature(temperature_series: pd.Series) -> int:
     return round(temperature_series.min())
 
-def estimate_carbohydrate_consumption_v2(power_series: pd.Series) -> int:
+# 各功率带（见 app.core.zones.FTP_BANDS）中碳水的供能比例（参考intervals.icu），按分箱序号查表：
+# <60% FTP 约40%能量来自碳水，60-75% 约60%，75-90% 约70%，90-105% 约80%，105-120% 约85%，>120% 约90%
+# 第 0 箱（负功率）和最后一箱（不低于 99 倍 FTP 的异常值）不计入能量消耗
+CARB_RATIOS = np.array([0.0, 0.4, 0.6, 0.7, 0.8, 0.85, 0.9, 0.0])
+
+# 骑行时的机械效率大约为20-25%，也就是说，消耗1千焦机械能，实际需要消耗4-5千焦的食物能量
+MECHANICAL_EFFICIENCY = 0.22  # 22%，文献常用值
+
+CARB_KJ_PER_GRAM = 16.7  # 1克碳水=4千卡=16.7千焦
+FAT_KJ_PER_GRAM = 37.7   # 1克脂肪=9千卡=37.7千焦
+KJ_PER_KCAL = 4.184
+
+
+def estimate_carbohydrate_consumption_v2(power_series: pd.Series, bands: Optional[dict] = None) -> int:
     """
     估算骑行过程中碳水化合物的消耗量（单位：克），修正版本。
     1. 直接根据每秒采样的功率数据，无需duration_seconds参数。
     2. 体重用于调整基础代谢率和能量消耗，估算更贴合个人实际。
     3. 修正能量换算系数，避免低估（原来低了约5倍）。
+    与 substrate_utilisation 的累计碳水曲线终值一致，只需要总量时按功率带汇总，不生成逐点序列
 
     参数:
         power_series: 功率数据（pd.Series，单位：瓦特，1Hz采样）
-        ftp: 功能阈值功率（Functional Threshold Power, 单位：瓦特）
-        weight_kg: 体重（千克），默认70kg
+        bands: power_ftp_bands 的结果，已分箱时直接复用
 
     返回:
         碳水化合物消耗量（克，int）
@@ -243,45 +257,57 @@ def estimate_carbohydrate_consumption_v2(power_series: pd.Series) -> int:
     if power_series.empty or ftp <= 0 or weight_kg <= 0:
         return 0
 
-    # 区间定义（以FTP百分比为界，参考intervals.icu）
-    # 区间: (下限, 上限, 碳水比例)
-    zones = [
-        (0.0, 0.6, 0.4),   # <60% FTP，约40%能量来自碳水
-        (0.6, 0.75, 0.6),  # 60-75% FTP，约60%
-        (0.75, 0.9, 0.7),  # 75-90% FTP，约70%
-        (0.9, 1.05, 0.8),  # 90-105% FTP，约80%
-        (1.05, 1.2, 0.85), # 105-120% FTP，约85%
-        (1.2, 99, 0.9),    # >120% FTP，约90%
-    ]
-
     # 体重修正因子（假设70kg为标准，线性修正）
     weight_factor = weight_kg / 70.0
 
-    total_carb_kj = 0.0
-    power_values = power_series.fillna(0).astype(float).tolist()
+    if bands is None:
+        bands = ftp_band_totals(power_series, ftp)
+    # 先算出各功率带的机械能（千焦，体重修正），除以效率得到实际消耗的总能量，再乘以碳水比例
+    band_kj = bands["work"] / 1000 * weight_factor / MECHANICAL_EFFICIENCY
+    total_carb_kj = float(np.sum(band_kj * CARB_RATIOS))
 
-    # 之前的算法只统计了碳水消耗的能量，没有考虑到人体能量利用效率
-    # 实际上，骑行时的机械效率大约为20-25%，也就是说，消耗1千焦机械能，实际需要消耗4-5千焦的食物能量
-    # 另外，1克碳水=4千卡=16.7千焦，这个没错
-    # 所以应该先算出总机械能，再除以效率（比如0.22），再乘以碳水比例，最后除以16.7
+    carb_grams = total_carb_kj / CARB_KJ_PER_GRAM
 
-    # 机械效率
-    mechanical_efficiency = 0.22  # 22%，文献常用值
+    return int(round(carb_grams))
 
-    for p in power_values:
-        rel = p / ftp
-        for lower, upper, carb_ratio in zones:
-            if lower <= rel < upper:
-                # 单点能量（千焦），体重修正
-                kj = p * 1 / 1000 * weight_factor
-                # 先除以效率，得到实际消耗的总能量，再乘以碳水比例
-                total_carb_kj += (kj / mechanical_efficiency) * carb_ratio
-                break
 
-    # 1克碳水化合物约16.7千焦
-    carb_grams = total_carb_kj / 16.7
+def substrate_utilisation(power_series: pd.Series) -> Dict[str, np.ndarray]:
+    """
+    逐秒的供能底物模型：按相对 FTP 强度查表得到每个采样的碳水 / 脂肪供能比例，
+    代谢能量 = 机械能 / 机械效率（体重修正，与 estimate_carbohydrate_consumption_v2 相同）
+
+    返回（均为与 power_series 等长的 numpy 数组）:
+        carb_ratio: 碳水供能比例
+        carb_g / fat_g: 每秒消耗的碳水 / 脂肪（克）
+        cumulative_carb_g: 累计碳水消耗（克），可用于补给计划
+        cumulative_kcal: 累计能量消耗（千卡）
+    """
+    ftp = user_config["power"]["FTP"]
+    weight_kg = user_config["weight"]
+    n = len(power_series)
+    if n == 0 or ftp <= 0 or weight_kg <= 0:
+        zeros = np.zeros(n)
+        return {
+            "carb_ratio": zeros, "carb_g": zeros, "fat_g": zeros,
+            "cumulative_carb_g": zeros, "cumulative_kcal": zeros,
+        }
 
-    return int(round(carb_grams))
+    power = power_series.fillna(0).to_numpy(dtype=float)
+    bins = np.digitize(power / ftp, FTP_BANDS, right=False)
+    carb_ratio = CARB_RATIOS[bins]
+    counted = carb_ratio > 0
+
+    energy_kj = np.where(counted, power / 1000 * (weight_kg / 70.0) / MECHANICAL_EFFICIENCY, 0.0)
+    carb_kj = energy_kj * carb_ratio
+    carb_g = carb_kj / CARB_KJ_PER_GRAM
+    fat_g = (energy_kj - carb_kj) / FAT_KJ_PER_GRAM
+    return {
+        "carb_ratio": carb_ratio,
+        "carb_g": carb_g,
+        "fat_g": fat_g,
+        "cumulative_carb_g": np.cumsum(carb_g),
+        "cumulative_kcal": np.cumsum(energy_kj) / KJ_PER_KCAL,
+    }
 
     # INSERT_YOUR_CODE
 
@@ -300,7 +326,17 @@ def classify_training(aerobic_effect: float, anaerobic_effect: float) -> str:
     else:
         return "混合型训练"
 
-def estimate_training_effect(data_series, data_type="power",):
+def power_ftp_bands(power_series: pd.Series) -> dict:
+    """
+    相对 FTP 的功率带分箱（见 app.core.zones.FTP_BANDS），碳水消耗和训练效果共用，FTP 未配置时按 200W
+    """
+    ftp = user_config["power"]["FTP"]
+    if ftp is None or ftp <= 0:
+        ftp = 200
+    return ftp_band_totals(power_series, ftp)
+
+
+def estimate_training_effect(data_series, data_type="power", bands: Optional[dict] = None):
     """
     评估有氧和无氧训练效果，给出训练效果指数和训练类型总结（参考佳明算法思想，简化实现）。
     
@@ -310,6 +346,7 @@ def estimate_training_effect(data_series, data_type="power",):
         ftp: 功率阈值（仅data_type为power时需要）
         hr_max: 最大心率（仅data_type为hr时需要）
         hr_rest: 静息心率（仅data_type为hr时可选，默认50）
+        bands: power_ftp_bands 的结果（仅data_type为power时），已分箱时直接复用
 
     返回:
         {
@@ -342,14 +379,14 @@ def estimate_training_effect(data_series, data_type="power",):
 
     # 1. 功率型算法
     if data_type == "power":
-        if ftp is None or ftp <= 0:
-            ftp = 200  # 默认值
-        rel_power = arr / ftp
+        if bands is None:
+            bands = power_ftp_bands(data_series)
+        seconds = bands["seconds"]
 
-        # 有氧训练效果：主要看60-90% FTP区间的时间
-        aerobic_time = np.sum((rel_power >= 0.6) & (rel_power < 0.9))
+        # 有氧训练效果：主要看60-90% FTP区间的时间（60-75%、75-90% 两个功率带）
+        aerobic_time = seconds[2] + seconds[3]
         # 无氧训练效果：主要看>120% FTP区间的时间
-        anaerobic_time = np.sum(rel_power >= 1.2)
+        anaerobic_time = seconds[6] + seconds[7]
         total_time = len(arr)
 
         # 简单归一化（假设1小时训练，60min=3600s）
@@ -367,10 +404,11 @@ def estimate_training_effect(data_series, data_type="power",):
 
         # 计算心率储备百分比
         hr_reserve = (arr - hr_rest) / (hr_max - hr_rest)
+        reserve_seconds = zone_histogram(hr_reserve, HEART_RATE_RESERVE_BANDS, right=False)
         # 有氧区间：60-80%心率储备
-        aerobic_time = np.sum((hr_reserve >= 0.6) & (hr_reserve < 0.8))
+        aerobic_time = reserve_seconds[1]
         # 无氧区间：>90%心率储备
-        anaerobic_time = np.sum(hr_reserve >= 0.9)
+        anaerobic_time = reserve_seconds[3]
         total_time = len(arr)
 
         aerobic_effect = min(5.0, round((aerobic_time / total_time) * 6, 1))
@@ -1,12 +1,18 @@
 import pandas as pd
 import numpy as np
 from app.core.utils import format_seconds
+from app.core.zones import (
+    POWER_ZONE_LABELS,
+    format_zone_times,
+    power_zone_bounds,
+    power_zone_seconds,
+    sweet_spot_bounds,
+)
 import math
 import json
 from typing import Optional, List, Tuple
 
-with open('app/config/user_config.json', 'r', encoding='utf-8') as f:
-    user_config = json.load(f)
+from app.core.user_config import user_config
 
 
 
@@ -17,82 +23,47 @@ def avg_power(power_data: pd.Series) -> int:
 def max_power(power_data: pd.Series) -> int:
     return int(power_data.max())
 
-def normalized_power(power_data: pd.Series) -> int:
-    rolling = power_data.rolling(window=30, min_periods=30).mean().dropna() # type:ignore
+def rolling_power_mean(power_data: pd.Series, window: int = 30) -> pd.Series:
+    """
+    完整窗口的滑动平均功率（不含前 window - 1 个不完整窗口），标准化功率等指标共用
+    """
+    return power_data.rolling(window=window, min_periods=window).mean().dropna() # type:ignore
+
+def normalized_power(power_data: pd.Series, rolling: Optional[pd.Series] = None) -> int:
+    if rolling is None:
+        rolling = rolling_power_mean(power_data)
     return int((rolling.pow(4).mean()) ** 0.25)
 
-def training_stress_score(power_data: pd.Series, total_time_hr: float) -> int:
+def training_stress_score(power_data: pd.Series, total_time_hr: float, NP: Optional[int] = None) -> int:
     FTP = user_config["power"]["FTP"]
-    NP = normalized_power(power_data)
+    if NP is None:
+        NP = normalized_power(power_data)
     return int((total_time_hr * NP * NP) / (FTP * FTP) * 100)
 
-def power_zones(power_data: pd.Series) -> dict:
-
-    FTP = user_config["power"]["FTP"]
-    # print(FTP)
-    zone_labels = [f"zone_{i}" for i in range(1, 8)]
-    zone_times = {}
-    total_time_sec = len(power_data)
-    bounds = [
-        0,
-        math.floor(0.55 * FTP),
-        math.floor(0.75 * FTP),
-        math.floor(0.9 * FTP),
-        math.floor(1.05 * FTP),
-        math.floor(1.2 * FTP),
-        math.floor(1.5 * FTP),
-        float('inf')
-    ]
-    
-
-    for i, label in enumerate(zone_labels):
-        lower = bounds[i]
-        upper = bounds[i + 1]
-        if math.isinf(upper):
-            mask = power_data > lower
-        elif i == 0:
-            mask = power_data <= upper
-        else:
-            mask = (power_data > lower) & (power_data <= upper)
-
-        zone_sec = mask.sum()
-        percent = (zone_sec / total_time_sec * 100) if total_time_sec else 0
-        zone_times[label] = {
-            "time": format_seconds(zone_sec),
-            "percent": f"{percent:.1f}%"
-        }
-
-    # ===== 新增 SS 区间（84%~97% FTP）=====
-    ss_lower = int(0.84 * FTP)
-    ss_upper = int(0.97 * FTP)
-    ss_mask = (power_data > ss_lower) & (power_data <= ss_upper)
-    ss_sec = ss_mask.sum()
-    ss_percent = (ss_sec / total_time_sec * 100) if total_time_sec else 0
-    zone_times["SS"] = {
-        "time": format_seconds(ss_sec),
-        "percent": f"{ss_percent:.1f}%"
-    }
+def power_zone_times(power_data: pd.Series) -> dict:
+    """
+    按当前 FTP 计算 7 个功率区间和 Sweet Spot 的秒数，功率数据只分箱一次
+    """
+    return power_zone_seconds(power_data, user_config["power"]["FTP"])
 
+def power_zones(power_data: pd.Series, seconds: Optional[dict] = None) -> dict:
+    """
+    7 区间和 Sweet Spot（84%~97% FTP）的用时及占比
+    seconds 为 power_zone_times 的结果，已分箱时直接复用
+    """
+    if seconds is None:
+        seconds = power_zone_times(power_data)
+    zone_times = format_zone_times(seconds["zones"], POWER_ZONE_LABELS, seconds["total"])
+    zone_times.update(format_zone_times([seconds["SS"]], ["SS"], seconds["total"]))
     return zone_times
 
 
-
-
 def get_power_zones(FTP: int) -> dict:
     zone_names = [f"Z{i}" for i in range(1, 8)]
     zones = {}
     
     # 7 区间的功率边界
-    bounds = [
-        0,
-        math.floor(0.55 * FTP),
-        math.floor(0.75 * FTP),
-        math.floor(0.9 * FTP),
-        math.floor(1.05 * FTP),
-        math.floor(1.2 * FTP),
-        math.floor(1.5 * FTP),
-        float('inf')
-    ]
+    bounds = [0, *power_zone_bounds(FTP), float('inf')]
 
     # 生成 Z1 ~ Z7
     for i, name in enumerate(zone_names):
@@ -107,8 +78,7 @@ def get_power_zones(FTP: int) -> dict:
         zones[name] = zone_str
 
     # 添加 Sweet Spot 区间（84% ~ 97% FTP）
-    ss_lower = int(FTP * 0.84)
-    ss_upper = int(FTP * 0.97)
+    ss_lower, ss_upper = sweet_spot_bounds(FTP)
     zones["SS"] = f"{ss_lower}~{ss_upper}w"
 
     return zones
@@ -124,111 +94,238 @@ def calculate_work_kj_above_ftp(power_data: pd.Series) -> int:
     total_work_kj = total_work_joules / 1000
     return round(total_work_kj)
 
-def estimate_calories(power_data: pd.Series, efficiency: float = 0.2955) -> float:
-    return round(normalized_power(power_data) * (1 / efficiency) / 4184 * len(power_data))
-
-def get_max_power_duration_curve(power_data: pd.Series) -> list[int]:
-    max_avg_power = [0] 
-
-    for duration in range(1, len(power_data) - 2):
-        rolling_mean = power_data.rolling(window=duration).mean()
-        max_power = rolling_mean.max()
-        if pd.isna(max_power): # type: ignore
-            max_power = 0
-        else:
-            max_power = round(max_power)
-        max_avg_power.append(max_power) # type: ignore
-
-    return max_avg_power
+def estimate_calories(power_data: pd.Series, efficiency: float = 0.2955, NP: Optional[int] = None) -> float:
+    if NP is None:
+        NP = normalized_power(power_data)
+    return round(NP * (1 / efficiency) / 4184 * len(power_data))
 
-import pandas as pd
-import numpy as np
+def log_duration_grid(max_duration: int, points_per_decade: int = 24) -> np.ndarray:
+    """
+    1 秒到 max_duration 秒之间按对数间隔取的持续时间（整数秒，去重递增，包含两端），
+    短时长部分接近逐秒，长时长部分稀疏，点数约为 points_per_decade * log10(max_duration)
+    """
+    if max_duration < 1:
+        return np.array([], dtype=int)
+    count = int(np.ceil(np.log10(max_duration) * points_per_decade)) + 1
+    return np.unique(np.round(np.logspace(0, np.log10(max_duration), count)).astype(int))
 
-def get_wbal_curve(power_data: pd.Series) -> list[float]:
-    W_prime = user_config["power"]["WJ"]
-    CP = user_config["power"]["FTP"]
-    
-    dt = 1.0
+def mean_max_power(power_data, durations) -> np.ndarray:
+    """
+    基于累加和计算各持续时间的平均最大功率：每个时长的所有窗口和为两次累加和之差，
+    一次向量化运算得到，总复杂度 O(n·k)（k 为时长个数），额外内存 O(n)
+    逐时长对连续切片运算；把多个时长合成二维数组一次计算需要额外拷贝或跨步访问，实测反而更慢
+    含缺失值的窗口不参与计算（与 rolling(window=d).mean() 一致），没有完整窗口时为 NaN
+    """
+    values = np.asarray(power_data, dtype=float)
+    n = len(values)
+    durations = np.asarray(durations, dtype=int)
+    result = np.full(len(durations), np.nan)
+
+    missing = np.isnan(values)
+    csum = np.concatenate(([0.0], np.cumsum(np.where(missing, 0.0, values))))
+    missing_csum = np.concatenate(([0], np.cumsum(missing))) if missing.any() else None
+
+    for i, duration in enumerate(durations):
+        if duration < 1 or duration > n:
+            continue
+        sums = csum[duration:] - csum[:-duration]
+        if missing_csum is not None:
+            complete = missing_csum[duration:] == missing_csum[:-duration]
+            if not complete.any():
+                continue
+            sums = sums[complete]
+        result[i] = sums.max() / duration
+    return result
+
+def get_max_power_duration_curve(power_data: pd.Series, durations=None) -> list[int]:
+    """
+    平均最大功率曲线，默认逐秒输出：第 d 项为 d 秒的最大平均功率（第 0 项为 0，最长到 n - 3 秒）
+    durations 指定持续时间网格（如 log_duration_grid 的结果）时只计算这些时长，返回与 durations 一一对应的列表
+    没有完整窗口的时长为 0
+    """
+    if durations is None:
+        curve = [0]
+        durations = np.arange(1, len(power_data) - 2)
+    else:
+        curve = []
+    curve.extend(0 if np.isnan(p) else round(float(p)) for p in mean_max_power(power_data, durations))
+    return curve
+
+# W'bal 模型：
+#   exponential  恢复按常数时间常数 tau = W' / (0.5 * CP) 指数回复，消耗线性，余量限定在 [0, W']（默认，原有算法）
+#   differential Froncioni / Skiba 微分模型，恢复速率与 (CP - P) / W' 成正比，不限定范围
+#   integral     Skiba 积分模型，tau = 546 * e^(-0.01 * D_CP) + 316，D_CP 为 CP 与低于 CP 部分平均功率之差
+WBAL_MODELS = ("exponential", "differential", "integral")
+
+def _linear_recurrence(
+    log_g: np.ndarray, x: np.ndarray, initial: float = 0.0, cap=None
+) -> np.ndarray:
+    """
+    向量化求解一阶线性递推 D[t] = g[t] * D[t-1] + x[t]（g > 0，传入 log_g = ln g），D[-1] = initial
+    利用 D[t] = G[t] * (initial + H[t])，G 为 g 的累乘，H 为 x / G 的累加和；
+    按块计算，块内 G 不小于 e^-600，避免 1 / G 溢出
+    传入 cap（标量或数组）时求解带上限的递推 D[t] = min(cap[t], g[t] * D[t-1] + x[t])：
+    g > 0 时 min 可以移到线性递推之外，D[t] 为从 initial 或任一时刻的 cap[s] 出发线性递推到 t 的最小值，
+    即 G[t] * (H[t] + min(initial, min_{s≤t}(cap[s] / G[s] - H[s])))，用 np.minimum.accumulate 一次求出，
+    不需要在每次触及上限后重新递推
+    """
+    n = len(log_g)
+    out = np.empty(n)
+    start, d = 0, initial
+    while start < n:
+        cum = np.cumsum(log_g[start:])
+        stop = n if cum[-1] > -600.0 else start + max(1, int(np.searchsorted(-cum, 600.0)))
+        G = np.exp(cum[:stop - start])
+        H = np.cumsum(x[start:stop] / G)
+        block = out[start:stop]
+        np.add(H, d, out=block)
+        block *= G
+        if cap is not None:
+            block_cap = cap if np.isscalar(cap) else cap[start:stop]
+            # 没有超过上限时与无上限的递推相同，不需要求最小值
+            if (block > block_cap).any():
+                floor = np.divide(block_cap, G)
+                floor -= H
+                floor[0] = min(floor[0], d)
+                np.minimum.accumulate(floor, out=floor)
+                floor += H
+                np.multiply(floor, G, out=block)
+            # 舍入误差内达到上限的值取上限，与逐点截断的结果一致
+            at_cap = block >= block_cap - 1e-9 * np.abs(block_cap)
+            block[at_cap] = np.broadcast_to(block_cap, block.shape)[at_cap]
+        d = block[-1]
+        start = stop
+    return out
+
+def _wbal_exponential(power: np.ndarray, W_prime: float, CP: float) -> np.ndarray:
     tau = W_prime / (CP * 0.5)  # 根据 Skiba 建议公式调整
+    excess = power - CP
+    # 以消耗量（W' - 余量）递推：恢复时乘以 e^(-1/tau)，消耗时加上 P - CP，
+    # 消耗量上限为 W'（余量耗尽时为 0）；缺失值使余量恢复为 W'（与逐点实现中 NaN 的处理一致），即该处上限为 0
+    log_g = (excess <= 0) * (-1.0 / tau)
+    x = np.fmax(excess, 0.0)
+    missing = np.isnan(power)
+    cap = np.where(missing, 0.0, W_prime) if missing.any() else W_prime
+    deficit = _linear_recurrence(log_g, x, 0.0, cap)
+    return np.clip(W_prime - deficit, 0.0, W_prime)
+
+def _wbal_differential(power: np.ndarray, W_prime: float, CP: float) -> np.ndarray:
+    excess = np.nan_to_num(power) - CP
+    # 恢复时每秒保留 1 - (CP - P) / W' 的消耗量
+    log_g = np.log(np.maximum(1.0 + np.minimum(excess, 0.0) / W_prime, 1e-12))
+    return W_prime - _linear_recurrence(log_g, np.maximum(excess, 0.0))
+
+def _wbal_integral(power: np.ndarray, W_prime: float, CP: float) -> np.ndarray:
+    from scipy.signal import lfilter
+
+    power = np.nan_to_num(power)
+    below = power[power < CP]
+    D_CP = CP - below.mean() if len(below) else 0.0
+    tau = 546 * np.exp(-0.01 * D_CP) + 316
+    # 各时刻的消耗量为之前每秒超过 CP 的做功按 e^(-(t-u)/tau) 衰减后的和，即常系数一阶滤波
+    expended = np.maximum(power - CP, 0.0)
+    return W_prime - lfilter([1.0], [1.0, -np.exp(-1.0 / tau)], expended)
+
+def wbal_balance(power_data, model: str = "exponential") -> np.ndarray:
+    """
+    W' Balance（焦耳）数组，CP 和 W' 取自 user_config["power"] 的 FTP 和 WJ
+    model 见 WBAL_MODELS，各模型都以线性递推向量化计算
+    """
+    if model not in WBAL_MODELS:
+        raise ValueError(f"model must be one of: {', '.join(WBAL_MODELS)}")
+    W_prime = float(user_config["power"]["WJ"])
+    CP = float(user_config["power"]["FTP"])
+    power = np.asarray(power_data, dtype=float)
+    if len(power) == 0:
+        return np.zeros(0)
+    if model == "differential":
+        return _wbal_differential(power, W_prime, CP)
+    if model == "integral":
+        return _wbal_integral(power, W_prime, CP)
+    return _wbal_exponential(power, W_prime, CP)
+
+def get_wbal_curve(power_data: pd.Series, model: str = "exponential") -> list[float]:
+    """
+    W' Balance 曲线（焦耳），见 wbal_balance
+    """
+    return wbal_balance(power_data, model).tolist()
 
-    wbal = []
-    balance = W_prime  # 初始储备
-
-    for p in power_data:
-        if p <= CP:
-            # 恢复：指数回复（参考 Skiba 模型）
-            balance += (W_prime - balance) * (1 - np.exp(-dt / tau))
-        else:
-            # 消耗：线性损耗
-            balance -= (p - CP) * dt
-
-        balance = max(0.0, min(W_prime, balance))  # 限定范围
-        wbal.append(balance)
-
-    return wbal
-
-def get_wbal_range(power_data: pd.Series) -> int:
+def get_wbal_range(power_data: pd.Series, wbal_curve=None) -> int:
     """
     计算 get_wbal_curve(power_data) 的最大值和最小值的差值（即W' Balance的波动范围）
     :param power_data: 功率数据（pd.Series）
+    :param wbal_curve: 已计算的 W' Balance 曲线（列表或 wbal_balance 的数组），传入时不再重新计算
     :return: 最大值与最小值的差（int）
     """
-    wbal_curve = get_wbal_curve(power_data)
-    if not wbal_curve:
+    if wbal_curve is None:
+        wbal_curve = wbal_balance(power_data)
+    if len(wbal_curve) == 0:
         return 0
-    max_wbal = max(wbal_curve)
-    min_wbal = min(wbal_curve)
-    return int(round(max_wbal - min_wbal))
+    values = np.asarray(wbal_curve, dtype=float)
+    return int(round(values.max() - values.min()))
 
 
 
-def get_altitude_adjusted_power(
+# 海拔修正因子多项式系数（x 为海拔 km，按 x³、x²、x、常数项排列）
+ALTITUDE_POWER_MODELS = {
+    "peronnet": (-0.003, 0.0081, -0.0381, 1.0),
+    "bassett_acclim": (0.0, -0.0112, -0.0190, 1.0),
+    "bassett_nonacclim": (0.00178, -0.0143, -0.0407, 1.0),
+    "simmons": (0.0, -0.0092, -0.0323, 1.0),
+}
+
+def altitude_adjusted_power_models(
     power_data: pd.Series,
     altitude_data: pd.Series,
-    model: str = "peronnet"
+    models: Optional[List[str]] = None,
+    samples: bool = False,
 ) -> dict:
     """
-    计算基于海拔修正的平均功率和平均修正因子
-    返回标准 Python 内置类型（float 和 dict）
-    支持模型: 'peronnet', 'bassett_acclim', 'bassett_nonacclim', 'simmons'
+    一次计算多个模型的海拔修正功率：海拔数组构造一次 [x³, x², x, 1] 矩阵，
+    与各模型系数相乘得到所有模型的修正因子，再向量化计算修正功率
+    返回 {模型: {"alt": 平均修正功率, "alt_acc": 平均修正系数}}，
+    samples=True 时每个模型另附 "adjusted_power"（逐点修正功率数组）
+    支持模型见 ALTITUDE_POWER_MODELS，默认计算全部模型
     """
+    models = list(ALTITUDE_POWER_MODELS) if models is None else list(models)
+    unknown = [model for model in models if model not in ALTITUDE_POWER_MODELS]
+    if unknown:
+        raise ValueError(f"未知模型类型: {', '.join(unknown)}")
     if power_data.empty or altitude_data.empty:
-        return {"alt": 0.0, "alt_acc": 0.0}
+        return {model: {"alt": 0.0, "alt_acc": 0.0} for model in models}
 
     # 截取等长部分
     min_len = min(len(power_data), len(altitude_data))
-    power = power_data.iloc[:min_len].fillna(0).astype(float).tolist()
-    altitude = altitude_data.iloc[:min_len].ffill().astype(float).tolist()
-
-    # 转换为海拔高度（单位 km）
-    x = [alt / 1000.0 for alt in altitude]
-
-    # 计算海拔修正因子
-    factor = []
-    for xi in x:
-        if model == "peronnet":
-            f = -0.003 * xi**3 + 0.0081 * xi**2 - 0.0381 * xi + 1
-        elif model == "bassett_acclim":
-            f = -0.0112 * xi**2 - 0.0190 * xi + 1
-        elif model == "bassett_nonacclim":
-            f = 0.00178 * xi**3 - 0.0143 * xi**2 - 0.0407 * xi + 1
-        elif model == "simmons":
-            f = -0.0092 * xi**2 - 0.0323 * xi + 1
-        else:
-            raise ValueError("未知模型类型")
-        factor.append(max(f, 0.01))  # 避免除以 0 或负值
+    power = power_data.iloc[:min_len].fillna(0).to_numpy(dtype=float)
+    x = altitude_data.iloc[:min_len].ffill().to_numpy(dtype=float) / 1000.0  # 海拔（km）
 
-    # 计算修正功率
-    adjusted_power = [p / f for p, f in zip(power, factor)]
+    # (n, 4) @ (4, 模型数) 一次得到所有模型的修正因子，下限 0.01 避免除以 0 或负值
+    coefficients = np.array([ALTITUDE_POWER_MODELS[model] for model in models])
+    factors = np.maximum(np.vander(x, 4) @ coefficients.T, 0.01)
+    adjusted = power[:, None] / factors
 
-    # 平均值（标准 Python 类型）
-    alt_avg = round(sum(adjusted_power) / len(adjusted_power), 2)
-    acc_avg = round(
-        sum([adj / p for adj, p in zip(adjusted_power, power) if p > 0]) / len([p for p in power if p > 0]),
-        4
-    ) if any(p > 0 for p in power) else 0.0
+    positive = power > 0
+    alt_avg = adjusted.mean(axis=0)
+    acc_avg = (1.0 / factors[positive]).mean(axis=0) if positive.any() else np.zeros(len(models))
 
-    return {"alt": alt_avg, "alt_acc": acc_avg}
+    result = {}
+    for i, model in enumerate(models):
+        result[model] = {"alt": round(float(alt_avg[i]), 2), "alt_acc": round(float(acc_avg[i]), 4)}
+        if samples:
+            result[model]["adjusted_power"] = adjusted[:, i]
+    return result
+
+def get_altitude_adjusted_power(
+    power_data: pd.Series,
+    altitude_data: pd.Series,
+    model: str = "peronnet"
+) -> dict:
+    """
+    计算基于海拔修正的平均功率和平均修正因子
+    返回标准 Python 内置类型（float 和 dict）
+    支持模型: 'peronnet', 'bassett_acclim', 'bassett_nonacclim', 'simmons'
+    """
+    return altitude_adjusted_power_models(power_data, altitude_data, [model])[model]
 
 def get_altitude_adjusted_power_acclimatized(power_data: pd.Series, altitude_data: pd.Series) -> float:
     """高原适应运动员的海拔修正功率"""
@@ -267,18 +364,27 @@ def left_right_balance(balance_data: pd.Series) -> Tuple[int, int]:
 
     return (avg_left, avg_right)
     
-def ESTIMATE_FTP(power_curve: pd.Series):
+def ESTIMATE_FTP(power_curve: pd.Series, durations=None) -> Optional[dict]:
+    """
+    根据平均最大功率曲线估算 CP（用作 eFTP），返回 cp、对应时长 cp_time（秒）和功率 cp_power
+    power_curve 默认第 idx 项为 idx + 1 秒，传入 durations 时按其对应的时长，缺失值（NaN）跳过；
+    没有 300 秒及以上的数据时返回 None
+    """
+    if durations is None:
+        durations = range(1, len(power_curve) + 1)
     W_prime = user_config["power"]["WJ"]
     CUR_FTP = user_config["power"]["FTP"]
 
     #---------------------------------------------------------------
     max_w = 0
     max_time = 0
-    for idx, power in enumerate(power_curve):
-        w = (power - CUR_FTP) * (idx + 1)
+    for time, power in zip(durations, power_curve):
+        if power is None or pd.isna(power):
+            continue
+        w = (power - CUR_FTP) * time
         if w > max_w:
             max_w = w
-            max_time = idx + 1
+            max_time = time
     if max_w > W_prime:
         W_prime = max_w
         # 同时应该更新user_config["power"]["WJ"]中的内容
@@ -291,9 +397,8 @@ def ESTIMATE_FTP(power_curve: pd.Series):
     max_cp_time = None
     max_cp_power = None
 
-    for idx, power in enumerate(power_curve):
-        time = idx + 1  # 持续时间，单位：秒
-        if time < 300 :
+    for time, power in zip(durations, power_curve):  # 持续时间，单位：秒
+        if time < 300 or power is None or pd.isna(power):
             continue  # 只考虑300秒及以上的数据点
         cp = power - W_prime / (time - k)
         if (max_cp is None) or (cp > max_cp):
@@ -301,9 +406,10 @@ def ESTIMATE_FTP(power_curve: pd.Series):
             max_cp_time = time
             max_cp_power = power
 
-    # 打印或返回结果，便于调试和后续使用
-    print(f"估算CP最大值: {max_cp:.2f}, 对应time: {max_cp_time}秒, power: {max_cp_power}W")
-    # return max_cp, max_cp_time, max_cp_power
+    if max_cp is None:
+        return None
+    # print(f"估算CP最大值: {max_cp:.2f}, 对应time: {max_cp_time}秒, power: {max_cp_power}W")
+    return {"cp": round(float(max_cp), 1), "cp_time": int(max_cp_time), "cp_power": round(float(max_cp_power))}
 
     
 def rolling_power_30s(power_series: pd.Series) -> list:
@@ -316,9 +422,174 @@ def rolling_power_30s(power_series: pd.Series) -> list:
     return [round(x, 1) for x in rolling_mean.tolist()]
 
 
-    
-
+# 区间检测参数：平滑窗口（秒），进入 / 保持阈值（相对 FTP），最短时长、合并间隔和边界修正的搜索范围（秒）
+INTERVAL_SMOOTHING = 10
+INTERVAL_START_FTP = 0.9
+INTERVAL_END_FTP = 0.75
+INTERVAL_MIN_DURATION = 30
+INTERVAL_MERGE_GAP = 15
+INTERVAL_BOUNDARY_SEARCH = 15
 
+def _mask_runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    布尔数组中连续 True 段的起点和终点（左闭右开）
+    """
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.view(np.int8), [0]))))
+    return edges[0::2], edges[1::2]
 
+def _change_point(prefix: np.ndarray, left: int, right: int, lo: int, hi: int, rising: bool) -> Optional[int]:
+    """
+    把 [left, right) 分为均值不同的两段，在 [lo, hi] 内取两段均值差（按样本数加权）最大的分割点，
+    rising 时只考虑后段高于前段的分割（区间开始），否则只考虑后段低于前段的分割（区间结束）
+    """
+    k = np.arange(max(lo, left + 1), min(hi, right - 1) + 1)
+    if len(k) == 0:
+        return None
+    n1 = k - left
+    n2 = right - k
+    step = (prefix[right] - prefix[k]) / n2 - (prefix[k] - prefix[left]) / n1
+    if not rising:
+        step = -step
+    score = n1 * n2 / (n1 + n2) * np.square(np.maximum(step, 0))
+    return int(k[np.argmax(score)])
+
+def _segment_mean(prefix: np.ndarray, counts: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    total = prefix[ends] - prefix[starts]
+    n = counts[ends] - counts[starts]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(n > 0, total / np.maximum(n, 1), np.nan)
+
+def _segment_max(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    # 各区间互不重叠且有序，reduceat 对相邻下标之间的切片取最大值（忽略 NaN）
+    padded = np.append(values, np.nan)
+    bounds = np.empty(2 * len(starts), dtype=np.intp)
+    bounds[0::2], bounds[1::2] = starts, ends
+    with np.errstate(invalid="ignore"):
+        return np.fmax.reduceat(padded, bounds)[0::2]
+
+def detect_intervals(
+    power_data: pd.Series,
+    heart_rate_data: Optional[pd.Series] = None,
+    cadence_data: Optional[pd.Series] = None,
+    ftp: Optional[float] = None,
+    min_duration: int = INTERVAL_MIN_DURATION,
+) -> List[dict]:
+    """
+    自动检测功率区间（努力段），整体 O(n)：
+    1. 前缀和计算 INTERVAL_SMOOTHING 秒的中心滑动平均功率
+    2. 平滑功率不低于 INTERVAL_END_FTP 的连续段中，包含不低于 INTERVAL_START_FTP 的采样的作为候选（滞回阈值）
+    3. 间隔不超过 INTERVAL_MERGE_GAP 秒的候选合并
+    4. 在边界附近 INTERVAL_BOUNDARY_SEARCH 秒内按原始功率做均值变点检测，修正平滑造成的边界偏移
+    5. 去掉短于 min_duration 秒的区间，用前缀和计算各区间的统计量
+
+    返回每个区间的 start / end（采样序号，左闭右开，与 power_graph 对齐）、duration、
+    avg_power、normalized_power、max_power、intensity_factor、zone（按平均功率所在的功率区间）
+    以及 avg_heart_rate、max_heart_rate、avg_cadence（缺少数据时为 None）
+    """
+    if ftp is None:
+        ftp = user_config["power"]["FTP"]
+    power = np.nan_to_num(np.asarray(power_data, dtype=float))
+    n = len(power)
+    if n < min_duration or ftp <= 0:
+        return []
 
+    prefix = np.concatenate(([0.0], np.cumsum(power)))
+
+    # 中心滑动平均，两端窗口截断
+    half = INTERVAL_SMOOTHING // 2
+    index = np.arange(n)
+    lo = np.maximum(index - half, 0)
+    hi = np.minimum(index + half + 1, n)
+    smoothed = (prefix[hi] - prefix[lo]) / (hi - lo)
+
+    # 滞回阈值：保持段内至少有一个采样达到进入阈值
+    starts, ends = _mask_runs(smoothed >= INTERVAL_END_FTP * ftp)
+    above = np.concatenate(([0], np.cumsum(smoothed >= INTERVAL_START_FTP * ftp)))
+    keep = above[ends] > above[starts]
+    starts, ends = starts[keep], ends[keep]
+    if len(starts) == 0:
+        return []
 
+    # 合并间隔较短的相邻候选
+    group = np.concatenate(([0], np.cumsum(starts[1:] - ends[:-1] > INTERVAL_MERGE_GAP)))
+    first = np.flatnonzero(np.diff(np.concatenate(([-1], group))))
+    last = np.concatenate((first[1:] - 1, [len(group) - 1]))
+    starts, ends = starts[first], ends[last]
+
+    # 边界修正：搜索范围不越过相邻区间
+    search = INTERVAL_BOUNDARY_SEARCH
+    refined_starts, refined_ends = [], []
+    previous_end = 0
+    for i, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        next_start = int(starts[i + 1]) if i + 1 < len(starts) else n
+        new_start = _change_point(
+            prefix, max(previous_end, start - search), end, start - search, start + search, rising=True
+        )
+        start = start if new_start is None else new_start
+        new_end = _change_point(
+            prefix, start, min(next_start, end + search), end - search, end + search, rising=False
+        )
+        end = end if new_end is None else new_end
+        if end - start >= min_duration:
+            refined_starts.append(start)
+            refined_ends.append(end)
+            previous_end = end
+    if not refined_starts:
+        return []
+    starts = np.array(refined_starts, dtype=np.intp)
+    ends = np.array(refined_ends, dtype=np.intp)
+    duration = ends - starts
+
+    avg = (prefix[ends] - prefix[starts]) / duration
+    peak = _segment_max(power, starts, ends)
+
+    # 标准化功率：区间内完整的 30 秒滑动窗口（结束于 start + 29 之后）的四次方均值
+    rolling = np.zeros(n)
+    rolling[29:] = (prefix[30:] - prefix[:-30]) / 30 if n >= 30 else 0
+    rolling_prefix = np.concatenate(([0.0], np.cumsum(np.power(rolling, 4))))
+    np_starts = np.minimum(starts + 29, ends)
+    windows = ends - np_starts
+    with np.errstate(invalid="ignore", divide="ignore"):
+        np_values = np.where(
+            windows > 0,
+            ((rolling_prefix[ends] - rolling_prefix[np_starts]) / np.maximum(windows, 1)) ** 0.25,
+            avg,
+        )
+
+    zone_index = np.digitize(avg, power_zone_bounds(ftp), right=True)
+
+    def channel_stats(data: Optional[pd.Series]):
+        if data is None or len(data) == 0:
+            return None, None
+        values = np.asarray(data, dtype=float)[:n]
+        if len(values) < n:
+            values = np.concatenate((values, np.full(n - len(values), np.nan)))
+        valid = ~np.isnan(values)
+        channel_prefix = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+        channel_counts = np.concatenate(([0], np.cumsum(valid)))
+        return _segment_mean(channel_prefix, channel_counts, starts, ends), _segment_max(values, starts, ends)
+
+    hr_avg, hr_max = channel_stats(heart_rate_data)
+    cadence_avg, _cadence_max = channel_stats(cadence_data)
+
+    def as_int(values, i):
+        if values is None or np.isnan(values[i]):
+            return None
+        return int(round(float(values[i])))
+
+    intervals = []
+    for i in range(len(starts)):
+        intervals.append({
+            "start": int(starts[i]),
+            "end": int(ends[i]),
+            "duration": int(duration[i]),
+            "avg_power": as_int(avg, i),
+            "normalized_power": int(np_values[i]),
+            "max_power": as_int(peak, i),
+            "intensity_factor": round(float(np_values[i]) / ftp, 2),
+            "zone": POWER_ZONE_LABELS[int(zone_index[i])],
+            "avg_heart_rate": as_int(hr_avg, i),
+            "max_heart_rate": as_int(hr_max, i),
+            "avg_cadence": as_int(cadence_avg, i),
+        })
+    return intervals
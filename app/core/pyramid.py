@@ -0,0 +1,67 @@
+import warnings
+from typing import List, Optional
+
+import numpy as np
+
+# 预聚合的桶大小（秒），数据流按 1 秒采样，1 秒层即原始数据
+PYRAMID_BUCKETS = [1, 5, 30, 300]
+
+# 每层数组的列：桶内最小值、均值、最大值
+PYRAMID_STATS = ["min", "mean", "max"]
+
+# 构建金字塔的数值通道
+PYRAMID_CHANNELS = [
+    "power",
+    "heart_rate",
+    "cadence",
+    "enhanced_speed",
+    "enhanced_altitude",
+    "temperature",
+]
+
+
+def build_level(values: np.ndarray, bucket: int) -> np.ndarray:
+    """
+    把序列按 bucket 个采样一组聚合为 (桶数, 3) 的 float32 数组（min / mean / max），
+    缺失值（NaN）不参与计算，整桶缺失时为 NaN
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    buckets = -(-n // bucket)
+    padded = np.full(buckets * bucket, np.nan)
+    padded[:n] = values
+    grouped = padded.reshape(buckets, bucket)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        level = np.column_stack([
+            np.nanmin(grouped, axis=1),
+            np.nanmean(grouped, axis=1),
+            np.nanmax(grouped, axis=1),
+        ])
+    return level.astype(np.float32)
+
+
+def build_pyramid(values, buckets: List[int] = PYRAMID_BUCKETS) -> dict:
+    """
+    为一个通道构建多分辨率金字塔，返回 {桶大小: (桶数, 3) 数组}
+    """
+    return {bucket: build_level(values, bucket) for bucket in buckets}
+
+
+def choose_bucket(span_seconds: float, width: int, buckets: List[int] = PYRAMID_BUCKETS) -> int:
+    """
+    选择能让时间窗口不超过 width 个点的最细分辨率，都超过时使用最粗的一层
+    """
+    for bucket in sorted(buckets):
+        if span_seconds / bucket <= width:
+            return bucket
+    return max(buckets)
+
+
+def window_slice(bucket: int, start: float, end: Optional[float], total_buckets: int) -> slice:
+    """
+    时间窗口 [start, end) 秒在某一层中对应的桶范围
+    """
+    first = max(0, int(start // bucket))
+    last = total_buckets if end is None else min(total_buckets, -(-int(end) // bucket))
+    return slice(first, max(first, last))
@@ -7,6 +7,21 @@ def load_user_config() -> dict:
     with open(CONFIG_PATH, "r", encoding="utf-8") as f:
         return json.load(f)
 
+# 分析模块（power、heart_rate、more_data）共用的配置，由 refresh_user_config 原地更新
+user_config = load_user_config()
+
+def refresh_user_config() -> dict:
+    """
+    重新读取配置文件并原地更新共用的 user_config，返回更新后的配置
+    每次分析前调用，保证计算和缓存键都使用当前配置（包括工作进程中）
+    按顶层键替换而不先清空，并发的分析不会读到空配置
+    """
+    latest = load_user_config()
+    if latest != user_config:
+        user_config.update(latest)
+    return user_config
+
 def save_user_config(new_config: dict) -> None:
     with open(CONFIG_PATH, "w", encoding="utf-8") as f:
         json.dump(new_config, f, indent=2)
+    user_config.update(new_config)
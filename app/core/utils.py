@@ -1,4 +1,8 @@
+import os
 import re
+import shutil
+import tempfile
+from contextlib import contextmanager
 
 def format_seconds(seconds: float) -> str:
     """
@@ -31,6 +35,70 @@ def parse_time_string(time_str: str) -> int:
 
     return h * 3600 + m * 60 + s
 
+@contextmanager
+def file_lock(path: str):
+    """
+    跨进程的排他文件锁，用于多个工作进程同时写入同一份索引文件
+    """
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def spool_to_disk(fileobj, suffix: str = "", chunk_size: int = 1024 * 1024) -> str:
+    """
+    把上传的文件对象分块复制到磁盘临时文件并返回路径，不把整个文件读入内存
+    工作进程按路径读取，用完后由调用方通过 remove_file 删除
+    """
+    fileobj.seek(0)
+    with tempfile.NamedTemporaryFile("wb", suffix=suffix, delete=False) as f:
+        shutil.copyfileobj(fileobj, f, chunk_size)
+    fileobj.seek(0)
+    return f.name
+
+def spool_upload(fileobj, suffix: str = "", to_disk: bool = False):
+    """
+    暂存上传的文件供分析读取：文件已在磁盘上（SpooledTemporaryFile 超过内存上限后写入磁盘，
+    或不是 SpooledTemporaryFile）或 to_disk（工作进程需要按路径读取）时通过 spool_to_disk 复制到
+    磁盘临时文件并返回路径，否则直接返回内存中的字节，不经过磁盘
+    用完后由调用方通过 discard_upload 清理
+    """
+    if to_disk or getattr(fileobj, "_rolled", True):
+        return spool_to_disk(fileobj, suffix)
+    fileobj.seek(0)
+    data = fileobj.read()
+    fileobj.seek(0)
+    return data
+
+def discard_upload(source) -> None:
+    """
+    删除 spool_upload 写出的临时文件，内存中的字节无需处理
+    """
+    if isinstance(source, str):
+        remove_file(source)
+
+def remove_file(path: str) -> None:
+    """
+    删除临时文件，文件不存在时忽略
+    """
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
 from fitparse import FitFile
 from collections import defaultdict
 
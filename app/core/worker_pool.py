@@ -0,0 +1,109 @@
+import asyncio
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class WorkerPoolFull(Exception):
+    """
+    在途任务数达到上限
+    """
+
+
+class BoundedWorkerPool:
+    """
+    限制在途任务数（执行中 + 排队）的工作池，CPU 密集的分析在这里执行，不占用事件循环
+    达到上限时立即抛出 WorkerPoolFull，由接口返回 503，而不是无限排队
+
+    Args:
+        max_workers (int): 工作进程（线程）数
+        max_pending (int): 在途任务上限，不小于 max_workers
+        use_processes (bool): True 使用进程池，False 使用线程池
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, use_processes: bool = True):
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(self.max_workers, max_pending)
+        self.use_processes = use_processes
+        self._executor = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.use_processes:
+                # spawn 启动的工作进程不继承服务进程的监听套接字和事件循环，服务退出时随之结束
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._in_flight >= self.max_pending:
+                raise WorkerPoolFull(f"{self._in_flight} tasks in flight")
+            self._in_flight += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def _finish(self, cleanup, _future) -> None:
+        try:
+            if cleanup is not None:
+                cleanup()
+        finally:
+            self._release()
+
+    def submit(self, func, *args, **kwargs) -> asyncio.Future:
+        """
+        提交 func(*args, **kwargs) 并立即返回 asyncio Future，需在事件循环中调用
+        使用进程池时参数和返回值需可 pickle
+        """
+        return self.submit_with_cleanup(None, func, *args, **kwargs)
+
+    def submit_with_cleanup(self, cleanup, func, *args, **kwargs) -> asyncio.Future:
+        """
+        与 submit 相同，任务真正结束后（包括排队中被取消）调用 cleanup()，例如删除任务读取的临时文件
+        工作池已满时抛出 WorkerPoolFull，不调用 cleanup
+        """
+        self._acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            future = self._get_executor().submit(func, *args, **kwargs)
+        except BaseException:
+            self._release()
+            raise
+        # 名额和 cleanup 跟随工作池中的任务而不是返回的 asyncio Future：
+        # 取消 asyncio Future 只能取消尚未开始的任务，已开始的任务执行完后才释放名额
+        future.add_done_callback(functools.partial(self._finish, cleanup))
+        return asyncio.wrap_future(future, loop=loop)
+
+    async def run(self, func, *args, **kwargs):
+        """
+        在工作池中执行并等待结果，请求被取消时任务仍在工作池中执行完
+        """
+        return await asyncio.shield(self.submit(func, *args, **kwargs))
+
+    def warm_up(self, func, *args) -> None:
+        """
+        预先启动工作进程并执行一次 func（通常是分析模块中的轻量函数），
+        让工作进程提前导入分析模块，避免第一个请求承担进程启动开销
+        """
+        if not self.use_processes:
+            return
+        executor = self._get_executor()
+        for _ in range(self.max_workers):
+            executor.submit(func, *args)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,135 @@
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.utils import format_seconds
+
+POWER_ZONE_LABELS = [f"zone_{i}" for i in range(1, 8)]
+HEART_RATE_ZONE_LABELS = ["Z1", "Z2", "Z3", "Z4", "Z5"]
+HEART_RATE_ZONE_METHODS = ("threshold", "max", "hrr")
+
+# 相对 FTP 的功率带（左闭右开），碳水消耗和训练效果共用同一次分箱
+FTP_BANDS = (0.0, 0.6, 0.75, 0.9, 1.05, 1.2, 99.0)
+
+# 心率储备百分比的分界（左闭右开），训练效果的心率算法使用
+HEART_RATE_RESERVE_BANDS = (0.6, 0.8, 0.9)
+
+
+def zone_histogram(
+    values,
+    edges: Sequence[float],
+    right: bool = True,
+    weights=None,
+) -> np.ndarray:
+    """
+    按 edges 对数据分箱一次（np.digitize + np.bincount），返回长度为 len(edges) + 1 的数组：
+    第 i 箱为 edges[i - 1] 与 edges[i] 之间的样本数（传入 weights 时为权重之和），
+    第 0 箱为低于 edges[0] 的部分，最后一箱为高于 edges[-1] 的部分，NaN 不计入任何箱
+    right=True 时区间为左开右闭 (lower, upper]，否则为左闭右开 [lower, upper)
+    edges 不单调时按累计最大值处理，倒置的区间为空
+    """
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    if not valid.all():
+        values = values[valid]
+        if weights is not None:
+            weights = np.asarray(weights, dtype=float)[valid]
+    edges = np.maximum.accumulate(np.asarray(edges, dtype=float))
+    bins = np.digitize(values, edges, right=right)
+    return np.bincount(bins, weights=weights, minlength=len(edges) + 1)
+
+
+def power_zone_bounds(ftp: float) -> List[int]:
+    """
+    7 区间功率的分界（Z1 上限到 Z6 上限），区间为 (lower, upper]，Z1 包含 0 及以下，Z7 无上限
+    """
+    return [math.floor(p * ftp) for p in (0.55, 0.75, 0.9, 1.05, 1.2, 1.5)]
+
+
+def sweet_spot_bounds(ftp: float) -> Tuple[int, int]:
+    """
+    Sweet Spot 区间（84% ~ 97% FTP）的上下限，区间为 (lower, upper]
+    """
+    return int(0.84 * ftp), int(0.97 * ftp)
+
+
+def heart_rate_zone_bounds(method: str, hr_config: dict) -> List[int]:
+    """
+    5 区间心率的 6 个分界，Z1 为 [b0, b1]，其余为 (lower, upper]
+    """
+    threshold = hr_config["threshold_bpm"]
+    max_bpm = hr_config["max_bpm"]
+    resting = hr_config.get("resting_bpm", 60)
+    if method == "threshold":
+        return [math.floor(p * threshold) for p in (0.67, 0.80, 0.89, 0.97, 1.02)] + [max_bpm]
+    if method == "max":
+        return [math.floor(p * max_bpm) for p in (0.50, 0.60, 0.70, 0.80, 0.90)] + [max_bpm]
+    if method == "hrr":
+        hrr = max_bpm - resting
+        return [math.floor(resting + hrr * p) for p in (0.59, 0.74, 0.84, 0.88, 0.95, 1.0)]
+    raise ValueError("method must be one of: 'threshold', 'max', 'hrr'")
+
+
+def power_zone_seconds(power_data: pd.Series, ftp: float) -> Dict[str, object]:
+    """
+    功率区间用时：zones 为 7 个区间的秒数，SS 为 Sweet Spot 秒数，total 为总采样数
+    """
+    power = power_data.to_numpy(dtype=float)
+    zones = zone_histogram(power, power_zone_bounds(ftp))
+    # Sweet Spot 与 Z3 / Z4 重叠，单独分箱
+    ss = zone_histogram(power, sweet_spot_bounds(ftp))
+    return {"zones": zones, "SS": int(ss[1]), "total": len(power)}
+
+
+def heart_rate_zone_seconds(hr_series: pd.Series, hr_config: dict) -> Dict[str, np.ndarray]:
+    """
+    三种心率区间方法（threshold / max / hrr）各 5 个区间的秒数，心率只转换一次
+    超出 [b0, b5] 的心率不计入任何区间，与逐区间比较的结果一致
+    """
+    hr = hr_series.to_numpy(dtype=float)
+    result = {}
+    for method in HEART_RATE_ZONE_METHODS:
+        bounds = heart_rate_zone_bounds(method, hr_config)
+        counts = zone_histogram(hr, bounds)
+        zones = counts[1:len(bounds)].copy()
+        # Z1 下限为闭区间，等于 b0 的样本在分箱时落在第 0 箱
+        zones[0] += np.count_nonzero(hr == bounds[0])
+        result[method] = zones
+    return result
+
+
+def ftp_band_totals(power_data: pd.Series, ftp: float) -> Dict[str, np.ndarray]:
+    """
+    按 FTP_BANDS 对相对功率分箱一次，返回各箱的秒数 seconds 和功率之和 work（焦耳），
+    长度为 len(FTP_BANDS) + 1，第 0 箱为负功率，最后一箱为不低于 99 倍 FTP 的异常值
+    缺失功率按 0 计
+    """
+    power = power_data.fillna(0).to_numpy(dtype=float)
+    relative = power / ftp
+    bins = np.digitize(relative, FTP_BANDS, right=False)
+    minlength = len(FTP_BANDS) + 1
+    return {
+        "seconds": np.bincount(bins, minlength=minlength),
+        "work": np.bincount(bins, weights=power, minlength=minlength),
+    }
+
+
+def format_zone_times(
+    seconds: Sequence[int],
+    labels: Sequence[str],
+    total: Optional[int] = None,
+) -> Dict[str, dict]:
+    """
+    各区间秒数转为 {label: {"time": "1h2m3s", "percent": "12.3%"}}，total 默认为各区间之和
+    """
+    total = int(sum(seconds)) if total is None else total
+    result = {}
+    for label, zone_sec in zip(labels, seconds):
+        percent = (zone_sec / total * 100) if total else 0
+        result[label] = {
+            "time": format_seconds(zone_sec),
+            "percent": f"{percent:.1f}%",
+        }
+    return result
@@ -1,7 +1,18 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.api import user_config, user_config_update, upload
+from app.api import user_config, user_config_update, upload, batch_upload, jobs, activities, best_power
 
-app = FastAPI(title="My Intervals Backend")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动时预热分析工作池，关闭时停止任务调度并关闭工作池
+    upload.warm_up_analysis_pool()
+    yield
+    jobs.discard_queued_jobs()
+    upload.shutdown_analysis_pool()
+
+
+app = FastAPI(title="My Intervals Backend", lifespan=lifespan)
 
 @app.get("/")
 def root():
@@ -10,3 +21,7 @@ def root():
 app.include_router(user_config.router, prefix="/api")
 app.include_router(user_config_update.router, prefix="/api")
 app.include_router(upload.router, prefix="/api")
+app.include_router(batch_upload.router, prefix="/api")
+app.include_router(jobs.router, prefix="/api")
+app.include_router(activities.router, prefix="/api")
+app.include_router(best_power.router, prefix="/api")
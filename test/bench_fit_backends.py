@@ -0,0 +1,126 @@
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.core.fit_backends import FIT_BACKENDS
+from app.core.fit_parser import decode_fit
+
+# upload_fit 实际读取的 record 字段
+RECORD_FIELDS = [
+    "timestamp",
+    "power",
+    "heart_rate",
+    "cadence",
+    "enhanced_speed",
+    "altitude",
+    "enhanced_altitude",
+    "distance",
+    "temperature",
+    "left_right_balance",
+]
+
+# upload_fit 实际读取的 session 字段
+SESSION_FIELDS = [
+    "total_timer_time",
+    "total_distance",
+    "max_speed",
+    "enhanced_max_speed",
+    "avg_speed",
+    "enhanced_avg_speed",
+    "total_ascent",
+    "total_descent",
+    "avg_power",
+    "max_power",
+    "normalized_power",
+    "training_stress_score",
+    "total_work",
+    "work_above_ftp",
+    "total_calories",
+    "avg_left_torque_effectiveness",
+    "avg_right_torque_effectiveness",
+    "avg_left_pedal_smoothness",
+    "avg_right_pedal_smoothness",
+]
+
+
+def decode(file_path, backend):
+    result = decode_fit(file_path, backend)
+    return result.to_record_dataframe(), result.to_session_dataframe()
+
+
+def equivalence_errors(reference, candidate):
+    """
+    以 fitparse 为基准，比较分析用到的字段，返回不一致的字段列表
+    """
+    errors = []
+    for expected, actual, names in (
+        (reference[0], candidate[0], RECORD_FIELDS),
+        (reference[1], candidate[1], SESSION_FIELDS),
+    ):
+        for name in names:
+            if name not in expected.columns:
+                continue
+            if name not in actual.columns:
+                if not expected[name].isnull().all():
+                    errors.append(name)
+                continue
+            left = expected[name].reset_index(drop=True)
+            right = actual[name].reset_index(drop=True)
+            both_null = left.isnull() & right.isnull()
+            if not (both_null | (left == right)).all():
+                errors.append(name)
+    return errors
+
+
+def bench_backend(file_path, backend, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        records, session = decode(file_path, backend)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    decode(file_path, backend)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (records, session), len(records) / best, peak / 2**20
+
+
+if __name__ == "__main__":
+    folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Fits")
+    files = [
+        os.path.join(folder, filename)
+        for filename in sorted(os.listdir(folder))
+        if filename.lower().endswith(".fit")
+    ]
+
+    summary = {backend: [] for backend in FIT_BACKENDS}
+    for file_path in files:
+        print(f"=== {os.path.basename(file_path)} ===")
+        reference = decode(file_path, "fitparse")
+        for backend in FIT_BACKENDS:
+            try:
+                output, records_per_sec, peak_mb = bench_backend(file_path, backend)
+            except ImportError as e:
+                print(f"  {backend:10s} 未安装: {e}")
+                summary[backend].append(None)
+                continue
+            errors = equivalence_errors(reference, output)
+            summary[backend].append(None if errors else records_per_sec)
+            status = "OK" if not errors else "DIFF " + ", ".join(errors)
+            print(
+                f"  {backend:10s} {records_per_sec:10.0f} records/s"
+                f"  peak {peak_mb:6.1f} MB  {status}"
+            )
+
+    # 推荐所有文件都通过等价性检查的最快后端
+    passing = {
+        backend: sum(results) / len(results)
+        for backend, results in summary.items()
+        if results and all(r is not None for r in results)
+    }
+    if passing:
+        print(f"\n最快且输出一致的后端: {max(passing, key=passing.get)}")
@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+from fitparse import FitFile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.core.fit_parser import RecordColumns
+
+
+def load_record_fields(file_path):
+    """
+    预先解码 record 消息，只保留 (字段名, 值) 列表，
+    这样基准只比较 DataFrame 的构造成本，不受 FIT 解码本身影响
+    """
+    fitfile = FitFile(file_path)
+    return [[(d.name, d.value) for d in record] for record in fitfile.get_messages("record")]
+
+
+def build_with_dicts(rows):
+    # 原有路径：每条记录构造一个字典，再由 pandas 推断类型
+    records = []
+    for fields in rows:
+        data = {}
+        for name, value in fields:
+            data[name] = value
+        records.append(data)
+    return pd.DataFrame(records)
+
+
+def build_with_columns(rows):
+    columns = RecordColumns()
+    for fields in rows:
+        columns.add(fields)
+    return columns.to_dataframe()
+
+
+def best_of(func, rows, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(rows)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(func, rows):
+    tracemalloc.start()
+    func(rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def bench_record_frame(file_path, scale=1):
+    rows = load_record_fields(file_path) * scale
+    pd.testing.assert_frame_equal(build_with_dicts(rows), build_with_columns(rows))
+
+    dict_sec = best_of(build_with_dicts, rows)
+    column_sec = best_of(build_with_columns, rows)
+    dict_mb = peak_memory(build_with_dicts, rows) / 2**20
+    column_mb = peak_memory(build_with_columns, rows) / 2**20
+    print(
+        f"  {len(rows):>7d} rows  dicts: {dict_sec * 1000:8.1f} ms {dict_mb:7.1f} MB"
+        f"  columns: {column_sec * 1000:8.1f} ms {column_mb:7.1f} MB"
+        f"  speedup: {dict_sec / column_sec:4.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Fits")
+    for filename in sorted(os.listdir(folder)):
+        if not filename.lower().endswith(".fit"):
+            continue
+        print(f"=== {filename} ===")
+        # 通过重复记录模拟 1 万 ~ 10 万行的长时间骑行
+        for scale in (1, 10, 60):
+            bench_record_frame(os.path.join(folder, filename), scale)
@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.core.power import detect_intervals, user_config
+
+
+def structured_ride(hours, seed=0):
+    """
+    模拟 1Hz 的结构化训练：有氧骑行中每小时一组 4 x 5 分钟阈值上区间和 6 x 30 秒冲刺，
+    返回功率、心率、踏频和实际区间的起点
+    """
+    rng = np.random.default_rng(seed)
+    ftp = user_config["power"]["FTP"]
+    segments, expected, position = [], [], 0
+    for _ in range(hours):
+        blocks = [(900, 0.6)] + [(300, 1.1), (180, 0.45)] * 4 + [(30, 1.7), (90, 0.45)] * 6 + [(900, 0.6)]
+        for duration, intensity in blocks:
+            if intensity > 1:
+                expected.append(position)
+            segments.append(np.full(duration, intensity * ftp))
+            position += duration
+    power = np.clip(np.concatenate(segments) + rng.normal(0, 25, position), 0, None)
+    heart_rate = 100 + power / 5 + rng.normal(0, 2, position)
+    cadence = np.full(position, 90.0)
+    return pd.Series(power), pd.Series(heart_rate), pd.Series(cadence), expected
+
+
+if __name__ == "__main__":
+    print(f"{'hours':>5s} {'samples':>8s} {'expected':>8s} {'found':>6s} {'max start err':>13s} {'time':>9s}")
+    for hours in (1, 2, 4, 8):
+        power, heart_rate, cadence, expected = structured_ride(hours)
+        detect_intervals(power, heart_rate, cadence)
+        start = time.perf_counter()
+        intervals = detect_intervals(power, heart_rate, cadence)
+        elapsed = time.perf_counter() - start
+        found = [interval["start"] for interval in intervals]
+        error = max(min(abs(f - e) for f in found) for e in expected) if found else -1
+        print(
+            f"{hours:>5d} {len(power):>8d} {len(expected):>8d} {len(intervals):>6d} "
+            f"{error:>12d}s {elapsed * 1000:7.2f}ms"
+        )
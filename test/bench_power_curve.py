@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.core.power import get_max_power_duration_curve, log_duration_grid
+
+
+def rolling_curve(power_data):
+    # 原有实现：每个持续时间做一次 rolling().mean().max()，O(n²)
+    max_avg_power = [0]
+    for duration in range(1, len(power_data) - 2):
+        max_power = power_data.rolling(window=duration).mean().max()
+        max_avg_power.append(0 if pd.isna(max_power) else round(max_power))
+    return max_avg_power
+
+
+def synthetic_ride(seconds, seed=0):
+    """
+    模拟 1Hz 功率数据：基础功率 + 间歇 + 噪声，约 1% 的缺失值
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(seconds)
+    power = 180 + 80 * (np.sin(t / 300) > 0.7) + rng.normal(0, 40, seconds)
+    power = np.clip(np.round(power), 0, None)
+    power[rng.random(seconds) < 0.01] = np.nan
+    return pd.Series(power)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    # 原有实现超过 1 小时的数据耗时过长，只在较短的数据上对比并校验结果一致
+    rolling_limit = int(sys.argv[1]) if len(sys.argv) > 1 else 3600
+    print(f"{'seconds':>8s} {'rolling':>10s} {'exact':>10s} {'log grid':>10s} {'grid pts':>8s}")
+    for seconds in (600, 1800, 3600, 2 * 3600, 5 * 3600, 10 * 3600):
+        power = synthetic_ride(seconds)
+        exact, exact_sec = timed(get_max_power_duration_curve, power)
+        grid = log_duration_grid(len(power) - 3)
+        _, grid_sec = timed(get_max_power_duration_curve, power, grid)
+        if seconds <= rolling_limit:
+            expected, rolling_sec = timed(rolling_curve, power)
+            assert expected == exact, "cumsum curve differs from rolling curve"
+            rolling = f"{rolling_sec * 1000:8.0f}ms"
+        else:
+            rolling = f"{'-':>10s}"
+        print(
+            f"{seconds:>8d} {rolling} {exact_sec * 1000:8.1f}ms {grid_sec * 1000:8.1f}ms {len(grid):>8d}"
+        )
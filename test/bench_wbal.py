@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.core.power import WBAL_MODELS, get_wbal_curve, user_config, wbal_balance
+from bench_power_curve import synthetic_ride
+
+
+def loop_wbal(power_data):
+    # 原有实现：逐点循环，每个采样调用一次 np.exp
+    W_prime = user_config["power"]["WJ"]
+    CP = user_config["power"]["FTP"]
+    tau = W_prime / (CP * 0.5)
+    wbal = []
+    balance = W_prime
+    for p in power_data:
+        if p <= CP:
+            balance += (W_prime - balance) * (1 - np.exp(-1.0 / tau))
+        else:
+            balance -= p - CP
+        balance = max(0.0, min(W_prime, balance))
+        wbal.append(balance)
+    return wbal
+
+
+def best_of(func, *args, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    # curve 为 get_wbal_curve（exponential，含转换为列表），其余列只计算数组
+    print(f"{'seconds':>8s} {'loop':>10s}" + "".join(f" {model:>14s}" for model in (*WBAL_MODELS, "curve")))
+    for seconds in (3600, 3 * 3600, 5 * 3600, 8 * 3600, 10 * 3600):
+        # clean_fit_data 之后功率中不含缺失值
+        power = synthetic_ride(seconds).fillna(0)
+        expected = np.array(loop_wbal(power))
+        assert np.allclose(expected, wbal_balance(power), atol=1e-6), "vectorised W'bal differs from loop"
+        loop_sec = best_of(loop_wbal, power, repeat=1)
+        cells = []
+        for model in WBAL_MODELS:
+            sec = best_of(wbal_balance, power, model)
+            cells.append(f" {sec * 1000:7.2f}ms {loop_sec / sec:4.0f}x")
+        sec = best_of(get_wbal_curve, power)
+        cells.append(f" {sec * 1000:7.2f}ms {loop_sec / sec:4.0f}x")
+        print(f"{seconds:>8d} {loop_sec * 1000:8.1f}ms" + "".join(cells))
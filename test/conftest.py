@@ -0,0 +1,12 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# app 中的模块按相对路径读取 app/config/user_config.json，测试从仓库根目录运行
+os.chdir(ROOT)
+
+# 测试中不写入最佳功率索引和分析缓存等持久化数据
+os.environ["BEST_POWER_INDEX"] = ""
+os.environ["ANALYSIS_CACHE_SIZE"] = "0"
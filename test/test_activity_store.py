@@ -0,0 +1,56 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from app.core.activity_store import ActivityStore
+
+
+def make_streams(n=120):
+    return pd.DataFrame({
+        "timestamp": pd.date_range("2025-01-01", periods=n, freq="s"),
+        "power": np.arange(n, dtype=float),
+        "heart_rate": np.full(n, 140.0),
+    })
+
+
+def test_save_writes_one_metadata_file_per_activity(tmp_path):
+    store = ActivityStore(str(tmp_path))
+    streams = make_streams()
+    entry = store.save("a1", streams, metadata={"filename": "a.fit"}, fields=["power", "heart_rate", "timestamp"])
+    store.save("a2", make_streams(60))
+
+    assert not (tmp_path / "index.json").exists()
+    assert json.loads((tmp_path / "a1.json").read_text(encoding="utf-8")) == entry
+    assert entry["samples"] == 120 and entry["filename"] == "a.fit"
+    assert set(store.list_activities()) == {"a1", "a2"}
+    assert set(store.list_activities(start="2025-01-01T00:00:00")) == {"a1", "a2"}
+    assert store.list_activities(start="2025-01-02") == {}
+
+    loaded = store.load_streams("a1", ["power"])
+    np.testing.assert_array_equal(loaded["power"].to_numpy(), streams["power"].to_numpy())
+    # 保存时未解码的列不能从存储中读取
+    assert store.load_streams("a1", ["cadence"]) is None
+    assert store.load_streams("missing") is None
+
+
+def test_metadata_cache_follows_file_changes(tmp_path):
+    store = ActivityStore(str(tmp_path))
+    store.save("a1", make_streams())
+    assert store.get_metadata("a1") is store.get_metadata("a1")
+
+    # 其他进程重新保存后读取到新的元数据
+    ActivityStore(str(tmp_path)).save("a1", make_streams(30))
+    assert store.get_metadata("a1")["samples"] == 30
+
+
+def test_legacy_index_is_split(tmp_path):
+    store = ActivityStore(str(tmp_path))
+    entry = store.save("a1", make_streams())
+    (tmp_path / "a1.json").unlink()
+    (tmp_path / "index.json").write_text(json.dumps({"a1": entry}), encoding="utf-8")
+
+    migrated = ActivityStore(str(tmp_path))
+    assert migrated.get_metadata("a1") == entry
+    assert not (tmp_path / "index.json").exists()
+    assert len(migrated.load_streams("a1")) == 120
@@ -0,0 +1,136 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import best_power
+from app.core.activity_archive import ActivityArchive
+from app.core.best_power import BestPowerIndex, BestPowerIndexMismatch, epoch_day
+
+DURATIONS = np.array([1, 5, 60, 300])
+DAY = epoch_day(datetime.datetime(2025, 6, 30, tzinfo=datetime.timezone.utc))
+
+
+def curve(*values):
+    return np.array(values, dtype=np.float32)
+
+
+@pytest.fixture
+def index(tmp_path):
+    return BestPowerIndex(str(tmp_path / "best_power.bin"), DURATIONS)
+
+
+def test_daily_max_merge(index):
+    assert index.update("a", DAY, curve(900, 600, 400, np.nan))
+    assert index.update("b", DAY, curve(800, 700, 350, 300))
+    assert index.update("c", DAY - 10, curve(1000, 500, 300, 250))
+    # 同一天取逐元素最大值，缺失的时长不覆盖已有值
+    np.testing.assert_array_equal(index.best(DAY, DAY), curve(900, 700, 400, 300))
+    np.testing.assert_array_equal(index.best(), curve(1000, 700, 400, 300))
+    np.testing.assert_array_equal(index.best(DAY - 10, DAY - 1), curve(1000, 500, 300, 250))
+    assert np.isnan(index.best(DAY + 1, DAY + 5)).all()
+    assert np.isnan(index.best(DAY - 9, DAY - 1)).all()
+
+
+def test_duplicate_activity_is_skipped(index):
+    assert index.update("a", DAY, curve(500, 400, 300, 200))
+    assert not index.update("a", DAY, curve(900, 900, 900, 900))
+    assert "a" in index and "b" not in index and len(index) == 1
+    np.testing.assert_array_equal(index.best(), curve(500, 400, 300, 200))
+
+
+def test_instances_share_appended_records(index):
+    # 另一个工作进程的实例：只读取追加的记录
+    other = BestPowerIndex(index.path, DURATIONS)
+    index.update("a", DAY, curve(500, 400, 300, 200))
+    assert "a" in other
+    assert not other.update("a", DAY, curve(900, 900, 900, 900))
+    other.update("b", DAY + 1, curve(600, 300, 200, 100))
+    np.testing.assert_array_equal(index.best(), curve(600, 400, 300, 200))
+    # 每个活动追加一条记录，不重写整个文件
+    with open(index.path, "rb") as f:
+        size = len(f.read())
+    assert size == index.header_size + 2 * index.record_dtype.itemsize
+    # 中断写入留下的半截记录被忽略，并在下次写入时覆盖
+    with open(index.path, "ab") as f:
+        f.write(b"\0" * 10)
+    assert len(BestPowerIndex(index.path, DURATIONS)) == 2
+    index.update("c", DAY, curve(1, 1, 1, 1))
+    assert len(BestPowerIndex(index.path, DURATIONS)) == 3
+
+
+def test_duration_grid_mismatch_raises(index):
+    index.update("a", DAY, curve(500, 400, 300, 200))
+    changed = BestPowerIndex(index.path, np.array([1, 5, 60]))
+    with pytest.raises(BestPowerIndexMismatch):
+        changed.best()
+    with pytest.raises(BestPowerIndexMismatch):
+        changed.update("b", DAY, curve(1, 1, 1))
+    # 原有记录保持不变
+    assert len(BestPowerIndex(index.path, DURATIONS)) == 1
+
+
+def ride(start, seconds, watts):
+    return pd.DataFrame({
+        "timestamp": pd.date_range(start, periods=seconds, freq="s"),
+        "power": np.full(seconds, float(watts)),
+    })
+
+
+def test_rebuild_from_archive(tmp_path, index):
+    archive = ActivityArchive(str(tmp_path / "archive"))
+    archive.append("a", ride("2025-06-30 08:00", 600, 250))
+    archive.append("b", ride("2025-06-29 08:00", 120, 400))
+
+    # 网格变化后不能读取旧文件，rebuild 后恢复
+    BestPowerIndex(index.path, np.array([1, 5])).update("old", DAY, curve(1, 1))
+    with pytest.raises(BestPowerIndexMismatch):
+        index.best()
+    assert index.rebuild(archive) == 2
+    assert "a" in index and "b" in index and "old" not in index
+    np.testing.assert_array_equal(index.best(DAY, DAY), curve(250, 250, 250, 250))
+    np.testing.assert_array_equal(index.best(DAY - 1, DAY - 1), curve(400, 400, 400, np.nan))
+    # 其他实例发现文件被替换后重新读取
+    assert len(BestPowerIndex(index.path, DURATIONS)) == 2
+
+
+@pytest.fixture
+def client(index, monkeypatch):
+    monkeypatch.setattr(best_power, "best_power_index", index)
+    app = FastAPI()
+    app.include_router(best_power.router, prefix="/api")
+    return TestClient(app)
+
+
+def test_get_best_power_windows(client, index):
+    as_of = datetime.date(2025, 6, 30)
+    index.update("today", DAY, curve(500, 400, 300, 200))
+    index.update("month", DAY - 30, curve(600, 450, 280, 210))
+    index.update("quarter", DAY - 80, curve(700, 420, 350, 190))
+    index.update("last_year", DAY - 200, curve(800, 300, 200, 100))
+    index.update("future", DAY + 1, curve(2000, 2000, 2000, 2000))
+
+    response = client.get("/api/best_power", params={"as_of": as_of.isoformat()})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["durations"] == DURATIONS.tolist()
+    curves = body["curves"]
+    assert curves["last_42_days"] == [600, 450, 300, 210]
+    assert curves["last_90_days"] == [700, 450, 350, 210]
+    assert curves["last_365_days"] == curves["all_time"] == [800, 450, 350, 210]
+    # 赛季从 1 月 1 日开始，不包括 200 天前
+    assert curves["season"] == [700, 450, 350, 210]
+    assert set(body["estimated_cp"]) == set(curves)
+
+    response = client.get("/api/best_power", params={"as_of": (as_of - datetime.timedelta(days=100)).isoformat()})
+    assert response.json()["curves"]["last_42_days"] == [None] * len(DURATIONS)
+
+
+def test_get_best_power_errors(client, index, monkeypatch):
+    BestPowerIndex(index.path, np.array([1])).update("a", DAY, curve(1))
+    assert client.get("/api/best_power").status_code == 409
+    monkeypatch.setattr(best_power, "best_power_index", None)
+    assert client.get("/api/best_power").status_code == 404
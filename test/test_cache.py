@@ -0,0 +1,80 @@
+import copy
+import io
+import json
+
+import pytest
+
+from app.core import user_config as config_module
+from app.core.cache import AnalysisCache, analysis_cache_key, config_fingerprint, hash_fit_upload
+
+CONFIG = {
+    "weight": 70,
+    "age": 30,
+    "power": {"FTP": 250, "WJ": 20000},
+    "heart_rate": {"max_bpm": 190, "threshold_bpm": 170},
+    "units": {"speed": "kph"},
+}
+
+
+def test_hash_rewinds_file():
+    fileobj = io.BytesIO(b"fit" * 1000)
+    fileobj.read(10)
+    first = hash_fit_upload(fileobj, chunk_size=7)
+    assert fileobj.tell() == 0
+    assert first == hash_fit_upload(fileobj)
+
+
+@pytest.mark.parametrize("path", [("weight",), ("power", "FTP"), ("power", "WJ"), ("heart_rate", "max_bpm")])
+def test_relevant_config_changes_key(path):
+    changed = copy.deepcopy(CONFIG)
+    target = changed
+    for key in path[:-1]:
+        target = target[key]
+    target[path[-1]] += 1
+    assert analysis_cache_key("abc", changed) != analysis_cache_key("abc", CONFIG)
+
+
+def test_irrelevant_config_keeps_key():
+    changed = copy.deepcopy(CONFIG)
+    changed["age"] = 31
+    changed["units"]["speed"] = "mph"
+    assert config_fingerprint(changed) == config_fingerprint(CONFIG)
+
+
+def test_params_and_selection_change_key():
+    base = analysis_cache_key("abc", CONFIG, {"curves": True, "wbal_model": "exponential"})
+    # 参数顺序不影响缓存键
+    assert base == analysis_cache_key("abc", CONFIG, {"wbal_model": "exponential", "curves": True})
+    assert base != analysis_cache_key("abc", CONFIG, {"curves": False, "wbal_model": "exponential"})
+    assert base != analysis_cache_key(
+        "abc", CONFIG, {"curves": True, "wbal_model": "exponential", "sections": ["OVERVIEW"]}
+    )
+    assert base != analysis_cache_key("abd", CONFIG, {"curves": True, "wbal_model": "exponential"})
+
+
+def test_refresh_reads_saved_config(tmp_path, monkeypatch):
+    path = tmp_path / "user_config.json"
+    path.write_text(json.dumps(CONFIG), encoding="utf-8")
+    monkeypatch.setattr(config_module, "CONFIG_PATH", path)
+    monkeypatch.setattr(config_module, "user_config", copy.deepcopy(CONFIG))
+    before = analysis_cache_key("abc", config_module.refresh_user_config())
+
+    changed = copy.deepcopy(CONFIG)
+    changed["power"]["FTP"] = 300
+    path.write_text(json.dumps(changed), encoding="utf-8")
+    shared = config_module.user_config
+    refreshed = config_module.refresh_user_config()
+    # 原地更新，分析模块持有的同一个字典也看到新配置
+    assert refreshed is shared
+    assert shared["power"]["FTP"] == 300
+    assert analysis_cache_key("abc", refreshed) != before
+
+
+def test_lru_and_disk_tiers(tmp_path):
+    cache = AnalysisCache(max_entries=2, disk_dir=str(tmp_path))
+    for key in ("a", "b", "c"):
+        cache.set(key, {"key": key})
+    assert list(cache._memory) == ["b", "c"]
+    # 内存中淘汰的条目仍可从磁盘读取
+    assert cache.get("a") == {"key": "a"}
+    assert AnalysisCache(max_entries=0).get("a") is None
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from app.api.upload import DOWNSAMPLE_SERIES, downsample_section
+from app.core.downsample import downsample_indices, lttb_indices, minmax_indices
+
+METHODS = [lttb_indices, minmax_indices]
+
+
+def ride(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.round(200 + 80 * np.sin(np.arange(n) / 50) + rng.normal(0, 40, n))
+
+
+@pytest.mark.parametrize("method", METHODS)
+@pytest.mark.parametrize("n, max_points", [(10, 4), (1000, 4), (1000, 5), (1000, 100), (3601, 500), (7, 6)])
+def test_endpoints_length_and_order(method, n, max_points):
+    values = ride(n)
+    index = method(values, max_points)
+    assert index[0] == 0 and index[-1] == n - 1
+    assert len(index) <= max_points
+    assert (np.diff(index) > 0).all()
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_short_series_and_tiny_budgets(method):
+    values = ride(50)
+    assert method(values, 50).tolist() == list(range(50))
+    assert method(values, 80).tolist() == list(range(50))
+    assert method(values, 2).tolist() == [0, 49]
+    assert method(values, 1).tolist() == [0]
+    assert method([], 10).tolist() == []
+
+
+@pytest.mark.parametrize("n, max_points", [(1000, 100), (3601, 501), (997, 10)])
+def test_minmax_keeps_bucket_extremes(n, max_points):
+    values = ride(n, seed=n)
+    kept = set(minmax_indices(values, max_points).tolist())
+    buckets = (max_points - 2) // 2
+    edges = np.linspace(0, n, buckets + 1).astype(int)
+    for start, end in zip(edges[:-1], edges[1:]):
+        bucket = values[start:end]
+        assert start + int(np.argmin(bucket)) in kept
+        assert start + int(np.argmax(bucket)) in kept
+    assert int(np.argmax(values)) in kept and int(np.argmin(values)) in kept
+
+
+def test_lttb_keeps_isolated_peak():
+    values = np.zeros(1000)
+    values[437] = 900
+    assert 437 in lttb_indices(values, 50)
+
+
+def test_downsample_indices_rejects_unknown_method():
+    with pytest.raises(ValueError):
+        downsample_indices([1, 2, 3], 2, "mean")
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_downsample_section(method):
+    values = ride(2000).tolist()
+    data = {"power_graph": values, "avg_power": 200, "power_curve_graph": [1, 2, 3]}
+    result = downsample_section("POWER", data, 100, method)
+    # 原字典不修改
+    assert data["power_graph"] is values and "power_graph_x" not in data
+    x = result["power_graph_x"]
+    assert len(result["power_graph"]) == len(x) <= 100
+    assert x[0] == 0 and x[-1] == len(values) - 1 and x == sorted(set(x))
+    assert result["power_graph"] == [values[i] for i in x]
+    # 不超过 max_points 的序列和非图表字段保持不变
+    assert result["power_curve_graph"] == [1, 2, 3] and "power_curve_graph_x" not in result
+    assert result["avg_power"] == 200
+    assert downsample_section("POWER", data, None, method) is data
+    assert downsample_section("OVERVIEW", data, 100, method) is data
+    assert "power_graph" in DOWNSAMPLE_SERIES["POWER"]
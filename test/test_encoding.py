@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from app.api.upload import encode_result, render_result
+from app.core.encoding import COMPACT_MIN_LENGTH, parse_accept, unpack_msgpack, wants_msgpack
+
+pytest.importorskip("msgpack")
+
+N = 600
+RESULT = {
+    "activity_id": "abc",
+    "POWER": {
+        "power_graph": [int(p) for p in np.linspace(-50, 1500, N)],
+        "avg_power": 210,
+        "power_curve_durations": [1, 5, 60],
+    },
+    "HEART_RATE": {"heart_rate_graph": [int(h) for h in np.linspace(60, 200, N)], "decoupling_ratio": None},
+    "SPEED": {"speed_graph": [round(v, 3) for v in np.linspace(0, 55.5, N)]},
+    "ALTITUDE": {"altitude_graph": [float(a) for a in range(N)], "label": "m"},
+}
+
+
+def test_msgpack_round_trip_keeps_typed_arrays():
+    response = encode_result(RESULT, "application/msgpack")
+    assert response.media_type == "application/msgpack"
+    decoded = unpack_msgpack(response.body)
+
+    expected_dtypes = {
+        ("POWER", "power_graph"): np.dtype("<i2"),
+        ("HEART_RATE", "heart_rate_graph"): np.dtype("uint8"),
+        ("SPEED", "speed_graph"): np.dtype("<f4"),
+        # 整数值的浮点序列按整数编码
+        ("ALTITUDE", "altitude_graph"): np.dtype("<i2"),
+    }
+    for (section, name), dtype in expected_dtypes.items():
+        array = decoded[section][name]
+        assert isinstance(array, np.ndarray)
+        assert array.dtype == dtype and array.shape == (N,)
+        np.testing.assert_allclose(array, RESULT[section][name], rtol=1e-6)
+
+    # 短列表和标量原样编码
+    assert decoded["POWER"]["power_curve_durations"] == [1, 5, 60]
+    assert decoded["POWER"]["avg_power"] == 210
+    assert decoded["HEART_RATE"]["decoupling_ratio"] is None
+    assert decoded["ALTITUDE"]["label"] == "m"
+    assert decoded["activity_id"] == "abc"
+
+
+def test_render_result_downsamples_before_encoding():
+    decoded = unpack_msgpack(render_result(RESULT, 100, "lttb", "application/msgpack").body)
+    graph = decoded["POWER"]["power_graph"]
+    assert graph.dtype == np.dtype("<i2") and len(graph) <= 100
+    assert len(decoded["POWER"]["power_graph_x"]) == len(graph)
+    # 未请求 MessagePack 时返回 JSON 字典
+    assert render_result(RESULT, None, "lttb", "application/json") is RESULT
+
+
+def test_short_lists_are_not_compacted():
+    decoded = unpack_msgpack(encode_result({"x": list(range(COMPACT_MIN_LENGTH - 1))}, "application/msgpack").body)
+    assert decoded["x"] == list(range(COMPACT_MIN_LENGTH - 1))
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, False),
+    ("", False),
+    ("application/json", False),
+    ("*/*", False),
+    ("application/msgpack", True),
+    ("application/x-msgpack", True),
+    ("Application/MsgPack; charset=binary", True),
+    ("application/json, application/msgpack", True),
+    ("application/json, application/msgpack;q=0", False),
+    ("application/msgpack;q=0.5, application/json;q=0.9", False),
+    ("application/msgpack;q=0.9, application/json;q=0.5", True),
+    ("application/msgpack;q=0.5, */*", False),
+    ("application/msgpack;q=0.5, */*;q=0.1", True),
+    ("application/msgpack;q=0.5, application/*;q=0.8", False),
+    ("application/msgpack;q=abc", False),
+    ("text/html, application/msgpack;q=0.2", True),
+])
+def test_wants_msgpack_honours_q_values(accept, expected):
+    assert wants_msgpack(accept) is expected
+
+
+def test_parse_accept():
+    assert parse_accept("text/html;level=1;q=0.7, Application/JSON, */*;q=0") == {
+        "text/html": 0.7,
+        "application/json": 1.0,
+        "*/*": 0.0,
+    }
@@ -0,0 +1,50 @@
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from fitparse import FitFile
+
+from app.core.fit_parser import RecordColumns, decode_fit
+
+FIT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Fits", "19501148013_ACTIVITY.fit")
+
+
+def build(rows, **kwargs):
+    columns = RecordColumns(**kwargs)
+    for fields in rows:
+        columns.add(fields)
+    return columns
+
+
+def test_matches_dict_frame_on_fit_records():
+    rows = [[(d.name, d.value) for d in record] for record in FitFile(FIT_FILE).get_messages("record")]
+    expected = pd.DataFrame([dict(fields) for fields in rows])
+    pd.testing.assert_frame_equal(build(rows).to_dataframe(), expected)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 4096])
+def test_mixed_types_missing_and_duplicate_fields(chunk_size):
+    start = datetime.datetime(2025, 1, 1)
+    rows = [
+        [("timestamp", start), ("power", 100), ("speed", None), ("speed", 5.5), ("name", "a")],
+        [("timestamp", start + datetime.timedelta(seconds=1)), ("power", None), ("speed", 6)],
+        [("timestamp", start + datetime.timedelta(seconds=2)), ("power", 300), ("speed", 6.25), ("name", None)],
+        [("cadence", 90)],
+    ]
+    expected = pd.DataFrame([dict(fields) for fields in rows])
+    pd.testing.assert_frame_equal(build(rows, chunk_size=chunk_size, capacity=1).to_dataframe(), expected)
+
+
+def test_integer_channels_stay_int64():
+    columns = build([[("heart_rate", 150), ("power", 250)], [("heart_rate", 160), ("power", 1200)]])
+    arrays = columns.to_arrays()
+    # 与 pandas 推断一致，差值运算不会回绕
+    assert arrays["heart_rate"].dtype == np.int64
+    assert (columns.to_dataframe()["heart_rate"] - 155).tolist() == [-5, 5]
+
+
+def test_record_field_whitelist():
+    frame = decode_fit(FIT_FILE, record_fields={"timestamp", "power"}).to_record_dataframe()
+    assert list(frame.columns) == ["timestamp", "power"]
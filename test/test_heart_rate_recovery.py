@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core import heart_rate
+from app.core.heart_rate import (
+    heart_rate_recovery_capablility,
+    heart_rate_recovery_drops,
+    heart_rate_recovery_events,
+)
+
+THRESHOLD = 165
+
+
+@pytest.fixture(autouse=True)
+def hr_config(monkeypatch):
+    monkeypatch.setitem(heart_rate.user_config["heart_rate"], "threshold_bpm", THRESHOLD)
+    monkeypatch.setitem(heart_rate.user_config["heart_rate"], "hrrc_window", 60)
+
+
+def loop_drops(hr_data, window):
+    # 原有实现：逐个起点取随后 window 个采样的最小值（pandas 的 min 跳过 NaN）
+    drops = np.full(max(len(hr_data) - window, 0), np.nan)
+    for i in range(len(drops)):
+        hr_start = hr_data.iloc[i]
+        if hr_start >= THRESHOLD:
+            drops[i] = hr_start - hr_data.iloc[i + 1 : i + 1 + window].min()
+    return drops
+
+
+def efforts_ride(seed=0, missing=0.0):
+    # 有氧骑行中穿插几次冲到阈值以上再恢复的努力
+    rng = np.random.default_rng(seed)
+    hr = np.full(3600, 130.0)
+    for start, peak, recovery in [(600, 185, 40), (1500, 175, 25), (2400, 190, 50), (3000, 170, 15)]:
+        hr[start - 120:start] = np.linspace(130, peak, 120)
+        hr[start:start + 180] = np.maximum(peak - np.arange(180) * recovery / 60, 120)
+    hr = np.round(hr + rng.normal(0, 1.5, len(hr)))
+    hr[rng.random(len(hr)) < missing] = np.nan
+    return pd.Series(hr)
+
+
+@pytest.mark.parametrize("window", [1, 30, 60, 120])
+@pytest.mark.parametrize("missing", [0.0, 0.2])
+def test_drops_match_loop(window, missing):
+    hr = efforts_ride(seed=window, missing=missing)
+    # 整个窗口缺失的情况
+    hr[900:1100] = np.nan
+    hr[880] = THRESHOLD + 10
+    expected = loop_drops(hr, window)
+    np.testing.assert_array_equal(heart_rate_recovery_drops(hr, window), expected)
+    assert heart_rate_recovery_capablility(hr, window) == round(np.nanmax(expected))
+
+
+def test_short_or_low_data():
+    assert len(heart_rate_recovery_drops(pd.Series([180.0] * 60))) == 0
+    assert heart_rate_recovery_capablility(pd.Series([180.0] * 60)) == 0
+    assert heart_rate_recovery_capablility(pd.Series([120.0] * 600)) == 0
+    assert heart_rate_recovery_events(pd.Series([120.0] * 600)) == []
+
+
+def test_events_are_largest_non_overlapping_drops():
+    hr = efforts_ride()
+    timestamps = pd.Series(pd.date_range("2025-01-01", periods=len(hr), freq="s"))
+    drops = heart_rate_recovery_drops(hr)
+    events = heart_rate_recovery_events(hr, timestamps, drops=drops)
+
+    assert len(events) == 3
+    assert [e["drop"] for e in events] == sorted((e["drop"] for e in events), reverse=True)
+    assert events[0]["drop"] == heart_rate_recovery_capablility(hr)
+    starts = sorted(e["start"] for e in events)
+    assert all(b - a > 60 for a, b in zip(starts, starts[1:]))
+    # 每次恢复分别来自不同的努力
+    assert len({e["start"] // 600 for e in events}) == 3
+
+    values = hr.to_numpy()
+    for event in events:
+        start, end = event["start"], event["end"]
+        assert start < end <= start + 60
+        assert event["start_heart_rate"] == values[start] >= THRESHOLD
+        assert event["min_heart_rate"] == values[end] == values[start + 1 : start + 61].min()
+        assert event["drop"] == round(drops[start])
+        assert event["start_time"] == timestamps[start].isoformat()
+        assert event["end_time"] == timestamps[end].isoformat()
+
+    assert heart_rate_recovery_events(hr)[0]["start_time"] is None
+    many = heart_rate_recovery_events(hr, count=10, drops=drops)
+    assert [e["start"] for e in many] == greedy_starts(drops, 60, 10)
+
+
+def greedy_starts(drops, window, count):
+    # 全部起点按下降值排序后逐个检查是否与已选事件重叠
+    selected = []
+    for i in sorted(np.flatnonzero(~np.isnan(drops)), key=lambda i: -drops[i]):
+        if all(abs(i - j) > window for j in selected):
+            selected.append(int(i))
+    return selected[:count]
+
+
+def test_drop_hidden_by_rejected_neighbour_is_kept():
+    # 1100 处的下降被 1050 处更大的下降遮住，而 1050 与最大的 1000 重叠、不会被选中
+    hr = pd.Series(np.full(1500, 150.0))
+    hr[[1000, 1050, 1100]] = [200.0, 195.0, 190.0]
+    events = heart_rate_recovery_events(hr)
+    assert [(e["start"], e["drop"]) for e in events] == [(1000, 50), (1100, 40)]
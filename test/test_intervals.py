@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from app.core.power import detect_intervals
+from app.core.zones import POWER_ZONE_LABELS, power_zone_bounds
+
+FTP = 250
+
+
+def ride(blocks, noise=20, seed=0):
+    # blocks 为 (秒数, 相对 FTP 的强度)，返回功率和强度高于 FTP 的段的 (start, end)
+    rng = np.random.default_rng(seed)
+    segments, expected, position = [], [], 0
+    for duration, intensity in blocks:
+        if intensity > 1:
+            expected.append((position, position + duration))
+        segments.append(np.full(duration, intensity * FTP))
+        position += duration
+    power = np.clip(np.concatenate(segments) + rng.normal(0, noise, position), 0, None)
+    return pd.Series(power), expected
+
+
+def test_structured_ride_boundaries_and_stats():
+    blocks = [(600, 0.6)] + [(300, 1.1), (180, 0.45)] * 3 + [(30, 1.7), (90, 0.45)] * 4 + [(600, 0.6)]
+    power, expected = ride(blocks)
+    rng = np.random.default_rng(1)
+    heart_rate = pd.Series(100 + power / 5 + rng.normal(0, 2, len(power)))
+    heart_rate[rng.random(len(power)) < 0.1] = np.nan
+    cadence = pd.Series(np.full(len(power), 90.0))
+
+    intervals = detect_intervals(power, heart_rate, cadence, ftp=FTP)
+    assert [(i["start"], i["end"]) for i in intervals] == expected
+
+    values, hr = power.to_numpy(), heart_rate.to_numpy()
+    for interval in intervals:
+        start, end = interval["start"], interval["end"]
+        segment = values[start:end]
+        assert interval["duration"] == end - start
+        assert interval["avg_power"] == round(segment.mean())
+        assert interval["max_power"] == round(segment.max())
+        # 标准化功率：区间内完整的 30 秒滑动窗口
+        rolling = pd.Series(segment).rolling(30).mean().dropna().to_numpy()
+        normalized = np.mean(rolling ** 4) ** 0.25
+        assert abs(interval["normalized_power"] - normalized) < 1
+        assert abs(interval["intensity_factor"] - normalized / FTP) <= 0.005 + 1e-9
+        zone = np.digitize(segment.mean(), power_zone_bounds(FTP), right=True)
+        assert interval["zone"] == POWER_ZONE_LABELS[zone]
+        assert interval["avg_heart_rate"] == round(np.nanmean(hr[start:end]))
+        assert interval["max_heart_rate"] == round(np.nanmax(hr[start:end]))
+        assert interval["avg_cadence"] == 90
+
+
+def test_short_gaps_merge_and_short_efforts_drop():
+    # 10 秒的低功率间隔合并为一个区间，20 秒的冲刺短于最短时长
+    power, _ = ride([(300, 0.5), (120, 1.1), (10, 0.3), (120, 1.1), (300, 0.5), (20, 1.8), (300, 0.5)], noise=0)
+    intervals = detect_intervals(power, ftp=FTP)
+    assert [(i["start"], i["end"]) for i in intervals] == [(300, 550)]
+    assert intervals[0]["avg_heart_rate"] is None and intervals[0]["avg_cadence"] is None
+
+
+def test_no_intervals():
+    steady, _ = ride([(3600, 0.7)])
+    assert detect_intervals(steady, ftp=FTP) == []
+    assert detect_intervals(pd.Series([], dtype=float), ftp=FTP) == []
+    assert detect_intervals(pd.Series([np.nan] * 600), ftp=FTP) == []
+    assert detect_intervals(ride([(600, 1.2)])[0], ftp=0) == []
+
+
+def test_missing_power_counts_as_zero():
+    power, expected = ride([(300, 0.5), (240, 1.2), (300, 0.5)], noise=0)
+    power[400:403] = np.nan
+    intervals = detect_intervals(power, ftp=FTP)
+    assert [(i["start"], i["end"]) for i in intervals] == expected
+    assert intervals[0]["avg_power"] == round(power[300:540].fillna(0).mean())
@@ -0,0 +1,141 @@
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import jobs
+from app.core.jobs import JOB_DONE, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JobStore
+from app.core.worker_pool import BoundedWorkerPool
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite3"), timeout_seconds=60)
+
+
+def age(store, job_id, seconds):
+    with store._connect() as conn:
+        conn.execute("UPDATE jobs SET updated_at = updated_at - ? WHERE id = ?", (seconds, job_id))
+
+
+def test_only_jobs_without_heartbeat_time_out(store):
+    alive = store.create("a.fit", "a", ["POWER"])
+    lost = store.create("b.fit", "b", ["POWER"])
+    # 创建很久但持续有心跳的任务不超时
+    with store._connect() as conn:
+        conn.execute("UPDATE jobs SET created_at = created_at - 7200")
+    age(store, alive, 30)
+    age(store, lost, 120)
+    assert store.get(alive)["status"] == JOB_QUEUED
+    assert store.get(lost)["status"] == JOB_FAILED
+
+    store.start(alive)
+    age(store, alive, 120)
+    store.section_done(alive, "POWER")
+    assert store.get(alive)["status"] == JOB_RUNNING
+    age(store, alive, 120)
+    store.touch([alive, lost])
+    job = store.get(alive)
+    assert job["status"] == JOB_RUNNING and "updated_at" not in job
+    # 已失败的任务不被心跳恢复
+    assert store.get(lost)["status"] == JOB_FAILED
+
+
+def test_old_table_is_migrated(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / "old.sqlite3")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE jobs (id TEXT PRIMARY KEY, filename TEXT, activity_id TEXT, status TEXT NOT NULL,"
+            " sections TEXT NOT NULL, completed_sections TEXT NOT NULL DEFAULT '[]', error TEXT, result TEXT,"
+            " created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+    store = JobStore(path)
+    assert store.get(store.create("a.fit", "a", []))["status"] == JOB_QUEUED
+
+
+@pytest.fixture
+def job_app(store, monkeypatch):
+    # 工作池只有 3 个名额，后台任务最多占用 1 个
+    pool = BoundedWorkerPool(max_workers=3, max_pending=3, use_processes=False)
+    release = threading.Event()
+    running = []
+
+    def fake_job(source, job_id, filename, file_digest, params, selection=None):
+        store.start(job_id)
+        running.append(job_id)
+        release.wait(10)
+        return {"activity_id": file_digest}
+
+    def submit(source, func, *args):
+        return pool.submit(func, source, *args)
+
+    monkeypatch.setattr(jobs, "job_store", store)
+    monkeypatch.setattr(jobs, "run_analysis_job", fake_job)
+    monkeypatch.setattr(jobs, "submit_spooled", submit)
+    monkeypatch.setattr(jobs, "ANALYSIS_JOB_SLOTS", 1)
+    monkeypatch.setattr(jobs, "ANALYSIS_JOB_MAX_QUEUED", 3)
+    app = FastAPI()
+    app.include_router(jobs.router, prefix="/api")
+    yield app, pool, release, running
+    release.set()
+    pool.shutdown()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+
+def test_jobs_are_queued_and_limited_to_their_slots(job_app):
+    app, pool, release, running = job_app
+    with TestClient(app) as client:
+        def post(content):
+            return client.post("/api/jobs/upload_fit", files={"file": ("a.fit", content)})
+
+        responses = [post(b"job %d" % i) for i in range(4)]
+        assert [r.status_code for r in responses] == [202] * 4
+        assert all(r.json()["status"] == JOB_QUEUED for r in responses)
+        job_ids = [r.json()["job_id"] for r in responses]
+
+        wait_for(lambda: len(running) == 1)
+        time.sleep(0.2)
+        # 只有一个任务在执行，工作池的其他名额留给 upload_fit
+        assert running == job_ids[:1] and pool.in_flight == 1
+        assert [client.get(f"/api/jobs/{job_id}").json()["status"] for job_id in job_ids] == (
+            [JOB_RUNNING] + [JOB_QUEUED] * 3
+        )
+        # 排队任务达到上限
+        assert post(b"job 4").status_code == 503
+
+        release.set()
+        wait_for(lambda: all(
+            client.get(f"/api/jobs/{job_id}").json()["status"] == JOB_DONE for job_id in job_ids
+        ))
+        assert running == job_ids
+
+
+def test_jobs_wait_for_a_full_pool(job_app):
+    app, pool, release, running = job_app
+    blocker = threading.Event()
+    with TestClient(app) as client:
+        # upload_fit 占满工作池时任务仍然排队，名额空出后再提交
+        futures = client.portal.call(lambda: _fill(pool, blocker))
+        response = client.post("/api/jobs/upload_fit", files={"file": ("a.fit", b"job")})
+        assert response.status_code == 202
+        time.sleep(0.3)
+        assert running == []
+        blocker.set()
+        release.set()
+        job_id = response.json()["job_id"]
+        wait_for(lambda: client.get(f"/api/jobs/{job_id}").json()["status"] == JOB_DONE)
+        assert all(future.done() for future in futures)
+
+
+async def _fill(pool, blocker):
+    return [pool.submit(blocker.wait, 10) for _ in range(pool.max_pending)]
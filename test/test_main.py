@@ -0,0 +1,14 @@
+from fastapi.testclient import TestClient
+
+from app import main
+
+
+def test_lifespan_starts_and_stops_analysis(monkeypatch):
+    calls = []
+    monkeypatch.setattr(main.upload, "warm_up_analysis_pool", lambda: calls.append("warm_up"))
+    monkeypatch.setattr(main.upload, "shutdown_analysis_pool", lambda: calls.append("shutdown"))
+    monkeypatch.setattr(main.jobs, "discard_queued_jobs", lambda: calls.append("discard_queued_jobs"))
+    with TestClient(main.app) as client:
+        assert calls == ["warm_up"]
+        assert client.get("/").status_code == 200
+    assert calls == ["warm_up", "discard_queued_jobs", "shutdown"]
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.metrics import MetricGraph, MetricRegistry, activity_sources, metric_registry
+
+
+def test_metrics_declare_columns_not_the_record_frame():
+    records = pd.DataFrame({"power": np.full(600, 300.0)})
+    assert "records" not in activity_sources(records)
+    for name in metric_registry:
+        assert "records" not in metric_registry[name].inputs, name
+
+
+def test_optional_inputs_are_none_when_missing():
+    registry = MetricRegistry()
+
+    @registry.metric("pair", "power", "heart_rate?")
+    def _pair(power, heart_rate):
+        return power, heart_rate
+
+    assert MetricGraph(registry, {"power": 1})["pair"] == (1, None)
+    assert MetricGraph(registry, {"power": 1, "heart_rate": 2})["pair"] == (1, 2)
+    # 必需输入缺失时仍然报错
+    with pytest.raises(KeyError):
+        MetricGraph(registry, {"heart_rate": 2})["pair"]
+
+
+def test_intervals_and_recovery_read_columns():
+    n = 1200
+    power = np.full(n, 150.0)
+    power[300:600] = 400.0
+    heart_rate = np.full(n, 130.0)
+    heart_rate[300:600] = 195.0
+    records = pd.DataFrame({
+        "timestamp": pd.date_range("2025-01-01", periods=n, freq="s"),
+        "power": power,
+        "heart_rate": heart_rate,
+    })
+    graph = MetricGraph(metric_registry, activity_sources(records))
+    intervals = graph["intervals"]
+    assert [(i["start"], i["end"]) for i in intervals] == [(300, 600)]
+    assert intervals[0]["avg_heart_rate"] == 195 and intervals[0]["avg_cadence"] is None
+    events = graph["heart_rate_recovery_events"]
+    assert events[0]["start_time"] == records["timestamp"][events[0]["start"]].isoformat()
+
+    without_heart_rate = MetricGraph(metric_registry, activity_sources(records[["power"]]))
+    assert without_heart_rate["intervals"][0]["avg_heart_rate"] is None
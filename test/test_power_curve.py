@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.fit_parser import decode_fit
+from app.core.power import get_max_power_duration_curve, log_duration_grid, mean_max_power
+
+FIT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Fits", "19501148013_ACTIVITY.fit")
+
+
+def rolling_curve(power_data: pd.Series) -> list:
+    # 原有实现：每个持续时间做一次 rolling().mean().max()
+    curve = [0]
+    for duration in range(1, len(power_data) - 2):
+        max_power = power_data.rolling(window=duration).mean().max()
+        curve.append(0 if pd.isna(max_power) else round(max_power))
+    return curve
+
+
+def synthetic_power(seconds: int, missing: float, seed: int = 0) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    t = np.arange(seconds)
+    power = np.clip(np.round(180 + 80 * (np.sin(t / 60) > 0.7) + rng.normal(0, 40, seconds)), 0, None)
+    power[rng.random(seconds) < missing] = np.nan
+    return pd.Series(power)
+
+
+@pytest.mark.parametrize("missing", [0.0, 0.01, 0.3])
+def test_exact_curve_matches_rolling_loop(missing):
+    power = synthetic_power(900, missing)
+    assert get_max_power_duration_curve(power) == rolling_curve(power)
+
+
+def test_exact_curve_matches_rolling_loop_on_fit_file():
+    power = decode_fit(FIT_FILE).to_record_dataframe()["power"].astype(float)
+    assert get_max_power_duration_curve(power) == rolling_curve(power)
+
+
+def test_log_grid_is_a_subset_of_exact_curve():
+    power = synthetic_power(1800, 0.01)
+    exact = get_max_power_duration_curve(power)
+    grid = log_duration_grid(len(power) - 3)
+    assert grid[0] == 1 and grid[-1] == len(power) - 3
+    assert get_max_power_duration_curve(power, grid) == [exact[d] for d in grid]
+
+
+def test_windows_without_complete_data_are_nan():
+    power = np.array([100.0, np.nan, 200.0, 300.0])
+    result = mean_max_power(power, [0, 1, 2, 3, 5])
+    np.testing.assert_array_equal(result, [np.nan, 300.0, 250.0, np.nan, np.nan])
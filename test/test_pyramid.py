@@ -0,0 +1,118 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import activities
+from app.core.activity_store import ActivityStore
+from app.core.pyramid import PYRAMID_BUCKETS, build_pyramid, choose_bucket, window_slice
+
+N = 7263  # 不是各桶大小的整数倍，最后一个桶不完整
+
+
+def power_stream(seed=0):
+    rng = np.random.default_rng(seed)
+    power = np.round(rng.normal(220, 60, N))
+    power[rng.random(N) < 0.05] = np.nan
+    # 整个 5 秒桶缺失
+    power[100:105] = np.nan
+    return power
+
+
+def direct_level(values, bucket):
+    # 逐桶直接对原始数据求 min / mean / max
+    rows = []
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        for start in range(0, len(values), bucket):
+            chunk = values[start:start + bucket]
+            rows.append((np.nanmin(chunk), np.nanmean(chunk), np.nanmax(chunk)))
+    return np.array(rows)
+
+
+def test_levels_match_direct_reduction():
+    values = power_stream()
+    pyramid = build_pyramid(values)
+    assert sorted(pyramid) == PYRAMID_BUCKETS
+    for bucket, level in pyramid.items():
+        assert level.dtype == np.float32 and level.shape == (-(-N // bucket), 3)
+        np.testing.assert_allclose(level, direct_level(values, bucket), rtol=1e-6, equal_nan=True)
+    assert np.isnan(pyramid[5][20]).all()
+    # 1 秒层即原始数据
+    np.testing.assert_array_equal(pyramid[1][:, 1], values.astype(np.float32))
+
+
+@pytest.mark.parametrize("span, width, bucket", [
+    (1000, 1000, 1),
+    (1001, 1000, 5),
+    (5000, 1000, 5),
+    (5001, 1000, 30),
+    (30000, 1000, 30),
+    (30001, 1000, 300),
+    (10 ** 7, 1000, 300),
+    (600, 100, 30),
+])
+def test_choose_bucket_is_finest_level_within_width(span, width, bucket):
+    assert choose_bucket(span, width) == bucket
+
+
+def test_window_slice():
+    assert window_slice(30, 0, None, 243) == slice(0, 243)
+    assert window_slice(30, 59, 61, 243) == slice(1, 3)
+    assert window_slice(300, 7000, 9000, 25) == slice(23, 25)
+    assert window_slice(5, 9000, None, 10) == slice(1800, 1800)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    store = ActivityStore(str(tmp_path))
+    values = power_stream()
+    streams = pd.DataFrame({
+        "timestamp": pd.date_range("2025-01-01", periods=N, freq="s"),
+        "power": values,
+    })
+    store.save("a1", streams)
+    monkeypatch.setattr(activities, "activity_store", store)
+    app = FastAPI()
+    app.include_router(activities.router, prefix="/api")
+    return TestClient(app), values
+
+
+@pytest.mark.parametrize("params, bucket", [
+    ({}, 30),
+    ({"width": 10000}, 1),
+    ({"width": 2000}, 5),
+    ({"width": 20}, 300),
+    ({"start": 600, "end": 1200, "width": 600}, 1),
+    ({"start": 600, "end": 1200, "width": 100}, 30),
+    ({"start": 61, "end": 4000, "width": 200}, 30),
+])
+def test_window_endpoint_picks_level(client, params, bucket):
+    client, values = client
+    response = client.get("/api/activities/a1/window", params=params)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["bucket_seconds"] == bucket
+
+    start, end = params.get("start", 0), params.get("end", N)
+    first = int(start // bucket)
+    expected = direct_level(values, bucket)[first:-(-int(end) // bucket)]
+    assert len(body["time"]) == len(expected)
+    if bucket != max(PYRAMID_BUCKETS):
+        # 窗口起点不与桶对齐时首尾各占一个不完整的桶；都超过 width 时使用最粗的一层
+        assert len(expected) <= params.get("width", 1000) + 1
+    assert body["time"][0] == first * bucket
+    assert body["time"] == sorted(body["time"])
+    for column, stat in enumerate(("min", "mean", "max")):
+        got = np.array([np.nan if v is None else v for v in body[stat]])
+        np.testing.assert_allclose(got, expected[:, column], rtol=1e-5, atol=1e-3, equal_nan=True)
+
+
+def test_window_endpoint_errors(client):
+    client, _ = client
+    assert client.get("/api/activities/missing/window").status_code == 404
+    assert client.get("/api/activities/a1/window", params={"channel": "distance"}).status_code == 404
+    assert client.get("/api/activities/a1/window", params={"start": 100, "end": 50}).status_code == 400
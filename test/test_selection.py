@@ -0,0 +1,75 @@
+import json
+import os
+
+import pytest
+
+from app.api.upload import (
+    SECTION_FIELDS,
+    analyze_fit,
+    parse_selection,
+    record_fields_for_sections,
+    select_result,
+    selection_params,
+)
+from app.core.cache import hash_fit_upload
+
+FIT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Fits", "19501148013_ACTIVITY.fit")
+
+
+def test_parse_selection():
+    assert parse_selection() is None
+    assert parse_selection(" , ") is None
+    assert parse_selection("OVERVIEW,POWER") == {"OVERVIEW": None, "POWER": None}
+    assert parse_selection(fields="POWER.wbal_curve,POWER.max_power") == {"POWER": {"wbal_curve", "max_power"}}
+    # 只写字段名时匹配所有包含该字段的部分
+    assert parse_selection(fields="avg_power") == {"OVERVIEW": {"avg_power"}, "POWER": {"avg_power"}}
+    # sections 中列出的部分返回全部字段
+    assert parse_selection("POWER", "POWER.wbal_curve,avg_power") == {"POWER": None, "OVERVIEW": {"avg_power"}}
+
+
+@pytest.mark.parametrize("sections, fields", [("NOPE", None), (None, "POWER.nope"), (None, "nope"), (None, "ELSE.avg_power")])
+def test_parse_selection_rejects_unknown_names(sections, fields):
+    with pytest.raises(ValueError):
+        parse_selection(sections, fields)
+
+
+def test_selection_params_are_order_independent():
+    assert selection_params(None) == {}
+    a = selection_params(parse_selection("POWER", "OVERVIEW.avg_power,OVERVIEW.calories"))
+    b = selection_params(parse_selection(None, "OVERVIEW.calories,OVERVIEW.avg_power") | {"POWER": None})
+    assert json.dumps(a, sort_keys=True) == json.dumps(b, sort_keys=True)
+
+
+def test_record_fields_always_keep_overview_and_timestamp():
+    assert record_fields_for_sections([]) == {"timestamp", "power", "heart_rate", "distance", "enhanced_speed", "enhanced_altitude"}
+    assert {"cadence", "left_right_balance"} <= record_fields_for_sections(["CADENCE"])
+
+
+def test_select_result_trims_sections_and_fields():
+    result = {"activity_id": "x", "OVERVIEW": {"avg_power": 1, "calories": 2}, "POWER": {"max_power": 3}}
+    assert select_result(result, None) is result
+    assert select_result(result, {"OVERVIEW": {"calories"}, "SPEED": None}) == {
+        "activity_id": "x", "OVERVIEW": {"calories": 2},
+    }
+
+
+@pytest.fixture(scope="module")
+def full_result():
+    with open(FIT_FILE, "rb") as f:
+        digest = hash_fit_upload(f)
+    return digest, analyze_fit(FIT_FILE, "a.fit", digest, use_cache=False)
+
+
+@pytest.mark.parametrize("sections, fields", [
+    ("OVERVIEW", None),
+    ("HEART_RATE,CADENCE", None),
+    (None, "POWER.wbal_curve,POWER.normalized_power,training_effect"),
+    (None, "ALTITUDE.vam_graph,max_speed"),
+])
+def test_selected_analysis_matches_full_analysis(full_result, sections, fields):
+    digest, full = full_result
+    selection = parse_selection(sections, fields)
+    selected = analyze_fit(FIT_FILE, "a.fit", digest, use_cache=False, selection=selection)
+    assert selected == select_result(full, selection)
+    for section, names in selection.items():
+        assert set(selected[section]) == set(SECTION_FIELDS[section] if names is None else names) & set(full[section])
@@ -0,0 +1,32 @@
+import io
+import os
+import tempfile
+
+from app.core.utils import discard_upload, spool_upload
+
+DATA = b"\x0e\x10" + bytes(range(256)) * 8
+
+
+def spooled(max_size):
+    f = tempfile.SpooledTemporaryFile(max_size=max_size)
+    f.write(DATA)
+    f.seek(0)
+    return f
+
+
+def test_in_memory_upload_is_not_written_to_disk():
+    with spooled(len(DATA) + 1) as f:
+        source = spool_upload(f, ".fit")
+        assert source == DATA and f.tell() == 0
+    discard_upload(source)
+
+
+def test_rolled_or_process_upload_is_spooled_to_disk():
+    for f, to_disk in [(spooled(16), False), (spooled(len(DATA) + 1), True), (io.BytesIO(DATA), False)]:
+        with f:
+            path = spool_upload(f, ".fit", to_disk)
+        assert path.endswith(".fit")
+        with open(path, "rb") as saved:
+            assert saved.read() == DATA
+        discard_upload(path)
+        assert not os.path.exists(path)
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.power import get_wbal_curve, get_wbal_range, user_config, wbal_balance
+
+W_PRIME = float(user_config["power"]["WJ"])
+CP = float(user_config["power"]["FTP"])
+
+
+def loop_exponential(power):
+    # 原有实现：逐点循环，NaN 使余量恢复为 W'
+    tau = W_PRIME / (CP * 0.5)
+    balance, result = W_PRIME, []
+    for p in power:
+        if p <= CP:
+            balance += (W_PRIME - balance) * (1 - np.exp(-1.0 / tau))
+        else:
+            balance -= p - CP
+        balance = max(0.0, min(W_PRIME, balance))
+        result.append(balance)
+    return np.array(result)
+
+
+def loop_differential(power):
+    # Froncioni / Skiba 微分模型，缺失值按 0 W 计，不限定范围
+    balance, result = W_PRIME, []
+    for p in np.nan_to_num(power):
+        if p > CP:
+            balance -= p - CP
+        else:
+            balance += (W_PRIME - balance) * (CP - p) / W_PRIME
+        result.append(balance)
+    return np.array(result)
+
+
+def loop_integral(power):
+    power = np.nan_to_num(power)
+    below = power[power < CP]
+    tau = 546 * np.exp(-0.01 * (CP - below.mean() if len(below) else 0.0)) + 316
+    expended = np.maximum(power - CP, 0.0)
+    return np.array([
+        W_PRIME - sum(expended[u] * np.exp(-(t - u) / tau) for u in range(t + 1))
+        for t in range(len(power))
+    ])
+
+
+def ride(seconds, mean, sd, missing=0.0, seed=0):
+    rng = np.random.default_rng(seed)
+    power = np.clip(np.round(rng.normal(mean, sd, seconds)), 0, None)
+    power[rng.random(seconds) < missing] = np.nan
+    return power
+
+
+RIDES = {
+    "steady": ride(3600, CP * 0.7, 60),
+    "dropouts": ride(3600, CP * 0.8, 80, missing=0.02, seed=1),
+    # 平均功率高于 CP，余量反复耗尽到 0
+    "depleting": ride(3600, CP + 30, 200, seed=2),
+    "depleting_dropouts": ride(3600, CP + 30, 200, missing=0.05, seed=3),
+    "long_recovery": np.r_[np.full(120, CP * 4), np.zeros(150000), np.full(60, CP * 3), [np.nan] * 5, np.zeros(30)],
+}
+
+
+@pytest.mark.parametrize("name", RIDES)
+def test_exponential_matches_loop(name):
+    power = RIDES[name]
+    expected = loop_exponential(power)
+    result = wbal_balance(power, "exponential")
+    np.testing.assert_allclose(result, expected, rtol=0, atol=1e-6)
+    # 余量耗尽的位置与逐点实现完全一致，缺失值处恢复为 W'
+    np.testing.assert_array_equal(result == 0, expected == 0)
+    assert (result[np.isnan(power)] == W_PRIME).all()
+
+
+@pytest.mark.parametrize("name", [name for name in RIDES if name != "long_recovery"])
+def test_differential_matches_loop(name):
+    power = RIDES[name]
+    np.testing.assert_allclose(wbal_balance(power, "differential"), loop_differential(power), rtol=1e-9, atol=1e-6)
+
+
+def test_integral_matches_direct_sum():
+    power = RIDES["depleting_dropouts"][:600]
+    np.testing.assert_allclose(wbal_balance(power, "integral"), loop_integral(power), rtol=0, atol=1e-6)
+
+
+def test_curve_and_range():
+    power = pd.Series(RIDES["depleting"])
+    curve = get_wbal_curve(power)
+    assert isinstance(curve, list) and len(curve) == len(power)
+    assert get_wbal_range(power) == get_wbal_range(power, curve) == get_wbal_range(power, np.array(curve))
+    assert get_wbal_range(power) == int(round(max(curve) - min(curve)))
+    assert get_wbal_range(pd.Series([], dtype=float)) == 0
+    with pytest.raises(ValueError):
+        wbal_balance(power, "linear")
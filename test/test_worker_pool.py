@@ -0,0 +1,42 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.worker_pool import BoundedWorkerPool, WorkerPoolFull
+
+
+def test_cancel_keeps_slot_and_file_until_task_ends():
+    async def scenario():
+        pool = BoundedWorkerPool(max_workers=1, max_pending=2, use_processes=False)
+        started, release = threading.Event(), threading.Event()
+        cleaned = []
+
+        def work():
+            started.set()
+            release.wait(5)
+            # 任务执行期间 cleanup 不能被调用（例如临时文件仍在读取）
+            return list(cleaned)
+
+        running = pool.submit_with_cleanup(lambda: cleaned.append("running"), work)
+        queued = pool.submit_with_cleanup(lambda: cleaned.append("queued"), work)
+        with pytest.raises(WorkerPoolFull):
+            pool.submit_with_cleanup(lambda: cleaned.append("rejected"), work)
+        await asyncio.to_thread(started.wait, 5)
+
+        running.cancel()
+        queued.cancel()
+        await asyncio.sleep(0.1)
+        # 排队中的任务被取消，立即释放；执行中的任务继续占用名额
+        assert cleaned == ["queued"] and pool.in_flight == 1
+
+        release.set()
+        for _ in range(100):
+            if pool.in_flight == 0:
+                break
+            await asyncio.sleep(0.02)
+        assert cleaned == ["queued", "running"] and pool.in_flight == 0
+        assert await pool.run(work) == ["queued", "running"]
+        pool.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,122 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.zones import (
+    FTP_BANDS,
+    HEART_RATE_ZONE_LABELS,
+    POWER_ZONE_LABELS,
+    format_zone_times,
+    ftp_band_totals,
+    heart_rate_zone_bounds,
+    heart_rate_zone_seconds,
+    power_zone_bounds,
+    power_zone_seconds,
+    zone_histogram,
+)
+
+HR_CONFIG = {"max_bpm": 190, "threshold_bpm": 170, "resting_bpm": 55}
+
+
+def noisy(n, mean, sd, missing=0.0, seed=0, fractional=False):
+    # 含缺失值、负值和小数的随机数据
+    rng = np.random.default_rng(seed)
+    values = rng.normal(mean, sd, n)
+    if not fractional:
+        values = np.round(values)
+    values[rng.random(n) < missing] = np.nan
+    return pd.Series(values)
+
+
+def mask_power_zones(power, ftp):
+    # 原有实现：逐区间布尔掩码
+    bounds = [0] + power_zone_bounds(ftp) + [math.inf]
+    zones = []
+    for i in range(7):
+        lower, upper = bounds[i], bounds[i + 1]
+        if math.isinf(upper):
+            mask = power > lower
+        elif i == 0:
+            mask = power <= upper
+        else:
+            mask = (power > lower) & (power <= upper)
+        zones.append(int(mask.sum()))
+    ss = int(((power > int(0.84 * ftp)) & (power <= int(0.97 * ftp))).sum())
+    return zones, ss
+
+
+def mask_heart_rate_zones(hr, bounds):
+    zones = []
+    for i in range(5):
+        if i == 0:
+            mask = (hr >= bounds[0]) & (hr <= bounds[1])
+        else:
+            mask = (hr > bounds[i]) & (hr <= bounds[i + 1])
+        zones.append(int(mask.sum()))
+    return zones
+
+
+@pytest.mark.parametrize("fractional", [False, True])
+@pytest.mark.parametrize("ftp", [250, 183])
+def test_power_zone_seconds_matches_masks(ftp, fractional):
+    power = noisy(5000, ftp * 0.8, ftp * 0.5, missing=0.05, seed=ftp, fractional=fractional)
+    # 恰好落在分界上的样本
+    power[:7] = power_zone_bounds(ftp) + [0]
+    zones, ss = mask_power_zones(power, ftp)
+    result = power_zone_seconds(power, ftp)
+    assert result["zones"].tolist() == zones
+    assert result["SS"] == ss
+    assert result["total"] == len(power)
+
+
+@pytest.mark.parametrize("method", ["threshold", "max", "hrr"])
+def test_heart_rate_zone_seconds_matches_masks(method):
+    hr = noisy(5000, 150, 30, missing=0.05, seed=1)
+    bounds = heart_rate_zone_bounds(method, HR_CONFIG)
+    hr[:6] = bounds
+    result = heart_rate_zone_seconds(hr, HR_CONFIG)
+    assert set(result) == {"threshold", "max", "hrr"}
+    assert result[method].tolist() == mask_heart_rate_zones(hr, bounds)
+
+
+def test_heart_rate_zone_bounds_rejects_unknown_method():
+    with pytest.raises(ValueError):
+        heart_rate_zone_bounds("lactate", HR_CONFIG)
+
+
+def test_zone_histogram_edges_and_weights():
+    values = [np.nan, -1, 0, 1, 2, 2.5, 3, 4]
+    assert zone_histogram(values, [0, 2, 3]).tolist() == [2, 2, 2, 1]
+    assert zone_histogram(values, [0, 2, 3], right=False).tolist() == [1, 2, 2, 2]
+    np.testing.assert_allclose(zone_histogram(values, [0, 2, 3], weights=values), [-1, 3, 5.5, 4])
+    # 倒置的区间为空
+    assert zone_histogram(values, [0, 3, 2]).tolist() == [2, 4, 0, 1]
+
+
+def test_ftp_band_totals_matches_loop():
+    ftp = 250
+    power = noisy(5000, 220, 120, missing=0.05, seed=2, fractional=True)
+    seconds = np.zeros(len(FTP_BANDS) - 1, dtype=int)
+    work = np.zeros(len(FTP_BANDS) - 1)
+    # 原有实现：每个样本逐个功率带比较，缺失按 0 计
+    for p in power.fillna(0):
+        for i, (lower, upper) in enumerate(zip(FTP_BANDS, FTP_BANDS[1:])):
+            if lower <= p / ftp < upper:
+                seconds[i] += 1
+                work[i] += p
+                break
+    bands = ftp_band_totals(power, ftp)
+    assert bands["seconds"][1:len(FTP_BANDS)].tolist() == seconds.tolist()
+    np.testing.assert_allclose(bands["work"][1:len(FTP_BANDS)], work)
+    assert bands["seconds"].sum() == len(power)
+
+
+def test_format_zone_times():
+    result = format_zone_times([60, 0, 3600], HEART_RATE_ZONE_LABELS[:3])
+    assert result["Z1"] == {"time": "1m0s", "percent": "1.6%"}
+    assert result["Z2"] == {"time": "0s", "percent": "0.0%"}
+    assert result["Z3"] == {"time": "1h0m0s", "percent": "98.4%"}
+    assert format_zone_times([0] * 7, POWER_ZONE_LABELS)["zone_7"]["percent"] == "0.0%"
+    assert format_zone_times([30], ["zone_1"], total=120)["zone_1"]["percent"] == "25.0%"